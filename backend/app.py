@@ -1,17 +1,26 @@
 
-from flask import Flask
+from flask import Flask, jsonify, g, request
 from flask_cors import CORS
-from routes.prediction_routes import prediction_bp
+from routes.prediction_routes import (
+    prediction_bp, predict_location, FEATURE_NAMES, SUPPORTED_LANGUAGES, EXPLAIN_MODES
+)
 from routes.search_routes import search_bp
 from routes.dev_routes import dev_bp
 from routes.simulate_routes import simulate_bp
+from routes.admin_routes import admin_bp
+from services.model_service import get_model_registry
+from services.weather_service import get_soil_data
+from services.json_encoding import FastJSONProvider
+from services.metrics import METRICS_ENABLED, metrics_registry, render_prometheus
 import os
+import time
 from dotenv import load_dotenv
 
 # Load env
 load_dotenv()
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app) # Enable CORS for frontend
 
 # Register Blueprints
@@ -19,11 +28,106 @@ app.register_blueprint(prediction_bp, url_prefix='/api')
 app.register_blueprint(search_bp, url_prefix='/api')
 app.register_blueprint(dev_bp, url_prefix='/api/dev')
 app.register_blueprint(simulate_bp, url_prefix='/api/simulate')
+app.register_blueprint(admin_bp, url_prefix='/api/admin')
+
+if METRICS_ENABLED:
+    @app.before_request
+    def start_request_clock():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        # Label by route pattern, not by path, so the number of series stays bounded
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        timer = g.get('stage_timer')
+        stages = timer.stages if timer is not None else ()
+        metrics_registry.record_request(route, request.method, response.status_code, elapsed, stages)
+
+        timing = f'total;dur={elapsed * 1000:.2f}'
+        if stages:
+            timing = f'{timer.server_timing()}, {timing}'
+        response.headers['Server-Timing'] = timing
+        return response
+
+@app.route('/metrics')
+def metrics():
+    """
+    Prometheus scrape endpoint: request and stage latency histograms, upstream
+    calls and errors, cache hit ratios and the live model version.
+    """
+    return render_prometheus(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
 
 @app.route('/')
 def home():
     return {"message": "Smart Crop Advisory System API is running"}
 
+# Synthetic request used to warm up a worker: a fixed location (its soil comes
+# from the local grid or mock) and fixed weather, so no upstream is called
+WARMUP_LOCATION = (20.59, 78.96)
+WARMUP_WEATHER = {"temperature": 26.0, "humidity": 70.0, "rainfall": 110.0}
+
+warmup_state = {
+    "ready": False,
+    "pid": None,
+    "model_version": None,
+    "duration_ms": None,
+    "error": None
+}
+
+def warm_up():
+    """
+    Runs a synthetic prediction through every /predict stage (soil lookup,
+    scaling, forest, centroid distances, fusion, SHAP in each explain mode,
+    localized response for every language, JSON encoding), so lazy imports
+    and first-call costs are paid before the process takes traffic.
+    Returns True when the process is ready to serve.
+    """
+    start = time.perf_counter()
+    warmup_state.update(ready=False, pid=os.getpid(), error=None)
+    try:
+        # watch=False: the gunicorn master must not start the artifact watcher
+        models = get_model_registry().current(watch=False)
+        if models is None:
+            raise RuntimeError("Models not loaded")
+        lat, lon = WARMUP_LOCATION
+        with app.test_request_context('/api/predict', method='POST'):
+            soil = get_soil_data(lat, lon)
+            input_dict = {**soil, **WARMUP_WEATHER}
+            features = [input_dict[name] for name in FEATURE_NAMES]
+            for explain in EXPLAIN_MODES:
+                jsonify(predict_location(models, lat, lon, 'en', 'en', explain, soil, input_dict, features))
+            for lang in SUPPORTED_LANGUAGES:
+                jsonify(predict_location(models, lat, lon, lang, lang, 'none', soil, input_dict, features))
+    except Exception as e:
+        print(f"Warm-up error: {e}")
+        warmup_state["error"] = str(e)
+        return False
+    warmup_state.update(
+        ready=True,
+        model_version=models.version,
+        duration_ms=round((time.perf_counter() - start) * 1000, 1)
+    )
+    return True
+
+@app.route('/api/ready')
+def ready():
+    """
+    Readiness probe: 200 once this worker has warmed up and has models loaded, else 503.
+    """
+    models = get_model_registry().current()
+    is_ready = warmup_state["ready"] and warmup_state["pid"] == os.getpid() and models is not None
+    body = {
+        "ready": is_ready,
+        "model_version": models.version if models is not None else None,
+        "warmup": warmup_state
+    }
+    return jsonify(body), 200 if is_ready else 503
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
+    warm_up()
     app.run(host='0.0.0.0', port=port, debug=True)
@@ -0,0 +1,225 @@
+"""
+Latency benchmark for the prediction path.
+
+Drives POST /api/predict end to end (through the Flask test client, no
+network) and times every stage in isolation on the same stubbed inputs:
+
+    scaling           scaler.transform
+    rf_probabilities  forest predict_proba
+    kmeans_distances  distances to the K-Means centroids
+    fuzzy_membership  inverse-distance cluster membership
+    fusion            RF / membership fusion and top-3 selection
+    shap              SHAP explanation of the top crop
+    localization      response assembly (advisory, calendar, alerts, translations)
+    json_encoding     serialization of the response body
+    endpoint          the whole /api/predict request
+
+Reports p50 / p95 / p99 latency and single-threaded throughput per stage,
+writes the results as JSON and compares them with a saved baseline:
+
+    cd backend
+    python benchmarks/bench_predict.py --save-baseline
+    ... change something ...
+    python benchmarks/bench_predict.py --max-regression 1.2
+
+Exits with status 1 when a stage's p50 is more than --max-regression times
+its baseline.
+
+The prediction cache is off so the endpoint stage measures the models;
+--prediction-cache measures repeat requests served from it instead.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from fixtures import FIXED_NOW, RESULTS_DIR, install_stubs, make_cases, request_body
+
+STAGES = ("scaling", "rf_probabilities", "kmeans_distances", "fuzzy_membership", "fusion",
+          "shap", "localization", "json_encoding", "endpoint")
+DEFAULT_OUTPUT = os.path.join(RESULTS_DIR, "latest.json")
+DEFAULT_BASELINE = os.path.join(RESULTS_DIR, "baseline.json")
+
+
+def time_stage(fn, n_inputs, iterations, warmup):
+    """Calls fn(i) for i cycling over the inputs; returns per-call seconds."""
+    for i in range(warmup):
+        fn(i % n_inputs)
+    samples = np.empty(iterations, dtype=np.float64)
+    clock = time.perf_counter
+    for i in range(iterations):
+        start = clock()
+        fn(i % n_inputs)
+        samples[i] = clock() - start
+    return samples
+
+
+def summarize(samples):
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "n": int(len(samples)),
+        "mean_ms": float(samples.mean() * 1000),
+        "p50_ms": float(p50 * 1000),
+        "p95_ms": float(p95 * 1000),
+        "p99_ms": float(p99 * 1000),
+        "throughput_per_s": float(len(samples) / samples.sum())
+    }
+
+
+def build_stage_functions(app, prediction_routes, models, cases):
+    """
+    Precomputes every stage's inputs for each case, so each stage is timed on
+    exactly what it receives inside /api/predict.
+    """
+    from services.cluster_membership import compute_fuzzy_membership_batch, combine_with_rf_probabilities_batch
+
+    pr = prediction_routes
+    rows = []
+    for case in cases:
+        lat, lon = case["latitude"], case["longitude"]
+        soil, input_dict, features = pr.collect_inputs(lat, lon)
+        features_arr = np.array([features])
+        scaled = models.scaler.transform(features_arr)
+        rf_probs = models.rf_engine.predict_proba(scaled)
+        distances = models.kmeans_model.transform(scaled)
+        membership, inv_distances = compute_fuzzy_membership_batch(distances, models.cluster_matrix)
+        fusion, top_indices = combine_with_rf_probabilities_batch(rf_probs, membership)
+        rf_classes = models.rf.classes_
+        sorted_crops, membership_scores, cluster_weights = pr.hybrid_row_outputs(
+            rf_classes, membership[0], inv_distances[0], fusion[0], top_indices[0]
+        )
+        explanation = pr.explain_predictions(scaled, top_indices[:, 0], rf_classes, "top", models)[0]
+        lang = case["lang"]
+        response_args = (
+            lat, lon, lang, lang, soil, input_dict, scaled[0], distances[0], sorted_crops,
+            membership_scores, cluster_weights, models.cluster_map, explanation,
+            FIXED_NOW.strftime("%B")
+        )
+        rows.append({
+            "features_arr": features_arr, "scaled": scaled, "rf_probs": rf_probs,
+            "distances": distances, "membership": membership, "top_indices": top_indices,
+            "response_args": response_args, "response": pr.build_prediction_response(*response_args),
+            "body": request_body(case)
+        })
+
+    client = app.test_client()
+
+    def endpoint(i):
+        response = client.post("/api/predict", json=rows[i]["body"])
+        if response.status_code != 200:
+            raise RuntimeError(response.get_data(as_text=True))
+
+    return {
+        "scaling": lambda i: models.scaler.transform(rows[i]["features_arr"]),
+        "rf_probabilities": lambda i: models.rf_engine.predict_proba(rows[i]["scaled"]),
+        "kmeans_distances": lambda i: models.kmeans_model.transform(rows[i]["scaled"]),
+        "fuzzy_membership": lambda i: compute_fuzzy_membership_batch(rows[i]["distances"], models.cluster_matrix),
+        "fusion": lambda i: combine_with_rf_probabilities_batch(rows[i]["rf_probs"], rows[i]["membership"]),
+        "shap": lambda i: pr.explain_predictions(
+            rows[i]["scaled"], rows[i]["top_indices"][:, 0], models.rf.classes_, "top", models
+        ),
+        "localization": lambda i: pr.build_prediction_response(*rows[i]["response_args"]),
+        "json_encoding": lambda i: app.json.response(rows[i]["response"]),
+        "endpoint": endpoint
+    }
+
+
+def compare_with_baseline(results, baseline, max_regression):
+    print(f"\n{'stage':<18}{'p50 base':>10}{'p50 now':>10}{'ratio':>8}")
+    regressions = []
+    for stage, stats in results["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base:
+            continue
+        ratio = stats["p50_ms"] / base["p50_ms"] if base["p50_ms"] else float("inf")
+        flag = ""
+        if max_regression and ratio > max_regression:
+            regressions.append(stage)
+            flag = "  REGRESSION"
+        print(f"{stage:<18}{base['p50_ms']:>10.3f}{stats['p50_ms']:>10.3f}{ratio:>8.2f}{flag}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark /api/predict and each of its stages.")
+    parser.add_argument("--iterations", type=int, default=500, help="Timed calls per stage")
+    parser.add_argument("--endpoint-iterations", type=int, default=200, help="Timed /api/predict requests")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed calls before each stage")
+    parser.add_argument("--cases", type=int, default=40, help="Number of stubbed locations cycled through")
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma-separated stages to run")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Where to write this run's results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Also store this run as the baseline")
+    parser.add_argument("--prediction-cache", action="store_true",
+                        help="Leave the prediction cache on (endpoint requests repeat, so they become hits)")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="Fail when a stage's p50 exceeds the baseline by this factor (e.g. 1.2)")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(unknown)}; choose from {', '.join(STAGES)}")
+
+    warnings.filterwarnings("ignore")
+    cases = make_cases(args.cases)
+    prediction_routes = install_stubs(cases)
+    if not args.prediction_cache:
+        from services.prediction_cache import PredictionCache
+        prediction_routes.prediction_cache = PredictionCache(maxsize=0)
+    from app import app
+    from services.model_service import get_models
+
+    models = get_models()
+    if models is None:
+        print("Models not loaded; train them first (python model/train_model.py).")
+        return 1
+
+    with app.test_request_context():
+        functions = build_stage_functions(app, prediction_routes, models, cases)
+        results = {
+            "created_at": datetime.datetime.utcnow().isoformat(),
+            "model_version": models.version,
+            "environment": {
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count()
+            },
+            "settings": {"iterations": args.iterations, "endpoint_iterations": args.endpoint_iterations,
+                         "warmup": args.warmup, "cases": args.cases, "prediction_cache": args.prediction_cache},
+            "stages": {}
+        }
+        print(f"{'stage':<18}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>12}")
+        for stage in stages:
+            iterations = args.endpoint_iterations if stage == "endpoint" else args.iterations
+            stats = summarize(time_stage(functions[stage], len(cases), iterations, args.warmup))
+            results["stages"][stage] = stats
+            print(f"{stage:<18}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}"
+                  f"{stats['p99_ms']:>10.3f}{stats['throughput_per_s']:>12.1f}")
+
+    for path in [args.output] + ([args.baseline] if args.save_baseline else []):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}" + (f" and {args.baseline}" if args.save_baseline else ""))
+
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("model_version") != results["model_version"]:
+            print(f"Note: baseline was measured with model {baseline.get('model_version')}")
+        if compare_with_baseline(results, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
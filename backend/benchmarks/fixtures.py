@@ -0,0 +1,91 @@
+"""
+Fixed inputs shared by the benchmark and the golden-output check.
+
+install_stubs() replaces the weather and soil lookups used by /api/predict
+with deterministic values per location and pins the clock used for the
+month-dependent parts of the response (crop calendar month, pest alerts), so
+two runs of the same code produce byte-identical responses.
+"""
+
+import datetime
+import os
+import random
+import sys
+import types
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+# Month used for calendar and pest alerts in every stubbed response
+FIXED_NOW = datetime.datetime(2024, 7, 15, 6, 0, 0)
+
+LANGUAGES = ("en", "hi", "mr", "es", "fr")
+
+
+class _FixedDatetime(datetime.datetime):
+    @classmethod
+    def utcnow(cls):
+        return FIXED_NOW
+
+    @classmethod
+    def now(cls, tz=None):
+        return FIXED_NOW if tz is None else FIXED_NOW.replace(tzinfo=tz)
+
+
+def make_cases(n_cases=40, seed=7):
+    """
+    Deterministic (lat, lon, soil, weather) cases spanning the training ranges
+    of every feature, so all crops and clusters get exercised.
+    """
+    rng = random.Random(seed)
+    cases = []
+    for idx in range(n_cases):
+        lat = round(8.0 + 28.0 * rng.random(), 4)
+        lon = round(68.0 + 29.0 * rng.random(), 4)
+        soil = {
+            "N": rng.randint(0, 140),
+            "P": rng.randint(5, 145),
+            "K": rng.randint(5, 205),
+            "ph": round(rng.uniform(3.5, 9.9), 1)
+        }
+        weather = {
+            "temperature": round(rng.uniform(9.0, 43.0), 2),
+            "humidity": round(rng.uniform(15.0, 99.0), 2),
+            "rainfall": round(rng.uniform(20.0, 298.0), 2)
+        }
+        cases.append({
+            "latitude": lat,
+            "longitude": lon,
+            "lang": LANGUAGES[idx % len(LANGUAGES)],
+            "soil": soil,
+            "weather": weather
+        })
+    return cases
+
+
+def install_stubs(cases):
+    """
+    Patches routes.prediction_routes so /api/predict serves the cases' soil and
+    weather instead of calling OpenWeather or the soil grid. Returns the module.
+    """
+    import routes.prediction_routes as prediction_routes
+
+    by_location = {(case["latitude"], case["longitude"]): case for case in cases}
+
+    def lookup(lat, lon):
+        case = by_location.get((float(lat), float(lon)))
+        if case is None:
+            raise KeyError(f"No benchmark case for location {lat}, {lon}")
+        return case
+
+    prediction_routes.get_weather = lambda lat, lon: dict(lookup(lat, lon)["weather"])
+    prediction_routes.get_soil_data = lambda lat, lon: dict(lookup(lat, lon)["soil"])
+    prediction_routes.datetime = types.SimpleNamespace(datetime=_FixedDatetime)
+    return prediction_routes
+
+
+def request_body(case, explain="top"):
+    return {"latitude": case["latitude"], "longitude": case["longitude"], "lang": case["lang"], "explain": explain}
@@ -0,0 +1,142 @@
+"""
+Golden-output check for the prediction path.
+
+Record the responses of the current code once, then check that a change
+(an optimization, a new model format, ...) leaves them unchanged:
+
+    cd backend
+    python benchmarks/golden_check.py --record
+    python benchmarks/golden_check.py
+
+Weather and soil are stubbed (see fixtures.py). Recommended crops and their
+confidences must match exactly; every other number must match within
+--rtol (default 1e-9, use --exact for bit-for-bit equality). Exits with
+status 1 on any difference.
+
+With the prediction cache on (the default), batch rows can be served from
+entries computed for a single /api/predict call, whose floats may differ
+from the batched computation in the last bit; run --exact with
+PREDICTION_CACHE_SIZE=0.
+
+The golden file depends on the trained artifacts: record it again after
+retraining.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import warnings
+
+from fixtures import RESULTS_DIR, install_stubs, make_cases, request_body
+
+DEFAULT_GOLDEN_PATH = os.path.join(RESULTS_DIR, "golden_predictions.json")
+# Explained with explain=full as well as the default explain=top
+FULL_EXPLAIN_CASES = 5
+EXACT_FIELDS = ("recommendations", "recommended_crops")
+
+
+def collect_responses(client, cases):
+    responses = {}
+    for idx, case in enumerate(cases):
+        modes = ("top", "full", "none") if idx < FULL_EXPLAIN_CASES else ("top",)
+        for explain in modes:
+            response = client.post("/api/predict", json=request_body(case, explain))
+            if response.status_code != 200:
+                raise RuntimeError(f"/api/predict failed for case {idx}: {response.get_data(as_text=True)}")
+            responses[f"predict/{idx}/{explain}"] = response.get_json()
+
+    batch = client.post("/api/predict/batch", json={
+        "locations": [{"latitude": c["latitude"], "longitude": c["longitude"]} for c in cases],
+        "lang": "en",
+        "explain": "top"
+    })
+    if batch.status_code != 200:
+        raise RuntimeError(f"/api/predict/batch failed: {batch.get_data(as_text=True)}")
+    responses["predict_batch"] = batch.get_json()
+    return responses
+
+
+def compare(expected, actual, path, rtol, differences):
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in sorted(set(expected) | set(actual)):
+            if key not in actual:
+                differences.append(f"{path}.{key}: missing")
+            elif key not in expected:
+                differences.append(f"{path}.{key}: unexpected")
+            else:
+                compare(expected[key], actual[key], f"{path}.{key}", rtol, differences)
+    elif isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            differences.append(f"{path}: length {len(expected)} != {len(actual)}")
+            return
+        for idx, (exp, act) in enumerate(zip(expected, actual)):
+            compare(exp, act, f"{path}[{idx}]", rtol, differences)
+    elif (isinstance(expected, float) or isinstance(actual, float)) and \
+            isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        if not math.isclose(expected, actual, rel_tol=rtol, abs_tol=0.0 if rtol == 0 else 1e-12):
+            differences.append(f"{path}: {expected!r} != {actual!r}")
+    elif expected != actual:
+        differences.append(f"{path}: {expected!r} != {actual!r}")
+
+
+def check(golden, responses, rtol):
+    differences = []
+    for key in sorted(set(golden) | set(responses)):
+        if key not in responses or key not in golden:
+            differences.append(f"{key}: {'missing' if key not in responses else 'not in golden file'}")
+            continue
+        expected, actual = golden[key], responses[key]
+        rows = list(zip(expected["results"], actual["results"])) if key == "predict_batch" else [(expected, actual)]
+        for field in EXACT_FIELDS:
+            for exp, act in rows:
+                if exp.get(field) != act.get(field):
+                    differences.append(f"{key}.{field}: {exp.get(field)!r} != {act.get(field)!r}")
+        compare(expected, actual, key, rtol, differences)
+    return differences
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Record or check golden /api/predict outputs.")
+    parser.add_argument("--record", action="store_true", help="Write the golden file from the current code")
+    parser.add_argument("--golden", default=DEFAULT_GOLDEN_PATH, help="Golden file path")
+    parser.add_argument("--cases", type=int, default=40, help="Number of stubbed locations")
+    parser.add_argument("--rtol", type=float, default=1e-9, help="Relative tolerance for other numbers")
+    parser.add_argument("--exact", action="store_true", help="Require bit-for-bit equal numbers")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    cases = make_cases(args.cases)
+    install_stubs(cases)
+    from app import app
+
+    responses = collect_responses(app.test_client(), cases)
+
+    if args.record:
+        os.makedirs(os.path.dirname(os.path.abspath(args.golden)), exist_ok=True)
+        with open(args.golden, "w", encoding="utf-8") as f:
+            json.dump(responses, f, indent=1, sort_keys=True, ensure_ascii=False)
+        print(f"Recorded {len(responses)} golden responses to {args.golden}")
+        return 0
+
+    if not os.path.exists(args.golden):
+        print(f"No golden file at {args.golden}; run with --record first.")
+        return 1
+    with open(args.golden, "r", encoding="utf-8") as f:
+        golden = json.load(f)
+
+    differences = check(golden, responses, 0.0 if args.exact else args.rtol)
+    if differences:
+        print(f"{len(differences)} difference(s) from {args.golden}:")
+        for line in differences[:50]:
+            print(f"  {line}")
+        if len(differences) > 50:
+            print(f"  ... and {len(differences) - 50} more")
+        return 1
+    print(f"All {len(responses)} responses match {args.golden}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+"""
+gunicorn settings for the backend. Run from backend/:
+
+    gunicorn -c gunicorn.conf.py
+
+The app is imported (models loaded, pipeline warmed up) once in the master and
+shared copy-on-write by the forked workers. Each worker then repeats the cheap
+warm-up in post_worker_init, before it accepts its first request, and
+GET /api/ready reports 200 only after that.
+"""
+
+import multiprocessing
+import os
+
+wsgi_app = "wsgi:application"
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.getenv("GUNICORN_THREADS", 1))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+# Recycle workers after this many requests (0 = never), with jitter so they do not restart together
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+preload_app = True
+accesslog = "-"
+
+
+def post_worker_init(worker):
+    from app import warm_up
+
+    if not warm_up():
+        worker.log.warning("Warm-up failed in worker %s, /api/ready reports 503", worker.pid)
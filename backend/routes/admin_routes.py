@@ -0,0 +1,41 @@
+import hmac
+import os
+from flask import Blueprint, request, jsonify
+from services.model_service import get_model_registry
+
+admin_bp = Blueprint('admin', __name__)
+
+# Admin requests must send "Authorization: Bearer <token>"; without a token the API is disabled
+MODEL_ADMIN_TOKEN = os.getenv('MODEL_ADMIN_TOKEN')
+
+@admin_bp.before_request
+def check_admin_token():
+    if not MODEL_ADMIN_TOKEN:
+        return jsonify({"error": "Admin API disabled, set MODEL_ADMIN_TOKEN to enable it"}), 403
+    supplied = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(supplied.encode('utf-8'), f"Bearer {MODEL_ADMIN_TOKEN}".encode('utf-8')):
+        return jsonify({"error": "Unauthorized"}), 401
+    return None
+
+@admin_bp.route('/models', methods=['GET'])
+def get_model_status():
+    """
+    Live model version, reload state, last error and recent versions of this worker.
+    """
+    return jsonify(get_model_registry().status())
+
+@admin_bp.route('/models/reload', methods=['POST'])
+def reload_models():
+    """
+    Loads the current artifacts in the background, warms them up and swaps them
+    in; in-flight requests finish on the previous version. Returns 202, or 200
+    with the outcome when called with ?wait=1. ?force=1 reloads even when the
+    version is unchanged.
+
+    Only the worker receiving the request reloads; with several gunicorn workers
+    set MODEL_WATCH_INTERVAL so every worker picks up new artifacts by itself.
+    """
+    wait = request.args.get('wait', '').lower() in ('1', 'true', 'yes')
+    force = request.args.get('force', '').lower() in ('1', 'true', 'yes')
+    status = get_model_registry().reload(wait=wait, force=force)
+    return jsonify(status), 200 if wait else 202
@@ -1,110 +1,158 @@
 import os
-import json
 import joblib
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request, current_app
+from services.dashboard_store import get_dashboard_snapshot
+from services.feedback_log import feedback_log
+from services.geocode_service import get_geocode_cache
+from services.prediction_cache import prediction_cache
+from services.upstream_client import get_upstream_stats
+from services.weather_service import get_weather_cache_stats
 
 dev_bp = Blueprint('dev', __name__)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DASHBOARD_DATA_PATH = os.path.join(BASE_DIR, '../../model/dashboard_data.json')
 
-def load_dashboard_data():
-    try:
-        with open(DASHBOARD_DATA_PATH, 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Error loading dashboard data: {e}")
-        return None
+# Browsers revalidate on every load (no-cache) and get 304 when nothing changed;
+# set DASHBOARD_CACHE_MAX_AGE to let them reuse responses without asking.
+DASHBOARD_CACHE_MAX_AGE = int(os.getenv('DASHBOARD_CACHE_MAX_AGE', 0))
+
+# Route name -> key in dashboard_data.json, as served by the section routes below
+DASHBOARD_SECTIONS = {
+    'class-distribution': 'class_distribution',
+    'correlation-matrix': 'correlation_matrix',
+    'model-comparison': 'model_comparison',
+    'cross-validation': 'cross_validation',
+    'feature-importance': 'feature_importance',
+    'cluster-visualization': 'cluster_visualization',
+    'membership-scores': 'membership_scores',
+    'shap-summary': 'shap_summary',
+    'boxplot-features': 'boxplot_features',
+    'kmeans-counts': 'kmeans_cluster_counts',
+    'cluster-map': 'cluster_map_heatmap',
+    'feature-importance-adaboost': 'feature_importance_adaboost',
+    'feature-importance-gb': 'feature_importance_gradient_boosting',
+    'shap-local': 'shap_local',
+    'confusion-matrix': 'confusion_matrix'
+}
+
+def set_cache_control(response):
+    if DASHBOARD_CACHE_MAX_AGE > 0:
+        response.headers['Cache-Control'] = f'public, max-age={DASHBOARD_CACHE_MAX_AGE}'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+
+def dashboard_section_response(key):
+    """
+    Serves one pre-serialized section of dashboard_data.json with a strong ETag.
+    A matching If-None-Match gets 304 Not Modified without touching the body.
+    """
+    snapshot = get_dashboard_snapshot()
+    if not snapshot: return jsonify({"error": "Data not found"}), 500
+    if key not in snapshot.sections: return jsonify({"error": f"Section '{key}' not found"}), 404
+
+    body, etag = snapshot.sections[key]
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    set_cache_control(response)
+    return response.make_conditional(request)
+
+@dev_bp.route('/bundle', methods=['GET'])
+def get_dashboard_bundle():
+    """
+    Returns several dashboard sections in one response:
+        GET /api/dev/bundle?sections=class-distribution,shap-summary
+    Sections are the route names above (default: all of them) and the result
+    is keyed by them. The body is gzip-compressed when the client accepts it.
+    With stream=1 the sections are sent as NDJSON lines
+    {"section": name, "data": ...}, each flushed as soon as it is written.
+    """
+    snapshot = get_dashboard_snapshot()
+    if not snapshot: return jsonify({"error": "Data not found"}), 500
+
+    requested = [name.strip() for name in request.args.get('sections', '').split(',') if name.strip()]
+    names = list(dict.fromkeys(requested)) or list(DASHBOARD_SECTIONS)
+    unknown = [name for name in names if name not in DASHBOARD_SECTIONS]
+    if unknown:
+        return jsonify({"error": f"Unknown sections: {', '.join(unknown)}", "available": list(DASHBOARD_SECTIONS)}), 400
+    parts = [(name, DASHBOARD_SECTIONS[name]) for name in names]
+    missing = [name for name, key in parts if key not in snapshot.sections]
+    if missing:
+        return jsonify({"error": f"Sections not found: {', '.join(missing)}"}), 404
+
+    compress = 'gzip' in request.accept_encodings
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        response = current_app.response_class(snapshot.stream(parts, compress), mimetype='application/x-ndjson')
+        # Tell reverse proxies (nginx) not to buffer the stream
+        response.headers['X-Accel-Buffering'] = 'no'
+    else:
+        body, etag = snapshot.bundle(parts, compress)
+        response = current_app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        set_cache_control(response)
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response if response.is_streamed else response.make_conditional(request)
 
 @dev_bp.route('/class-distribution', methods=['GET'])
 def get_class_distribution():
-    data = load_dashboard_data()
-    if not data: return jsonify({"error": "Data not found"}), 500
-    return jsonify(data["class_distribution"])
+    return dashboard_section_response("class_distribution")
 
 @dev_bp.route('/correlation-matrix', methods=['GET'])
 def get_correlation_matrix():
-    data = load_dashboard_data()
-    if not data: return jsonify({"error": "Data not found"}), 500
-    return jsonify(data["correlation_matrix"])
+    return dashboard_section_response("correlation_matrix")
 
 @dev_bp.route('/model-comparison', methods=['GET'])
 def get_model_comparison():
-    data = load_dashboard_data()
-    if not data: return jsonify({"error": "Data not found"}), 500
-    return jsonify(data["model_comparison"])
+    return dashboard_section_response("model_comparison")
 
 @dev_bp.route('/cross-validation', methods=['GET'])
 def get_cross_validation():
-    data = load_dashboard_data()
-    if not data: return jsonify({"error": "Data not found"}), 500
-    return jsonify(data["cross_validation"])
+    return dashboard_section_response("cross_validation")
 
 @dev_bp.route('/feature-importance', methods=['GET'])
 def get_feature_importance():
-    data = load_dashboard_data()
-    if not data: return jsonify({"error": "Data not found"}), 500
-    return jsonify(data["feature_importance"])
+    return dashboard_section_response("feature_importance")
 
 @dev_bp.route('/cluster-visualization', methods=['GET'])
 def get_cluster_visualization():
-    data = load_dashboard_data()
-    if not data: return jsonify({"error": "Data not found"}), 500
-    return jsonify(data["cluster_visualization"])
+    return dashboard_section_response("cluster_visualization")
 
 @dev_bp.route('/membership-scores', methods=['GET'])
 def get_membership_scores():
-    data = load_dashboard_data()
-    if not data: return jsonify({"error": "Data not found"}), 500
-    return jsonify(data["membership_scores"])
+    return dashboard_section_response("membership_scores")
 
 @dev_bp.route('/shap-summary', methods=['GET'])
 def get_shap_summary():
-    data = load_dashboard_data()
-    if not data: return jsonify({"error": "Data not found"}), 500
-    return jsonify(data["shap_summary"])
+    return dashboard_section_response("shap_summary")
 
 @dev_bp.route('/boxplot-features', methods=['GET'])
 def get_boxplot_features():
-    data = load_dashboard_data()
-    if not data: return jsonify({"error": "Data not found"}), 500
-    return jsonify(data["boxplot_features"])
+    return dashboard_section_response("boxplot_features")
 
 @dev_bp.route('/kmeans-counts', methods=['GET'])
 def get_kmeans_counts():
-    data = load_dashboard_data()
-    if not data: return jsonify({"error": "Data not found"}), 500
-    return jsonify(data["kmeans_cluster_counts"])
+    return dashboard_section_response("kmeans_cluster_counts")
 
 @dev_bp.route('/cluster-map', methods=['GET'])
 def get_cluster_map():
-    data = load_dashboard_data()
-    if not data: return jsonify({"error": "Data not found"}), 500
-    return jsonify(data["cluster_map_heatmap"])
+    return dashboard_section_response("cluster_map_heatmap")
 
 @dev_bp.route('/feature-importance-adaboost', methods=['GET'])
 def get_feature_importance_adaboost():
-    data = load_dashboard_data()
-    if not data: return jsonify({"error": "Data not found"}), 500
-    return jsonify(data["feature_importance_adaboost"])
+    return dashboard_section_response("feature_importance_adaboost")
 
 @dev_bp.route('/feature-importance-gb', methods=['GET'])
 def get_feature_importance_gb():
-    data = load_dashboard_data()
-    if not data: return jsonify({"error": "Data not found"}), 500
-    return jsonify(data["feature_importance_gradient_boosting"])
+    return dashboard_section_response("feature_importance_gradient_boosting")
 
 @dev_bp.route('/shap-local', methods=['GET'])
 def get_shap_local():
-    data = load_dashboard_data()
-    if not data: return jsonify({"error": "Data not found"}), 500
-    return jsonify(data["shap_local"])
+    return dashboard_section_response("shap_local")
 
 @dev_bp.route('/confusion-matrix', methods=['GET'])
 def get_confusion_matrix():
-    data = load_dashboard_data()
-    if not data: return jsonify({"error": "Data not found"}), 500
-    return jsonify(data["confusion_matrix"])
+    return dashboard_section_response("confusion_matrix")
 
 @dev_bp.route('/scaler-params', methods=['GET'])
 def get_scaler_params():
@@ -123,6 +171,26 @@ def get_scaler_params():
         print(f"Error loading scaler: {e}")
         return jsonify({"error": "Scaler not found"}), 500
 
+@dev_bp.route('/weather-cache', methods=['GET'])
+def get_weather_cache():
+    return jsonify(get_weather_cache_stats())
+
+@dev_bp.route('/prediction-cache', methods=['GET'])
+def get_prediction_cache_stats():
+    return jsonify(prediction_cache.stats())
+
+@dev_bp.route('/feedback-log', methods=['GET'])
+def get_feedback_log_stats():
+    return jsonify(feedback_log.stats())
+
+@dev_bp.route('/upstreams', methods=['GET'])
+def get_upstreams():
+    return jsonify(get_upstream_stats())
+
+@dev_bp.route('/geocode-cache', methods=['GET'])
+def get_geocode_cache_stats():
+    return jsonify(get_geocode_cache().stats())
+
 from flask import send_from_directory
 
 @dev_bp.route('/plots/<filename>', methods=['GET'])
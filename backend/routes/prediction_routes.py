@@ -1,7 +1,27 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
+from services.model_service import get_models
+from services.metrics import NULL_TIMER, start_stage_timer
+from services.json_encoding import gzip_json_response
+from services.localization import catalog
+from services.prediction_cache import prediction_cache
+from services.feedback_log import FeedbackQueueFull, feedback_log
+from services.cluster_membership import compute_fuzzy_membership_batch, combine_with_rf_probabilities_batch
+from services.weather_service import get_weather, get_soil_data
+import numpy as np
+import calendar
+import datetime
+import os
 
 prediction_bp = Blueprint('prediction', __name__)
 
+@prediction_bp.after_request
+def add_model_version_header(response):
+    # Version of the models that served this request (set when the request took them)
+    version = g.get('model_version')
+    if version:
+        response.headers['X-Model-Version'] = version
+    return response
+
 # Soil health analysis logic
 def analyze_soil(soil):
     # Simple scoring: 0-100, higher is better
@@ -33,27 +53,7 @@ def analyze_soil(soil):
         "soil_quality": quality,
         "soil_recommendations": recs
     }
-# Crop calendar and advisory logic
-import calendar
 
-# Example crop calendar (expand as needed)
-CROP_CALENDAR = {
-    "rice": {"planting": ["June", "July"], "harvest": ["October", "November"]},
-    "wheat": {"planting": ["November", "December"], "harvest": ["March", "April"]},
-    "maize": {"planting": ["June", "July"], "harvest": ["September", "October"]},
-    "chickpea": {"planting": ["October", "November"], "harvest": ["February", "March"]},
-    # ... add more crops as needed
-}
-
-# Example pest/disease alert logic (simple demo)
-def get_pest_disease_alert(crop, month):
-    alerts = {
-        "rice": {"July": "Watch for rice stem borer.", "October": "Monitor for blast disease."},
-        "wheat": {"December": "Rust risk increases in cool, wet weather."},
-        "maize": {"July": "Check for fall armyworm."},
-        # ... add more as needed
-    }
-    return alerts.get(crop, {}).get(month, "No major alerts.")
 @prediction_bp.route('/mapdata', methods=['GET'])
 def get_map_data():
     """
@@ -61,10 +61,12 @@ def get_map_data():
     For demo, returns cluster_map and mock centroids (since real lat/lon not in dataset).
     """
     try:
-        cluster_map = get_cluster_map()
-        kmeans = get_kmeans_model()
+        models = get_models()
+        if models is not None:
+            g.model_version = models.version
+        cluster_map = models.cluster_map if models else None
         # Mock centroids: treat feature space as pseudo-coordinates
-        centroids = kmeans.cluster_centers_.tolist() if kmeans else []
+        centroids = models.kmeans_model.cluster_centers_.tolist() if models else []
         # Each centroid is [N, P, K, temperature, humidity, ph, rainfall]
         # For visualization, you may map temperature/humidity/rainfall to color/size
         return jsonify({
@@ -75,13 +77,16 @@ def get_map_data():
     except Exception as e:
         print(f"Map data error: {e}")
         return jsonify({"error": str(e)}), 500
-import json
-import datetime
+
 # Add user feedback endpoint
 @prediction_bp.route('/feedback', methods=['POST'])
 def submit_feedback():
+    """
+    Queues the feedback for the background writer (services/feedback_log.py);
+    the request never waits for the disk. 503 when the writer is too far behind.
+    """
     try:
-        data = request.json
+        data = request.json or {}
         feedback = {
             "timestamp": datetime.datetime.utcnow().isoformat(),
             "latitude": data.get("latitude"),
@@ -90,147 +95,24 @@ def submit_feedback():
             "feedback": data.get("feedback"),  # e.g., 'accepted', 'rejected', 'notes', etc.
             "user_notes": data.get("user_notes", "")
         }
-        # Save feedback to a local file (append mode)
-        feedback_file = 'user_feedback.jsonl'
-        with open(feedback_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(feedback) + '\n')
+        feedback_log.submit(feedback)
         return jsonify({"status": "success", "message": "Feedback recorded."})
+    except FeedbackQueueFull as e:
+        print(f"Feedback error: {e}")
+        response = jsonify({"status": "error", "message": "Feedback is not accepted right now, try again later."})
+        response.headers['Retry-After'] = '5'
+        return response, 503
     except Exception as e:
         print(f"Feedback error: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
-from flask import Blueprint, request, jsonify
-from services.model_service import get_rf_model, get_kmeans_model, get_scaler, get_cluster_map
-import shap
-from services.weather_service import get_weather, get_soil_data
-import numpy as np
-
-prediction_bp = Blueprint('prediction', __name__)
+# Languages, translations, crop calendar and alerts live in data/localization.json
+SUPPORTED_LANGUAGES = catalog.languages
 
-SUPPORTED_LANGUAGES = {
-    "en": "English",
-    "hi": "Hindi",
-    "mr": "Marathi",
-    "es": "Spanish",
-    "fr": "French",
-}
-
-TRANSLATIONS = {
-    "hi": {
-        "Soil is balanced.": "मिट्टी संतुलित है।",
-        "Standard irrigation required.": "सामान्य सिंचाई आवश्यक है।",
-        "Kharif/Rabi depending on region": "क्षेत्र के अनुसार खरीफ/रबी।",
-        "Estimated soil values based on location.": "स्थान के आधार पर मिट्टी के अनुमानित मान।",
-        "High Nitrogen deficiency detected. Recommend applying Urea.": "नाइट्रोजन की कमी पाई गई। यूरिया डालने की सलाह है।",
-        "Phosphorus levels are low. Consider DAP application.": "फॉस्फोरस कम है। डीएपी का प्रयोग करें।",
-        "Potassium is low. Apply Muriate of Potash (MOP).": "पोटैशियम कम है। म्यूरेट ऑफ पोटाश (MOP) डालें।",
-        "Low rainfall expected. Implement drip irrigation.": "कम वर्षा की संभावना है। ड्रिप सिंचाई अपनाएं।",
-        "Heavy rainfall. Ensure proper drainage to avoid water logging.": "अधिक वर्षा है। जलभराव रोकने के लिए निकासी सुनिश्चित करें।",
-        "Kharif (Monsoon)": "खरीफ (मानसून)",
-        "Rabi (Winter)": "रबी (सर्दी)",
-        "rice": "धान",
-        "maize": "मक्का",
-        "chickpea": "चना",
-        "kidneybeans": "राजमा",
-        "pigeonpeas": "अरहर",
-        "mothbeans": "मठ",
-        "mungbean": "मूंग",
-        "blackgram": "उड़द",
-        "lentil": "मसूर",
-        "pomegranate": "अनार",
-        "banana": "केला",
-        "mango": "आम",
-        "grapes": "अंगूर",
-        "watermelon": "तरबूज",
-        "muskmelon": "खरबूजा",
-        "apple": "सेब",
-        "orange": "संतरा",
-        "papaya": "पपीता",
-        "coconut": "नारियल",
-        "cotton": "कपास",
-        "jute": "जूट",
-        "coffee": "कॉफी",
-    },
-    "mr": {
-        "Soil is balanced.": "माती संतुलित आहे.",
-        "Standard irrigation required.": "नेहमीची सिंचन पद्धत आवश्यक आहे.",
-        "Kharif/Rabi depending on region": "प्रदेशानुसार खरीप/रब्बी.",
-        "Estimated soil values based on location.": "स्थानावर आधारित मातीचे अंदाजे मूल्य.",
-        "High Nitrogen deficiency detected. Recommend applying Urea.": "नायट्रोजनची कमतरता आढळली. युरिया वापरण्याची शिफारस.",
-        "Phosphorus levels are low. Consider DAP application.": "फॉस्फरस कमी आहे. डीएपी वापरा.",
-        "Potassium is low. Apply Muriate of Potash (MOP).": "पोटॅशियम कमी आहे. म्युरिएट ऑफ पोटॅश (MOP) वापरा.",
-        "Low rainfall expected. Implement drip irrigation.": "पावसाचे प्रमाण कमी अपेक्षित आहे. ठिबक सिंचन वापरा.",
-        "Heavy rainfall. Ensure proper drainage to avoid water logging.": "जास्त पाऊस आहे. पाणी साचू नये म्हणून निचरा सुनिश्चित करा.",
-        "Kharif (Monsoon)": "खरीप (पावसाळा)",
-        "Rabi (Winter)": "रब्बी (हिवाळा)",
-        "rice": "तांदूळ",
-        "maize": "मका",
-        "chickpea": "हरभरा",
-        "kidneybeans": "राजमा",
-        "pigeonpeas": "तूर",
-        "mothbeans": "मटकी",
-        "mungbean": "मुग",
-        "blackgram": "उडीद",
-        "lentil": "मसूर",
-        "pomegranate": "डाळिंब",
-        "banana": "केळी",
-        "mango": "आंबा",
-        "grapes": "द्राक्षे",
-        "watermelon": "कलिंगड",
-        "muskmelon": "खरबूज",
-        "apple": "सफरचंद",
-        "orange": "संत्रे",
-        "papaya": "पपई",
-        "coconut": "नारळ",
-        "cotton": "कापूस",
-        "jute": "पटसन",
-        "coffee": "कॉफी",
-    },
-    "es": {
-        "Soil is balanced.": "El suelo está equilibrado.",
-        "Standard irrigation required.": "Se requiere riego estándar.",
-        "Kharif/Rabi depending on region": "Kharif/Rabi según la región.",
-        "Estimated soil values based on location.": "Valores del suelo estimados según la ubicación.",
-        "High Nitrogen deficiency detected. Recommend applying Urea.": "Se detectó alta deficiencia de nitrógeno. Se recomienda aplicar urea.",
-        "Phosphorus levels are low. Consider DAP application.": "Los niveles de fósforo son bajos. Considere aplicar DAP.",
-        "Potassium is low. Apply Muriate of Potash (MOP).": "El potasio es bajo. Aplique muriato de potasa (MOP).",
-        "Low rainfall expected. Implement drip irrigation.": "Se espera poca lluvia. Implemente riego por goteo.",
-        "Heavy rainfall. Ensure proper drainage to avoid water logging.": "Lluvia intensa. Asegure un buen drenaje para evitar encharcamientos.",
-        "Kharif (Monsoon)": "Kharif (Monzón)",
-        "Rabi (Winter)": "Rabi (Invierno)",
-    },
-    "fr": {
-        "Soil is balanced.": "Le sol est équilibré.",
-        "Standard irrigation required.": "Une irrigation standard est nécessaire.",
-        "Kharif/Rabi depending on region": "Kharif/Rabi selon la région.",
-        "Estimated soil values based on location.": "Valeurs du sol estimées selon l'emplacement.",
-        "High Nitrogen deficiency detected. Recommend applying Urea.": "Forte carence en azote détectée. L'application d'urée est recommandée.",
-        "Phosphorus levels are low. Consider DAP application.": "Le niveau de phosphore est faible. Envisagez l'application de DAP.",
-        "Potassium is low. Apply Muriate of Potash (MOP).": "Le potassium est faible. Appliquez du muriate de potasse (MOP).",
-        "Low rainfall expected. Implement drip irrigation.": "Faibles précipitations attendues. Mettez en place une irrigation goutte à goutte.",
-        "Heavy rainfall. Ensure proper drainage to avoid water logging.": "Fortes pluies. Assurez un bon drainage pour éviter la stagnation de l'eau.",
-        "Kharif (Monsoon)": "Kharif (Mousson)",
-        "Rabi (Winter)": "Rabi (Hiver)",
-    },
-}
-
-
-def translate_text(text, lang):
-    if lang == "en":
-        return text
-    return TRANSLATIONS.get(lang, {}).get(text, text)
-
-
-def localize_advisory(advisory, lang):
-    return {key: translate_text(value, lang) for key, value in advisory.items()}
-
-
-def localize_crop_name(crop_name, lang):
-    return translate_text(crop_name, lang)
-
-def get_advisory(prediction, inputs):
-    """
-    Rule-based advisory generation.
+def select_advisory(prediction, inputs):
+    """
+    Rule-based advisory generation. Returns one advisory text key per
+    localization.ADVISORY_SLOTS entry; the texts are in the catalog.
     """
     crop = prediction['crop']
     N = inputs['N']
@@ -238,219 +120,643 @@ def get_advisory(prediction, inputs):
     K = inputs['K']
     rain = inputs['rainfall']
     
-    advisory = {
-        "fertilizer_tip": "Soil is balanced.",
-        "irrigation_tip": "Standard irrigation required.",
-        "best_season": "Kharif/Rabi depending on region",
-        "soil_note": "Estimated soil values based on location."
-    }
+    fertilizer_tip = "balanced"
+    irrigation_tip = "standard"
+    best_season = "regional"
+    soil_note = "estimated"
     
     # Fertilizer Rules
     if N < 50:
-        advisory['fertilizer_tip'] = "High Nitrogen deficiency detected. Recommend applying Urea."
+        fertilizer_tip = "low_nitrogen"
     elif P < 40:
-        advisory['fertilizer_tip'] = "Phosphorus levels are low. Consider DAP application."
+        fertilizer_tip = "low_phosphorus"
     elif K < 40:
-        advisory['fertilizer_tip'] = "Potassium is low. Apply Muriate of Potash (MOP)."
+        fertilizer_tip = "low_potassium"
         
     # Irrigation
     if rain < 50:
-        advisory['irrigation_tip'] = "Low rainfall expected. Implement drip irrigation."
+        irrigation_tip = "low_rainfall"
     elif rain > 200:
-        advisory['irrigation_tip'] = "Heavy rainfall. Ensure proper drainage to avoid water logging."
+        irrigation_tip = "heavy_rainfall"
         
     # Crop specific (Simple example)
     if crop.lower() in ['rice', 'jute']:
-        advisory['best_season'] = "Kharif (Monsoon)"
+        best_season = "kharif"
     elif crop.lower() in ['wheat', 'chickpea']:
-        advisory['best_season'] = "Rabi (Winter)"
+        best_season = "rabi"
+        
+    return (fertilizer_tip, irrigation_tip, best_season, soil_note)
+
+FEATURE_NAMES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+# Upper bound on locations accepted by a single /predict/batch call
+PREDICT_BATCH_MAX = int(os.getenv('PREDICT_BATCH_MAX', 1000))
+
+# Nearest training rows returned for similar_samples=true and by /neighbors (k at most NEIGHBORS_MAX_K)
+NEIGHBORS_DEFAULT_K = int(os.getenv('NEIGHBORS_DEFAULT_K', 5))
+NEIGHBORS_MAX_K = int(os.getenv('NEIGHBORS_MAX_K', 50))
+
+
+def resolve_language(data):
+    requested_lang = (data.get('lang') or 'en').lower().strip()
+    lang = requested_lang if requested_lang in SUPPORTED_LANGUAGES else 'en'
+    return requested_lang, lang
+
+
+def collect_inputs(lat, lon, timer=NULL_TIMER):
+    """
+    Fetches weather and soil for a location and builds the model input vector.
+    """
+    weather = get_weather(lat, lon)
+    timer.mark('weather')
+    soil = get_soil_data(lat, lon)
+    timer.mark('soil')
+    
+    # Prepare Input Vector [N, P, K, Temp, Hum, pH, Rain]
+    input_dict = {**soil, **weather}
+    features = [input_dict[name] for name in FEATURE_NAMES]
+    return soil, input_dict, features
+
+
+# explain=none skips SHAP, top explains the top crop, full explains every crop
+EXPLAIN_MODES = ('none', 'top', 'full')
+
+
+def resolve_explain_mode(data):
+    mode = (data.get('explain') or request.args.get('explain') or 'top').lower().strip()
+    return mode if mode in EXPLAIN_MODES else None
+
+
+def select_class_shap(shap_values, sample_idx, class_idx):
+    # Older shap versions return one array per class, newer ones a 3D array
+    if isinstance(shap_values, list):
+        return shap_values[class_idx][sample_idx]
+    if hasattr(shap_values, 'shape') and len(shap_values.shape) == 3:
+        return shap_values[sample_idx, :, class_idx]
+    return shap_values[sample_idx]
+
+
+def format_feature_impact(values):
+    shap_impact = {name: float(v) for name, v in zip(FEATURE_NAMES, values)}
+    # Sort by absolute impact
+    return sorted(shap_impact.items(), key=lambda x: abs(x[1]), reverse=True)
+
+
+def explain_predictions(features_scaled, class_indices, rf_classes, mode, models):
+    """
+    SHAP explanation for every row of features_scaled, using the explainers
+    built once per model version (models is the request's ModelSet).
+    Returns one explanation (or None) per row.
+    
+    mode 'top' only computes SHAP values for each row's top crop class;
+    mode 'full' also returns the feature impact for every crop.
+    """
+    n_rows = len(class_indices)
+    if mode == 'none':
+        return [None] * n_rows
         
-    return advisory
+    try:
+        if mode == 'full':
+            shap_values = models.shap_explainer.shap_values(features_scaled)
+            explanations = []
+            for sample_idx, class_idx in enumerate(class_indices):
+                explanations.append({
+                    'feature_impact': format_feature_impact(select_class_shap(shap_values, sample_idx, int(class_idx))),
+                    'all_classes': {
+                        str(crop): format_feature_impact(select_class_shap(shap_values, sample_idx, idx))
+                        for idx, crop in enumerate(rf_classes)
+                    }
+                })
+            return explanations
+            
+        # Rows sharing a top crop are explained together by that class's explainer
+        top_values = np.empty(features_scaled.shape, dtype=np.float64)
+        for class_idx in np.unique(class_indices):
+            rows = np.flatnonzero(class_indices == class_idx)
+            class_values = models.get_class_explainer(int(class_idx)).shap_values(features_scaled[rows])
+            top_values[rows] = np.reshape(class_values, (len(rows), -1))
+        return [{'feature_impact': format_feature_impact(values)} for values in top_values]
+    except Exception as e:
+        print(f"SHAP explainability error: {e}")
+        return [None] * n_rows
+
+
+def score_hybrid(features_scaled, rf, kmeans, cluster_matrix, timer=NULL_TIMER):
+    """
+    Runs the hybrid model on a (n_samples, n_features) matrix of scaled inputs.
+    Every stage is one array operation over all rows, for a single row or a batch.
+    rf is anything with predict_proba: the sklearn forest or the compiled engine.
+    """
+    # A. Random Forest Probabilities
+    rf_probs = rf.predict_proba(features_scaled)
+    timer.mark('rf')
+    
+    # B. Clustering Membership (Euclidean distance to each centroid)
+    distances = kmeans.transform(features_scaled)
+    timer.mark('kmeans')
+    membership, inv_distances = compute_fuzzy_membership_batch(distances, cluster_matrix)
+    timer.mark('membership')
+    
+    # C. Fusion (Weighted Ensemble) and Top-3 selection
+    fusion, top_indices = combine_with_rf_probabilities_batch(rf_probs, membership)
+    timer.mark('fusion')
+    return distances, membership, inv_distances, fusion, top_indices
+
+
+def hybrid_row_outputs(rf_classes, membership, inv_distances, fusion, top_indices):
+    """
+    Converts one row of score_hybrid output into the dict/list shapes used in the response.
+    """
+    sorted_crops = [(rf_classes[j], float(fusion[j])) for j in top_indices]
+    membership_scores = dict(zip(rf_classes, membership.tolist()))
+    cluster_weights = {cluster_id: weight for cluster_id, weight in enumerate(inv_distances.tolist())}
+    return sorted_crops, membership_scores, cluster_weights
+
+
+# Top-level sections of a /predict response
+RESPONSE_FIELDS = (
+    'project', 'location', 'language', 'inputs', 'inputs_scaled', 'recommendations',
+    'recommended_crops', 'advisory', 'model_type', 'explainability', 'crop_calendar',
+    'current_month', 'pest_disease_alert', 'soil_analysis', 'top_clusters', 'cluster_debug'
+)
+
+# What the farmer dashboard renders: no debug sections, no duplicate
+# recommended_crops, and a language block without the supported-languages table
+COMPACT_FIELDS = frozenset((
+    'language', 'inputs', 'inputs_scaled', 'recommendations', 'advisory', 'model_type',
+    'explainability', 'crop_calendar', 'current_month', 'pest_disease_alert', 'soil_analysis',
+    'top_clusters'
+))
+
+RESPONSE_PROFILES = ('full', 'compact')
+
+
+class ResponseProjection:
+    """
+    Which /predict sections to compute and return. fields=None means all of them.
+    """
+    __slots__ = ('fields', 'compact')
+
+    def __init__(self, fields=None, compact=False):
+        self.fields = fields
+        self.compact = compact
+
+    def wants(self, field):
+        return self.fields is None or field in self.fields
+
+
+FULL_RESPONSE = ResponseProjection()
+
+
+def resolve_projection(data):
+    """
+    Reads `fields` (list or comma-separated string) and `profile` from the body
+    or the query string; fields wins when both are given.
+    Returns None for unknown fields or profiles.
+    """
+    fields = data.get('fields') or request.args.get('fields')
+    if fields:
+        if isinstance(fields, str):
+            fields = fields.split(',')
+        if not isinstance(fields, list):
+            return None
+        fields = frozenset(str(name).strip() for name in fields if str(name).strip())
+        if not fields or not fields.issubset(RESPONSE_FIELDS):
+            return None
+        return ResponseProjection(fields)
+
+    profile = (data.get('profile') or request.args.get('profile') or 'full').lower().strip()
+    if profile == 'full':
+        return FULL_RESPONSE
+    if profile == 'compact':
+        return ResponseProjection(COMPACT_FIELDS, compact=True)
+    return None
+
+
+def projection_error():
+    return jsonify({
+        "error": f"fields must be a subset of {', '.join(RESPONSE_FIELDS)}; "
+                 f"profile must be one of {', '.join(RESPONSE_PROFILES)}"
+    }), 400
+
+
+def build_prediction_response(lat, lon, requested_lang, lang, soil, input_dict,
+                              features_scaled, distances, sorted_crops,
+                              membership_scores, cluster_weights, cluster_map,
+                              shap_explanation, month_name, projection=FULL_RESPONSE):
+    """
+    Assembles the /predict response for one location from its pipeline outputs.
+    features_scaled and distances are the 1D rows for this location.
+    Only the sections selected by projection are built.
+    """
+    wants = projection.wants
+    response = {}
+
+    if wants('project'):
+        response["project"] = "Smart Crop Advisory System"
+    if wants('location'):
+        response["location"] = f"Lat: {lat}, Lon: {lon}"
+    if wants('language'):
+        response["language"] = {"requested": requested_lang, "applied": lang}
+        if not projection.compact:
+            response["language"]["supported"] = SUPPORTED_LANGUAGES
+    if wants('inputs'):
+        response["inputs"] = input_dict
+    if wants('inputs_scaled'):
+        response["inputs_scaled"] = {name: float(value) for name, value in zip(FEATURE_NAMES, features_scaled)}
+
+    # Prepare required output arrays
+    if wants('recommendations'):
+        # Existing compatibility
+        response["recommendations"] = [{
+            "crop": crop,
+            "crop_localized": catalog.translate(crop, lang),
+            "confidence": f"{round(score * 100, 1)}%"
+        } for crop, score in sorted_crops]
+    if wants('recommended_crops'):
+        # New specific format requested for API
+        response["recommended_crops"] = [{
+            "crop": crop.capitalize(),
+            "confidence": round(score * 100, 1)
+        } for crop, score in sorted_crops]
+
+    top_crop = sorted_crops[0][0]
+
+    # 5. Advisory
+    if wants('advisory'):
+        response["advisory"] = catalog.advisory(select_advisory({"crop": top_crop}, input_dict), lang)
+    if wants('model_type'):
+        response["model_type"] = "Hybrid Random Forest + KMeans Membership"
+    if wants('explainability'):
+        response["explainability"] = shap_explanation
+
+    # 6. Crop calendar & alerts, localized
+    crop_fragment = catalog.crop_fragment(top_crop.lower(), month_name, lang)
+    if wants('crop_calendar'):
+        response["crop_calendar"] = crop_fragment["crop_calendar"]
+    if wants('current_month'):
+        response["current_month"] = crop_fragment["current_month"]
+    if wants('pest_disease_alert'):
+        response["pest_disease_alert"] = crop_fragment["pest_disease_alert"]
+
+    # Soil health analysis
+    if wants('soil_analysis'):
+        response["soil_analysis"] = analyze_soil(soil)
+
+    # Determine Top 3 Clusters based on membership_weights (kept for backward compatibility)
+    # Note: membership_weights dictionary is mapping {cluster_id: weight}
+    if wants('top_clusters'):
+        cluster_scores = list(cluster_weights.items())
+        cluster_scores.sort(key=lambda x: x[1], reverse=True)
+        top_clusters = []
+        for cluster_idx, score in cluster_scores[:3]:
+            dominant_crops = []
+            if cluster_idx in cluster_map:
+                dominant_crops = sorted(cluster_map[cluster_idx].items(), key=lambda x: x[1], reverse=True)[:3]
+            top_clusters.append({
+                "cluster_index": int(cluster_idx),
+                "score": float(score),
+                "dominant_crops": [c[0] for c in dominant_crops]
+            })
+        response["top_clusters"] = top_clusters
+    if wants('cluster_debug'):
+        response["cluster_debug"] = {
+            "distances": distances.tolist(),
+            "cluster_weights": cluster_weights,
+            "membership_scores": membership_scores
+        }
+
+    return response
+
+
+def resolve_neighbor_count(value):
+    """
+    similar_samples / k as a number of neighbours: true -> NEIGHBORS_DEFAULT_K,
+    absent or false -> 0, otherwise an integer 0..NEIGHBORS_MAX_K.
+    Returns None when invalid.
+    """
+    if isinstance(value, str):
+        value = value.lower().strip()
+        if value in ('', 'false', 'no'):
+            return 0
+        if value in ('true', 'yes'):
+            return NEIGHBORS_DEFAULT_K
+    if value is None or value is False:
+        return 0
+    if value is True:
+        return NEIGHBORS_DEFAULT_K
+    try:
+        k = int(value)
+    except (TypeError, ValueError):
+        return None
+    if k != float(value) or not 0 <= k <= NEIGHBORS_MAX_K:
+        return None
+    return k
+
+
+def neighbor_count_error(name):
+    return jsonify({"error": f"{name} must be true, false or an integer from 0 to {NEIGHBORS_MAX_K}"}), 400
+
+
+def find_similar_samples(index, features_scaled, k, lang):
+    """
+    The k training rows closest to each row of features_scaled, from the
+    model version's KD-tree (models.neighbor_index). Distances are Euclidean
+    over the scaled features. Returns one list of samples per row.
+    """
+    distances, indices = index.query(features_scaled, k)
+    results = []
+    for row_distances, row_indices in zip(distances, indices):
+        samples = []
+        for distance, idx in zip(row_distances.tolist(), row_indices.tolist()):
+            label = index.label(idx)
+            samples.append({
+                "label": label,
+                "label_localized": catalog.translate(label, lang),
+                "distance": distance,
+                "features": dict(zip(FEATURE_NAMES, index.features[idx].tolist()))
+            })
+        results.append(samples)
+    return results
+
+
+def similar_samples_sections(models, features_scaled, k, lang):
+    """
+    The similar_samples section of each row's response, or None per row when
+    the model version has no neighbour index.
+    """
+    if models.neighbor_index is None:
+        return [None] * len(features_scaled)
+    return [{"k": len(samples), "samples": samples}
+            for samples in find_similar_samples(models.neighbor_index, features_scaled, k, lang)]
+
+
+def score_rows(models, features_arr, explain, timer=NULL_TIMER):
+    """
+    Steps 3-5 for a (n_rows, n_features) matrix of raw inputs: scaling, hybrid
+    scoring and SHAP. Returns one (features_scaled, distances, sorted_crops,
+    membership_scores, cluster_weights, shap_explanation) tuple per row; these
+    are cached by prediction_cache and must not be modified.
+    """
+    # 3. Preprocess
+    features_scaled = models.scaler.transform(features_arr)
+    timer.mark('scaling')
+
+    # 4. Hybrid Prediction Logic (all rows at once)
+    rf_classes = models.rf.classes_
+    distances, membership, inv_distances, fusion, top_indices = score_hybrid(
+        features_scaled, models.rf_engine, models.kmeans_model, models.cluster_matrix, timer
+    )
+
+    # 5b. SHAP Explainability for each row's top crop in one pass
+    shap_explanations = explain_predictions(features_scaled, top_indices[:, 0], rf_classes, explain, models)
+    timer.mark('shap')
+
+    rows = []
+    for i in range(len(features_arr)):
+        sorted_crops, membership_scores, cluster_weights = hybrid_row_outputs(
+            rf_classes, membership[i], inv_distances[i], fusion[i], top_indices[i]
+        )
+        # Copies, so a cached row does not keep the whole batch's matrices alive
+        rows.append((features_scaled[i].copy(), distances[i].copy(), sorted_crops,
+                     membership_scores, cluster_weights, shap_explanations[i]))
+    return rows
+
+
+def score_rows_cached(models, features_list, explain, timer=NULL_TIMER):
+    """
+    score_rows() for a list of feature vectors, served from prediction_cache
+    where possible; only the misses go through the models, as one matrix.
+    Quantization only shapes the cache key: a miss is scored on its own
+    inputs, and a hit answers with the outputs of the first vector scored in
+    that grid cell.
+    """
+    if not prediction_cache.enabled:
+        return score_rows(models, np.array(features_list), explain, timer)
+
+    keys = [prediction_cache.key(models.version, explain, prediction_cache.quantize(features))
+            for features in features_list]
+    rows = [prediction_cache.get(key) for key in keys]
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if missing:
+        scored = score_rows(models, np.array([features_list[i] for i in missing]), explain, timer)
+        for i, row in zip(missing, scored):
+            rows[i] = row
+            prediction_cache.set(keys[i], row)
+    return rows
+
+
+def predict_location(models, lat, lon, requested_lang, lang, explain, soil, input_dict, features,
+                     projection=FULL_RESPONSE, timer=NULL_TIMER, similar_samples=0):
+    """
+    Steps 3-6 of /predict for one location whose inputs are already collected:
+    scaling, hybrid scoring, SHAP and response assembly. The server warm-up
+    runs it with synthetic inputs. timer (a metrics.StageTimer) is marked
+    after each stage. similar_samples > 0 adds that many nearest training rows.
+    """
+    if not projection.wants('explainability'):
+        explain = 'none'
+
+    features_scaled, distances, sorted_crops, membership_scores, cluster_weights, shap_explanation = \
+        score_rows_cached(models, [features], explain, timer)[0]
+
+    now = datetime.datetime.utcnow()
+    month_name = calendar.month_name[now.month]
+
+    response = build_prediction_response(
+        lat, lon, requested_lang, lang, soil, input_dict,
+        features_scaled, distances, sorted_crops,
+        membership_scores, cluster_weights, models.cluster_map,
+        shap_explanation, month_name, projection
+    )
+    timer.mark('response')
+    if similar_samples:
+        response["similar_samples"] = similar_samples_sections(models, [features_scaled], similar_samples, lang)[0]
+        timer.mark('neighbors')
+    return response
+
 
 @prediction_bp.route('/predict', methods=['POST'])
 def predict():
+    # Stage timings go to the Server-Timing header and /metrics (see app.py)
+    timer = g.stage_timer = start_stage_timer()
     try:
-        data = request.json
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({"error": "Request body must be a JSON object"}), 400
         lat = data.get('latitude')
         lon = data.get('longitude')
-        requested_lang = (data.get('lang') or 'en').lower().strip()
-        lang = requested_lang if requested_lang in SUPPORTED_LANGUAGES else 'en'
+        requested_lang, lang = resolve_language(data)
+        explain = resolve_explain_mode(data)
+        projection = resolve_projection(data)
+        similar_samples = resolve_neighbor_count(data.get('similar_samples', request.args.get('similar_samples')))
         
         if not lat or not lon:
             return jsonify({"error": "Latitude and Longitude required"}), 400
+        if explain is None:
+            return jsonify({"error": f"explain must be one of {', '.join(EXPLAIN_MODES)}"}), 400
+        if projection is None:
+            return projection_error()
+        if similar_samples is None:
+            return neighbor_count_error('similar_samples')
             
         # 1. Fetch Environment Data
-        weather = get_weather(lat, lon)
-        soil = get_soil_data(lat, lon)
-        
-        # Prepare Input Vector [N, P, K, Temp, Hum, pH, Rain]
-        input_dict = {**soil, **weather}
-        features = [
-            input_dict['N'],
-            input_dict['P'],
-            input_dict['K'],
-            input_dict['temperature'],
-            input_dict['humidity'],
-            input_dict['ph'],
-            input_dict['rainfall']
-        ]
-        
-        features_arr = np.array([features])
-        
-        # 2. Load Models
-        rf = get_rf_model()
-        kmeans = get_kmeans_model()
-        scaler = get_scaler()
-        cluster_map = get_cluster_map()
+        soil, input_dict, features = collect_inputs(lat, lon, timer)
         
-        if not rf or not scaler:
+        # 2. Load Models (one version for the whole request, even if a reload swaps it meanwhile)
+        models = get_models()
+        if models is None:
             return jsonify({"error": "Models not loaded"}), 500
-            
-        # 3. Preprocess
-        features_scaled = scaler.transform(features_arr)
+        g.model_version = models.version
         
-        # 4. Hybrid Prediction Logic
-        from services.cluster_membership import (
-            compute_cluster_distances,
-            compute_fuzzy_membership_scores,
-            combine_with_rf_probabilities
+        response = predict_location(
+            models, lat, lon, requested_lang, lang, explain, soil, input_dict, features, projection, timer,
+            similar_samples
         )
+        response = gzip_json_response(response)
+        timer.mark('json')
+        return response
+
+    except Exception as e:
+        print(f"Prediction error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@prediction_bp.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Scores many locations at once. Every model stage (scaling, RF probabilities,
+    centroid distances, fuzzy membership, fusion and top-3 selection) runs as a
+    single matrix operation over all rows; dicts are only built for the response.
+    Rows found in the prediction cache skip the models.
+    
+    Body: {"locations": [{"latitude": .., "longitude": ..}, ...], "lang": "en", "explain": "top"}
+    fields/profile and similar_samples work as for /predict.
+    """
+    timer = g.stage_timer = start_stage_timer()
+    try:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({"error": "Request body must be a JSON object"}), 400
+        locations = data.get('locations')
+        requested_lang, lang = resolve_language(data)
+        explain = resolve_explain_mode(data)
+        projection = resolve_projection(data)
+        similar_samples = resolve_neighbor_count(data.get('similar_samples', request.args.get('similar_samples')))
         
-        # A. Random Forest Probabilities
-        rf_probs = rf.predict_proba(features_scaled)[0]
-        rf_classes = rf.classes_
-        
-        # B. Clustering Membership
-        distances = compute_cluster_distances(features_scaled, kmeans)
-        membership_scores, cluster_weights = compute_fuzzy_membership_scores(distances, cluster_map, rf_classes)
-        
-        # C. Fusion (Weighted Ensemble)
-        sorted_crops, fusion_scores = combine_with_rf_probabilities(rf_probs, rf_classes, membership_scores)
+        if not isinstance(locations, list) or not locations:
+            return jsonify({"error": "A non-empty 'locations' list is required"}), 400
+        if explain is None:
+            return jsonify({"error": f"explain must be one of {', '.join(EXPLAIN_MODES)}"}), 400
+        if projection is None:
+            return projection_error()
+        if similar_samples is None:
+            return neighbor_count_error('similar_samples')
+        if not projection.wants('explainability'):
+            explain = 'none'
+        if len(locations) > PREDICT_BATCH_MAX:
+            return jsonify({"error": f"At most {PREDICT_BATCH_MAX} locations per batch"}), 400
+        for idx, loc in enumerate(locations):
+            if not isinstance(loc, dict) or not loc.get('latitude') or not loc.get('longitude'):
+                return jsonify({"error": f"Latitude and Longitude required (location {idx})"}), 400
+                
+        # 1. Fetch Environment Data
+        inputs = [collect_inputs(loc['latitude'], loc['longitude']) for loc in locations]
+        timer.mark('inputs')
         
-        # Prepare required output arrays
-        recommendations = []
-        recommended_crops = []
-        for crop, score in sorted_crops:
-            # Existing compatibility
-            recommendations.append({
-                "crop": crop,
-                "crop_localized": localize_crop_name(crop, lang),
-                "confidence": f"{round(score * 100, 1)}%"
-            })
-            # New specific format requested for API
-            recommended_crops.append({
-                "crop": crop.capitalize(),
-                "confidence": round(score * 100, 1)
-            })
-
-        cluster_debug = {
-            "distances": distances.tolist(),
-            "cluster_weights": cluster_weights,
-            "membership_scores": membership_scores
-        }
+        # 2. Load Models (one version for the whole request, even if a reload swaps it meanwhile)
+        models = get_models()
+        if models is None:
+            return jsonify({"error": "Models not loaded"}), 500
+        g.model_version = models.version
         
-        # Determine Top 3 Clusters based on membership_weights (kept for backward compatibility)
-        # Note: membership_weights dictionary is mapping {cluster_id: weight}
-        cluster_scores = list(cluster_weights.items())
-        cluster_scores.sort(key=lambda x: x[1], reverse=True)
-        top_clusters = []
-        for cluster_idx, score in cluster_scores[:3]:
-            dominant_crops = []
-            if cluster_idx in cluster_map:
-                dominant_crops = sorted(cluster_map[cluster_idx].items(), key=lambda x: x[1], reverse=True)[:3]
-            top_clusters.append({
-                "cluster_index": int(cluster_idx),
-                "score": float(score),
-                "dominant_crops": [c[0] for c in dominant_crops]
-            })
-            
+        # 3-5. Scaling, hybrid scoring and SHAP, as one matrix for the rows not cached yet
+        rows = score_rows_cached(models, [features for _, _, features in inputs], explain, timer)
 
-        # 5. Advisory
-        top_crop = recommendations[0]['crop']
-        advisory = get_advisory({"crop": top_crop}, input_dict)
-        advisory_localized = localize_advisory(advisory, lang)
-
-        # 5b. SHAP Explainability for top crop
-        shap_explanation = None
-        try:
-            explainer = shap.TreeExplainer(rf)
-            shap_values = explainer.shap_values(features_scaled)
-            # Find the index for the top crop
-            if hasattr(rf, 'classes_'):
-                class_idx = list(rf.classes_).index(top_crop)
-                feature_names = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
-                shap_impact = dict(zip(feature_names, shap_values[class_idx][0]))
-                # Sort by absolute impact
-                shap_explanation = {
-                    'feature_impact': sorted(shap_impact.items(), key=lambda x: abs(x[1]), reverse=True)
-                }
-        except Exception as e:
-            print(f"SHAP explainability error: {e}")
-            shap_explanation = None
-
-        # 6. Crop calendar & alerts
         now = datetime.datetime.utcnow()
         month_name = calendar.month_name[now.month]
-        crop_calendar = CROP_CALENDAR.get(top_crop.lower(), {})
-        pest_disease_alert = get_pest_disease_alert(top_crop.lower(), month_name)
-
-        # Localize crop calendar and pest/disease alerts
-        def localize_months(months, lang):
-            # For demo, only Hindi/Marathi/Spanish/French for a few months
-            month_map = {
-                "hi": {"June": "जून", "July": "जुलाई", "October": "अक्टूबर", "November": "नवंबर", "December": "दिसंबर", "March": "मार्च", "April": "अप्रैल", "February": "फरवरी"},
-                "mr": {"June": "जून", "July": "जुलै", "October": "ऑक्टोबर", "November": "नोव्हेंबर", "December": "डिसेंबर", "March": "मार्च", "April": "एप्रिल", "February": "फेब्रुवारी"},
-                "es": {"June": "Junio", "July": "Julio", "October": "Octubre", "November": "Noviembre", "December": "Diciembre", "March": "Marzo", "April": "Abril", "February": "Febrero"},
-                "fr": {"June": "Juin", "July": "Juillet", "October": "Octobre", "November": "Novembre", "December": "Décembre", "March": "Mars", "April": "Avril", "February": "Février"}
-            }
-            if lang == "en" or not months:
-                return months
-            return [month_map.get(lang, {}).get(m, m) for m in months]
-
-        crop_calendar_localized = {
-            "planting": localize_months(crop_calendar.get("planting", []), lang),
-            "harvest": localize_months(crop_calendar.get("harvest", []), lang)
-        } if crop_calendar else {}
-
-        pest_disease_alert_localized = translate_text(pest_disease_alert, lang)
-
-        # Soil health analysis
-        soil_analysis = analyze_soil(soil)
-
-        scaled_dict = {
-            'N': float(features_scaled[0][0]),
-            'P': float(features_scaled[0][1]),
-            'K': float(features_scaled[0][2]),
-            'temperature': float(features_scaled[0][3]),
-            'humidity': float(features_scaled[0][4]),
-            'ph': float(features_scaled[0][5]),
-            'rainfall': float(features_scaled[0][6])
-        }
 
-        response = {
-            "project": "Smart Crop Advisory System",
-            "location": f"Lat: {lat}, Lon: {lon}",
-            "language": {
-                "requested": requested_lang,
-                "applied": lang,
-                "supported": SUPPORTED_LANGUAGES
-            },
-            "inputs": input_dict,
-            "inputs_scaled": scaled_dict,
-            "recommendations": recommendations,
-            "recommended_crops": recommended_crops,
-            "advisory": advisory_localized,
-            "model_type": "Hybrid Random Forest + KMeans Membership",
-            "explainability": shap_explanation,
-            "crop_calendar": crop_calendar_localized,
-            "current_month": translate_text(month_name, lang),
-            "pest_disease_alert": pest_disease_alert_localized,
-            "soil_analysis": soil_analysis,
-            "top_clusters": top_clusters,
-            "cluster_debug": cluster_debug
-        }
-        return jsonify(response)
+        results = []
+        for loc, (soil, input_dict, _), row in zip(locations, inputs, rows):
+            features_scaled, distances, sorted_crops, membership_scores, cluster_weights, shap_explanation = row
+            results.append(build_prediction_response(
+                loc['latitude'], loc['longitude'], requested_lang, lang, soil, input_dict,
+                features_scaled, distances, sorted_crops,
+                membership_scores, cluster_weights, models.cluster_map,
+                shap_explanation, month_name, projection
+            ))
+        timer.mark('response')
+
+        if similar_samples:
+            # One KD-tree query for all rows
+            sections = similar_samples_sections(models, np.array([row[0] for row in rows]), similar_samples, lang)
+            for result, section in zip(results, sections):
+                result["similar_samples"] = section
+            timer.mark('neighbors')
+
+        response = gzip_json_response({"count": len(results), "results": results})
+        timer.mark('json')
+        return response
 
     except Exception as e:
-        print(f"Prediction error: {e}")
+        print(f"Batch prediction error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@prediction_bp.route('/neighbors', methods=['POST'])
+def neighbors():
+    """
+    The training rows most similar to a location or a feature vector.
+
+    Body: {"latitude": .., "longitude": ..} or {"features": {"N": .., ..., "rainfall": ..}},
+    plus "k" (default NEIGHBORS_DEFAULT_K) and "lang" for the localized labels.
+    """
+    timer = g.stage_timer = start_stage_timer()
+    try:
+        data = request.json or {}
+        requested_lang, lang = resolve_language(data)
+        k = resolve_neighbor_count(data.get('k', request.args.get('k', True)))
+        if k is None:
+            return neighbor_count_error('k')
+        if k == 0:
+            return jsonify({"error": "k must be at least 1"}), 400
+
+        if data.get('features') is not None:
+            input_dict = data['features']
+            if not isinstance(input_dict, dict) or any(name not in input_dict for name in FEATURE_NAMES):
+                return jsonify({"error": f"features must include {', '.join(FEATURE_NAMES)}"}), 400
+            try:
+                features = [float(input_dict[name]) for name in FEATURE_NAMES]
+            except (TypeError, ValueError):
+                return jsonify({"error": "features must be numbers"}), 400
+        else:
+            lat = data.get('latitude')
+            lon = data.get('longitude')
+            if not lat or not lon:
+                return jsonify({"error": "Latitude and Longitude (or features) required"}), 400
+            _, input_dict, features = collect_inputs(lat, lon, timer)
+
+        models = get_models()
+        if models is None:
+            return jsonify({"error": "Models not loaded"}), 500
+        g.model_version = models.version
+        if models.neighbor_index is None:
+            return jsonify({"error": "Similar-farms index not available (see model/neighbor_index.py)"}), 503
+
+        features_scaled = models.scaler.transform(np.array([features]))
+        timer.mark('scaling')
+        samples = find_similar_samples(models.neighbor_index, features_scaled, k, lang)[0]
+        timer.mark('neighbors')
+
+        response = gzip_json_response({
+            "inputs": {name: input_dict[name] for name in FEATURE_NAMES},
+            "language": {"requested": requested_lang, "applied": lang},
+            "k": len(samples),
+            "neighbors": samples
+        })
+        timer.mark('json')
+        return response
+
+    except Exception as e:
+        print(f"Neighbors error: {e}")
         return jsonify({"error": str(e)}), 500
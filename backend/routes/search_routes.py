@@ -1,36 +1,17 @@
-
 from flask import Blueprint, request, jsonify
-import requests
+from services.geocode_service import search_places
+from services.upstream_client import CircuitOpenError
 
 search_bp = Blueprint('search', __name__)
 
 @search_bp.route('/search/<query>', methods=['GET'])
 def search_location(query):
     try:
-        # Nominatim API
-        url = "https://nominatim.openstreetmap.org/search"
-        params = {
-            'q': query,
-            'format': 'json',
-            'limit': 5,
-            'addressdetails': 1
-        }
-        headers = {
-            'User-Agent': 'SmartCropAdvisorySystem/1.0'
-        }
-        
-        res = requests.get(url, params=params, headers=headers)
-        data = res.json()
-        
-        results = []
-        for item in data:
-            results.append({
-                "name": item.get('display_name'),
-                "latitude": float(item.get('lat')),
-                "longitude": float(item.get('lon'))
-            })
-            
+        # Served from the geocoding cache; Nominatim is only called on a true miss
+        results = search_places(query)
         return jsonify(results)
         
+    except CircuitOpenError as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
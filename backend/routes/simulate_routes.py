@@ -1,129 +1,118 @@
 import os
-import numpy as np
-import pandas as pd
-from flask import Blueprint, request, jsonify
-from sklearn.ensemble import AdaBoostClassifier, GradientBoostingClassifier, RandomForestClassifier
-from sklearn.linear_model import LogisticRegression
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
-from sklearn.cluster import KMeans
-from sklearn.metrics import accuracy_score, f1_score
-from imblearn.over_sampling import SMOTE
-from sklearn.model_selection import train_test_split, StratifiedKFold, cross_val_score
+import json
+import time
+import traceback
+from flask import Blueprint, request, jsonify, url_for, current_app
+from services.job_queue import get_job_queue, QueueFullError
+from services.simulation_service import (
+    SIMULATION_WORKERS, parse_simulation_params, run_simulation, parse_sweep_params, run_sweep
+)
 
 simulate_bp = Blueprint('simulate', __name__)
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_PATH = os.path.join(BASE_DIR, "../../dataset/Crop_recommendation.csv")
-FEATURE_COLUMNS = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+SIMULATION_QUEUE_MAX = int(os.getenv('SIMULATION_QUEUE_MAX', 4))
+SIMULATION_RESULT_TTL = int(os.getenv('SIMULATION_RESULT_TTL', 900))
+SIMULATION_NICE = int(os.getenv('SIMULATION_NICE', 10))
+JOB_STREAM_INTERVAL = float(os.getenv('JOB_STREAM_INTERVAL', 0.5))
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
 
-def load_dataset() -> pd.DataFrame:
-    if not os.path.exists(DATA_PATH):
-        raise FileNotFoundError(f"Dataset not found at {DATA_PATH}")
-    df = pd.read_csv(DATA_PATH)
-    return df
+def get_simulation_queue():
+    return get_job_queue(
+        'simulation',
+        max_workers=SIMULATION_WORKERS,
+        max_pending=SIMULATION_QUEUE_MAX,
+        result_ttl=SIMULATION_RESULT_TTL,
+        nice=SIMULATION_NICE
+    )
+
+def submit_job(fn, params):
+    try:
+        job = get_simulation_queue().submit(fn, params)
+    except QueueFullError as e:
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = '10'
+        return response, 429
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+    job["status_url"] = url_for('simulate.get_simulation_job', job_id=job["id"])
+    job["stream_url"] = url_for('simulate.stream_simulation_job', job_id=job["id"])
+    response = jsonify(job)
+    response.headers['Location'] = job["status_url"]
+    return response, 202
 
 @simulate_bp.route('/', methods=['POST'])
 def simulate_model():
     """
-    Simulate training a model without saving any artifacts.
-    This demonstrates the effect of hyperparameters on the model's performance.
+    Queues a simulation job (train a model without saving any artifacts).
+    Returns 202 with the job id; poll GET /api/simulate/jobs/<id> for progress
+    and the result.
     """
     try:
-        data = request.json
-        model_type = data.get('model_type', 'Random Forest')
-        n_estimators = int(data.get('n_estimators', 100))
-        max_depth = data.get('max_depth', None)
-        if max_depth: max_depth = int(max_depth)
-        learning_rate = float(data.get('learning_rate', 0.1))
-        n_clusters = int(data.get('n_clusters', 22))
-        use_smote = bool(data.get('use_smote', False))
-        scaling_method = data.get('scaling_method', 'Standard')
-
-        df = load_dataset().dropna().copy()
-        
-        # 1. Preprocessing (Outlier capping)
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
-        for col in numeric_cols:
-            q1 = df[col].quantile(0.25)
-            q3 = df[col].quantile(0.75)
-            iqr = q3 - q1
-            lower = q1 - 1.5 * iqr
-            upper = q3 + 1.5 * iqr
-            df[col] = np.clip(df[col], lower, upper)
-
-        X = df[FEATURE_COLUMNS]
-        y = df["label"]
-
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42, stratify=y
-        )
+        params = parse_simulation_params(request.json)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return submit_job(run_simulation, params)
 
-        # 2. SMOTE optionally
-        if use_smote:
-            smote = SMOTE(random_state=42)
-            X_train, y_train = smote.fit_resample(X_train, y_train)
-
-        # 3. Scaling
-        if scaling_method == 'MinMax':
-            scaler = MinMaxScaler()
-        else:
-            scaler = StandardScaler()
-            
-        X_train_scaled = scaler.fit_transform(X_train)
-        X_test_scaled = scaler.transform(X_test)
+@simulate_bp.route('/sweep', methods=['POST'])
+def sweep_model():
+    """
+    Queues a hyperparameter sweep, e.g.
+        {"model_type": "Random Forest", "grid": {"n_estimators": [10, 50, 100], "max_depth": [null, 10]}}
+    Points appear in the job's "partial" list as they finish, or live from
+    GET /api/simulate/jobs/<id>/stream.
+    """
+    try:
+        params = parse_sweep_params(request.json)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return submit_job(run_sweep, params)
 
-        # 4. Model Selection
-        if model_type == 'Random Forest':
-            model = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=42)
-        elif model_type == 'AdaBoost':
-            stump = DecisionTreeClassifier(max_depth=max_depth or 1, random_state=42)
-            try:
-                model = AdaBoostClassifier(estimator=stump, n_estimators=n_estimators, learning_rate=learning_rate, random_state=42)
-            except TypeError:
-                model = AdaBoostClassifier(base_estimator=stump, n_estimators=n_estimators, learning_rate=learning_rate, random_state=42)
-        elif model_type == 'Gradient Boosting':
-            model = GradientBoostingClassifier(n_estimators=n_estimators, max_depth=max_depth or 3, learning_rate=learning_rate, random_state=42)
-        elif model_type == 'Decision Tree':
-            model = DecisionTreeClassifier(max_depth=max_depth, random_state=42)
-        elif model_type == 'Logistic Regression':
-            model = LogisticRegression(max_iter=1000, random_state=42)
-        else:
-            return jsonify({"error": "Unsupported model type"}), 400
+@simulate_bp.route('/jobs', methods=['GET'])
+def get_simulation_queue_stats():
+    return jsonify(get_simulation_queue().stats())
 
-        # 5. Training
-        model.fit(X_train_scaled, y_train)
-        preds = model.predict(X_test_scaled)
+@simulate_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_simulation_job(job_id):
+    job = get_simulation_queue().describe(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
 
-        # 6. Evaluation
-        acc = accuracy_score(y_test, preds)
-        f1 = f1_score(y_test, preds, average='weighted', zero_division=0)
-        
-        # Cross validation
-        skf = StratifiedKFold(n_splits=3, shuffle=True, random_state=42) # 3 for speed
-        cv_scores = cross_val_score(model, X_train_scaled, y_train, cv=skf, scoring='accuracy')
+@simulate_bp.route('/jobs/<job_id>/stream', methods=['GET'])
+def stream_simulation_job(job_id):
+    """
+    Streams a job as NDJSON: one {"type": "item", "data": ...} line per emitted
+    result (sweep point) as soon as it is available, then a final
+    {"type": "status", ...} line with the job description.
+    """
+    queue = get_simulation_queue()
+    if queue.describe(job_id, include_result=False) is None:
+        return jsonify({"error": "Job not found"}), 404
 
-        feature_importances = []
-        if hasattr(model, "feature_importances_"):
-            feature_importances = model.feature_importances_.tolist()
-            
-        # 7. KMeans simulation
-        X_full_scaled = scaler.transform(X)
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=5)
-        kmeans.fit(X_full_scaled)
-        inertia = kmeans.inertia_
+    def generate():
+        sent = 0
+        while True:
+            job = queue.describe(job_id, include_result=False)
+            if job is None:
+                return
+            partial = job.pop("partial", [])
+            for item in partial[sent:]:
+                yield json.dumps({"type": "item", "data": item}) + "\n"
+            sent = len(partial)
+            if job["status"] in FINISHED_STATUSES:
+                yield json.dumps({"type": "status", **job}) + "\n"
+                return
+            time.sleep(JOB_STREAM_INTERVAL)
 
-        return jsonify({
-            "accuracy": acc,
-            "f1_score": f1,
-            "cv_mean": cv_scores.mean(),
-            "cv_std": cv_scores.std(),
-            "feature_importances": feature_importances,
-            "features": FEATURE_COLUMNS,
-            "kmeans_inertia": inertia
-        })
+    response = current_app.response_class(generate(), mimetype='application/x-ndjson')
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
+@simulate_bp.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_simulation_job(job_id):
+    job = get_simulation_queue().cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
@@ -125,3 +125,58 @@ def combine_with_rf_probabilities(rf_probs, rf_classes, membership_scores):
     sorted_crops = sorted(fusion_scores.items(), key=lambda x: x[1], reverse=True)[:3]
     
     return sorted_crops, fusion_scores
+
+
+def compute_fuzzy_membership_batch(distances, cluster_matrix):
+    """
+    Vectorized STEP 3 for one sample or a batch, using the dense cluster matrix
+    (model_bundle.build_cluster_matrix).
+    Produces exactly the same floats as compute_fuzzy_membership_scores: the
+    per-cluster accumulation and the normalizing sum follow the same order.
+    
+    Args:
+        distances (np.ndarray): Distances of shape (n_clusters,) or (n_samples, n_clusters).
+        cluster_matrix (np.ndarray): Dense cluster map of shape (n_clusters, n_classes).
+        
+    Returns:
+        tuple: (membership matrix (n_samples, n_classes), inverse distances (n_samples, n_clusters))
+    """
+    distances = np.atleast_2d(distances)
+    
+    with np.errstate(divide='ignore'):
+        inv_distances = 1.0 / (distances + 1e-6)
+        
+    # Accumulate cluster by cluster (vectorized over samples and crops) so the
+    # floating point summation order matches the reference implementation
+    scores = np.zeros((distances.shape[0], cluster_matrix.shape[1]), dtype=np.float64)
+    n_mapped = min(cluster_matrix.shape[0], inv_distances.shape[1])
+    for cluster_id in range(n_mapped):
+        scores += inv_distances[:, cluster_id, None] * cluster_matrix[cluster_id]
+    
+    # Sequential (cumulative) sum mirrors Python's sum() over the crop scores
+    total_score = np.cumsum(scores, axis=1)[:, -1:]
+    scores = np.divide(scores, total_score, out=scores, where=total_score > 0)
+    
+    return scores, inv_distances
+
+
+def combine_with_rf_probabilities_batch(rf_probs, membership, top_k=3):
+    """
+    Vectorized STEP 4 for one sample or a batch.
+    
+    Args:
+        rf_probs (np.ndarray): Random Forest probabilities of shape (n_samples, n_classes).
+        membership (np.ndarray): Membership scores of shape (n_samples, n_classes).
+        top_k (int): Number of recommended crops to select per sample.
+        
+    Returns:
+        tuple: (fusion matrix (n_samples, n_classes), top-k class indices (n_samples, top_k))
+    """
+    rf_probs = np.atleast_2d(rf_probs)
+    membership = np.atleast_2d(membership)
+    fusion = (0.7 * rf_probs) + (0.3 * membership)
+    
+    # Stable sort keeps ties in class order, matching sorted(..., reverse=True)
+    top_indices = np.argsort(-fusion, axis=1, kind='stable')[:, :top_k]
+    
+    return fusion, top_indices
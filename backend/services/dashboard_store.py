@@ -0,0 +1,139 @@
+"""
+In-memory cache of model/dashboard_data.json for the research dashboard routes.
+
+The file is parsed once and every top-level section is pre-serialized to JSON
+bytes together with a strong ETag (hash of those bytes). The file is only
+re-read when its mtime or size changes, so a dashboard request costs one
+os.stat() plus a dict lookup, and a revalidation with a matching
+If-None-Match costs no parsing or serialization at all.
+
+Bundles (several sections in one response, /api/dev/bundle) are assembled
+from the same pre-serialized bytes, and their gzip encoding is cached per
+snapshot, so repeated dashboard loads compress nothing.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DASHBOARD_DATA_PATH = os.path.join(BASE_DIR, '../../model/dashboard_data.json')
+
+
+BUNDLE_CACHE_SIZE = 32
+GZIP_LEVEL = 6
+
+
+def serialize_section(value):
+    # Same encoding as Flask's jsonify (sorted keys, compact, trailing newline)
+    return (json.dumps(value, sort_keys=True, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+class DashboardSnapshot:
+    def __init__(self, signature, data):
+        self.signature = signature
+        self.data = data
+        self.sections = {}
+        for key, value in data.items():
+            body = serialize_section(value)
+            etag = hashlib.sha1(body).hexdigest()
+            self.sections[key] = (body, etag)
+        self._bundles = OrderedDict()
+        self._bundles_lock = threading.Lock()
+
+    def bundle(self, parts, compress=False):
+        """
+        Builds one JSON object {label: section, ...} from the pre-serialized sections.
+
+        Args:
+            parts: sequence of (label, section_key) pairs, in output order.
+            compress: return the gzip-encoded body instead of the plain one.
+
+        Returns:
+            (body_bytes, etag)
+        """
+        parts = tuple(parts)
+        with self._bundles_lock:
+            cached = self._bundles.get(parts)
+            if cached is not None:
+                self._bundles.move_to_end(parts)
+
+        if cached is None:
+            chunks = [json.dumps(label).encode('utf-8') + b':' + self.sections[key][0].rstrip(b'\n')
+                      for label, key in parts]
+            body = b'{' + b','.join(chunks) + b'}\n'
+            cached = {"body": body, "etag": hashlib.sha1(body).hexdigest()}
+            with self._bundles_lock:
+                self._bundles[parts] = cached
+                while len(self._bundles) > BUNDLE_CACHE_SIZE:
+                    self._bundles.popitem(last=False)
+
+        if not compress:
+            return cached["body"], cached["etag"]
+        if "gzip" not in cached:
+            # mtime=0 keeps the encoding (and therefore its ETag) deterministic
+            cached["gzip"] = gzip.compress(cached["body"], compresslevel=GZIP_LEVEL, mtime=0)
+        return cached["gzip"], cached["etag"] + '-gzip'
+
+    def stream(self, parts, compress=False):
+        """
+        Yields one NDJSON line {"section": label, "data": ...} per section.
+        With compress, yields a gzip stream that is sync-flushed after every
+        section, so the client can decode each section as soon as it arrives.
+        """
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+        for label, key in parts:
+            line = (b'{"section":' + json.dumps(label).encode('utf-8') +
+                    b',"data":' + self.sections[key][0].rstrip(b'\n') + b'}\n')
+            if compressor is None:
+                yield line
+            else:
+                yield compressor.compress(line) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if compressor is not None:
+            yield compressor.flush()
+
+
+class DashboardStore:
+    def __init__(self, path):
+        self.path = path
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """
+        Returns the current DashboardSnapshot, reloading only if the file changed.
+        Returns None when the file is missing or cannot be parsed.
+        """
+        try:
+            st = os.stat(self.path)
+        except OSError as e:
+            print(f"Error loading dashboard data: {e}")
+            return None
+        signature = (st.st_mtime_ns, st.st_size)
+
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.signature == signature:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.signature != signature:
+                try:
+                    with open(self.path, 'r') as f:
+                        snapshot = DashboardSnapshot(signature, json.load(f))
+                except Exception as e:
+                    print(f"Error loading dashboard data: {e}")
+                    return None
+                self._snapshot = snapshot
+        return snapshot
+
+
+dashboard_store = DashboardStore(DASHBOARD_DATA_PATH)
+
+
+def get_dashboard_snapshot():
+    return dashboard_store.snapshot()
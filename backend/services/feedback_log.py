@@ -0,0 +1,253 @@
+"""
+Buffered, rotating writer for user feedback (POST /api/feedback).
+
+A request only puts its entry on a bounded in-memory queue. A background
+thread drains the queue and group-commits: it collects entries for up to
+FEEDBACK_FLUSH_INTERVAL seconds (or FEEDBACK_BATCH_MAX entries), then writes
+them to FEEDBACK_LOG_PATH as JSON lines in one append, with one fsync per
+batch when FEEDBACK_FSYNC is on. Disk latency, fsync and rotation therefore
+never run in a request thread. When the queue is full (the disk cannot keep
+up), submit() raises FeedbackQueueFull instead of blocking.
+
+Once the file reaches FEEDBACK_ROTATE_BYTES it is renamed to
+user_feedback-<UTC timestamp>-<pid>.jsonl and gzip-compressed; only the
+newest FEEDBACK_BACKUPS compressed files are kept (0 keeps all).
+
+gunicorn workers append to the same file: each batch is written under an
+exclusive flock, and a writer that finds the file rotated under it reopens
+the new one. Entries still queued when the process exits are flushed by an
+atexit hook; a hard kill loses at most one flush interval of feedback.
+"""
+
+import atexit
+import datetime
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # No cross-process locking (Windows): run a single worker there
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+FEEDBACK_LOG_PATH = os.getenv('FEEDBACK_LOG_PATH', os.path.join(BASE_DIR, '../user_feedback.jsonl'))
+FEEDBACK_QUEUE_MAX = int(os.getenv('FEEDBACK_QUEUE_MAX', 10000))
+FEEDBACK_FLUSH_INTERVAL = float(os.getenv('FEEDBACK_FLUSH_INTERVAL', 1.0))
+FEEDBACK_BATCH_MAX = int(os.getenv('FEEDBACK_BATCH_MAX', 1000))
+FEEDBACK_FSYNC = os.getenv('FEEDBACK_FSYNC', '1').lower() not in ('0', 'false', 'no')
+FEEDBACK_ROTATE_BYTES = int(os.getenv('FEEDBACK_ROTATE_BYTES', 10 * 1024 * 1024))
+FEEDBACK_BACKUPS = int(os.getenv('FEEDBACK_BACKUPS', 10))
+
+# Put on the queue by close() so a waiting writer notices the stop at once
+_WAKE = object()
+
+
+class FeedbackQueueFull(Exception):
+    """Raised when the writer is FEEDBACK_QUEUE_MAX entries behind."""
+
+
+class FeedbackLog:
+    def __init__(self, path=FEEDBACK_LOG_PATH, queue_max=FEEDBACK_QUEUE_MAX,
+                 flush_interval=FEEDBACK_FLUSH_INTERVAL, batch_max=FEEDBACK_BATCH_MAX,
+                 fsync=FEEDBACK_FSYNC, rotate_bytes=FEEDBACK_ROTATE_BYTES, backups=FEEDBACK_BACKUPS):
+        self.path = os.path.abspath(path)
+        self.queue_max = max(1, int(queue_max))
+        self.flush_interval = max(0.0, float(flush_interval))
+        self.batch_max = max(1, int(batch_max))
+        self.fsync = fsync
+        self.rotate_bytes = int(rotate_bytes)
+        self.backups = int(backups)
+        self._lock = threading.Lock()
+        self._queue = None
+        self._stopping = None
+        self._thread = None
+        self._pid = None
+        self.submitted = 0
+        self.rejected = 0
+        self.written = 0
+        self.batches = 0
+        self.rotations = 0
+        self.errors = 0
+        self.last_error = None
+
+    def _ensure_writer(self):
+        # Started lazily, once per process: a gunicorn master that preloads the
+        # app forks its workers without threads, so each worker starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.queue_max)
+            self._stopping = threading.Event()
+            self._thread = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+            atexit.register(self.close)
+
+    def submit(self, entry):
+        """
+        Queues one feedback entry (a JSON-serializable dict) for the writer.
+        Raises FeedbackQueueFull instead of waiting when the queue is full.
+        """
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise FeedbackQueueFull(f"Feedback queue is full ({self.queue_max} entries)")
+        with self._lock:
+            self.submitted += 1
+
+    def _next_batch(self, batch):
+        """
+        Adds queued entries to batch: waits for the first one, then collects
+        until the flush interval has passed or the batch is full.
+        """
+        while not batch:
+            item = self._queue.get()
+            if item is not _WAKE:
+                batch.append(item)
+            elif self._stopping.is_set():
+                return
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_max:
+            # Once stopping, write whatever is queued without waiting
+            timeout = 0 if self._stopping.is_set() else deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _WAKE:
+                batch.append(item)
+
+    def _run(self):
+        batch = []
+        while not (self._stopping.is_set() and not batch and self._queue.empty()):
+            self._next_batch(batch)
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+                with self._lock:
+                    self.written += len(batch)
+                    self.batches += 1
+                batch = []
+            except Exception as e:
+                # Keep the batch and retry; meanwhile the queue fills and requests get 503
+                with self._lock:
+                    self.errors += 1
+                    self.last_error = str(e)
+                print(f"Feedback log write error: {e}")
+                if self._stopping.is_set():
+                    return
+                time.sleep(max(self.flush_interval, 1.0))
+
+    def _open_locked(self):
+        # Appends under an exclusive lock; when another process rotated the file
+        # between our open() and the lock, reopen the new one
+        while True:
+            f = open(self.path, 'ab')
+            if fcntl is None:
+                return f
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                if os.stat(self.path).st_ino == os.fstat(f.fileno()).st_ino:
+                    return f
+            except FileNotFoundError:
+                pass
+            f.close()
+
+    def _write(self, batch):
+        data = ''.join([json.dumps(entry) + '\n' for entry in batch]).encode('utf-8')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        rotated = None
+        with self._open_locked() as f:
+            f.write(data)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+            if self.rotate_bytes > 0 and f.tell() >= self.rotate_bytes:
+                rotated = self._rotated_name()
+                os.rename(self.path, rotated)
+                with self._lock:
+                    self.rotations += 1
+        # Compression runs after the lock is released, other writers already use the new file
+        if rotated is not None:
+            self._compress(rotated)
+            self._prune()
+
+    def _rotated_name(self):
+        stem, ext = os.path.splitext(self.path)
+        return f"{stem}-{datetime.datetime.now(datetime.timezone.utc):%Y%m%d%H%M%S%f}-{os.getpid()}{ext}"
+
+    def _compress(self, path):
+        tmp_path = f"{path}.gz.tmp"
+        try:
+            with open(path, 'rb') as src, gzip.open(tmp_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp_path, f"{path}.gz")
+            os.remove(path)
+        except Exception as e:
+            # The uncompressed file is kept, nothing is lost
+            print(f"Feedback log compression error: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def archives(self):
+        """Compressed rotated files, oldest first."""
+        directory = os.path.dirname(self.path)
+        stem = os.path.splitext(os.path.basename(self.path))[0]
+        return sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.startswith(f"{stem}-") and name.endswith('.gz')
+        )
+
+    def _prune(self):
+        if self.backups <= 0:
+            return
+        for path in self.archives()[:-self.backups]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def close(self, timeout=5.0):
+        """Writes what is still queued and stops the writer (called at exit)."""
+        if self._pid != os.getpid() or self._thread is None:
+            return
+        self._stopping.set()
+        try:
+            self._queue.put_nowait(_WAKE)
+        except queue.Full:
+            # The writer is busy anyway and sees the stop before its next wait
+            pass
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "path": self.path,
+                "queued": self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0,
+                "queue_max": self.queue_max,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "written": self.written,
+                "batches": self.batches,
+                "rotations": self.rotations,
+                "errors": self.errors,
+                "last_error": self.last_error,
+                "flush_interval": self.flush_interval,
+                "fsync": self.fsync
+            }
+
+
+feedback_log = FeedbackLog()
@@ -0,0 +1,112 @@
+"""
+Array-compiled Random Forest evaluator for the Smart Crop Advisory System.
+
+For a single row, RandomForestClassifier.predict_proba spends most of its time
+in input validation and in dispatching 200 estimators through joblib, not in
+walking the trees. This module evaluates every tree of the trained forest from
+one set of contiguous node arrays (built by model_bundle.forest_arrays, and
+stored as-is in model bundles):
+
+    feature       (n_nodes,)            feature index tested at each node
+    threshold     (n_nodes,)            split threshold (go left when x <= threshold)
+    children      (n_nodes, 2)          global index of the left and right child
+    missing_left  (n_nodes,)            where NaN inputs go (sklearn >= 1.3 trees)
+    value         (n_nodes, n_classes)  class probabilities stored at each node
+    roots         (n_trees,)            index of each tree's root node
+
+All trees are then evaluated together with NumPy: every (sample, tree) pair
+holds a node index and one vectorized step moves all pairs still on an
+internal node one level down, until every pair has reached its leaf.
+
+The arithmetic mirrors scikit-learn exactly (float32 inputs, per-tree
+probabilities summed in estimator order, then divided by the number of trees),
+so the probabilities are bit-identical to rf.predict_proba.
+"""
+
+import os
+import sys
+import numpy as np
+
+# The node layout is defined with the model bundle format, next to the training scripts
+MODEL_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../model"))
+if MODEL_DIR not in sys.path:
+    sys.path.append(MODEL_DIR)
+from model_bundle import forest_arrays
+
+
+class CompiledForest:
+    """
+    Flattened, NumPy-evaluated copy of a fitted RandomForestClassifier.
+    Exposes the same predict_proba / classes_ interface used by the routes.
+    """
+
+    def __init__(self, feature, threshold, children, missing_left, value, roots, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        # Leaves are stored as nodes whose children point back to themselves
+        self.is_leaf = children[:, 0] == np.arange(len(children))
+        self._children_flat = children.ravel()
+
+    @classmethod
+    def from_sklearn(cls, rf):
+        """
+        Compiles a fitted RandomForestClassifier into contiguous node arrays.
+
+        Args:
+            rf (sklearn.ensemble.RandomForestClassifier): Trained single-output forest.
+
+        Returns:
+            CompiledForest: Engine producing the same probabilities as rf.predict_proba.
+        """
+        return cls(classes=rf.classes_, **forest_arrays(rf))
+
+    def apply(self, X):
+        """
+        Returns the leaf index reached in every tree, shape (n_samples, n_trees).
+        """
+        # sklearn evaluates trees on float32 inputs; compare the same way
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        n_samples, n_features = X.shape
+        n_trees = len(self.roots)
+
+        # One entry per (sample, tree) pair, flattened sample-major
+        X_flat = X.ravel()
+        nodes = np.tile(self.roots, n_samples)
+        row_offset = np.repeat(np.arange(n_samples) * n_features, n_trees)
+        active = np.flatnonzero(~self.is_leaf[nodes])
+
+        while active.size:
+            current = nodes[active]
+            x = X_flat[row_offset[active] + self.feature[current]]
+            go_left = (x <= self.threshold[current]) | (np.isnan(x) & self.missing_left[current])
+            # children[node, 0] is the left child, children[node, 1] the right one
+            nxt = self._children_flat[2 * current + ~go_left]
+            nodes[active] = nxt
+            active = active[~self.is_leaf[nxt]]
+
+        return nodes.reshape(n_samples, n_trees)
+
+    def predict_proba(self, X):
+        """
+        Class probabilities for one row or many, bit-identical to rf.predict_proba.
+        """
+        leaves = self.apply(X)
+        n_samples, n_trees = leaves.shape
+
+        # Trees are added one after another in estimator order, like sklearn
+        if n_samples <= 32:
+            proba = np.add.reduce(self.value[leaves.T], axis=0)
+        else:
+            proba = np.zeros((n_samples, self.value.shape[1]), dtype=np.float64)
+            for tree_idx in range(n_trees):
+                proba += self.value[leaves[:, tree_idx]]
+
+        proba /= n_trees
+        return proba
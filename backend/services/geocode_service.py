@@ -0,0 +1,199 @@
+"""
+Geocoding layer behind /api/search.
+
+Lookups go through three local tiers before touching Nominatim:
+  1. an in-memory LRU keyed by the normalized query,
+  2. a SQLite file that persists every resolved query across restarts,
+  3. a prefix index (sorted list + bisect) over the names of places resolved
+     so far, so autocomplete keystrokes ("pu", "pun", "pune") are answered
+     locally once a full page (SEARCH_LIMIT) of matching places is known.
+Everything else is forwarded to Nominatim, which keeps us within its usage
+policy. Queries Nominatim found nothing for are only remembered for
+GEOCODE_EMPTY_TTL seconds, so a transient empty answer does not stick.
+"""
+
+import bisect
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from services.upstream_client import get_upstream_client
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Overridable so tests can point the service at a local stub server
+NOMINATIM_URL = os.getenv('NOMINATIM_URL', "https://nominatim.openstreetmap.org/search")
+GEOCODE_CACHE_DB = os.getenv('GEOCODE_CACHE_DB', os.path.join(BASE_DIR, '../geocode_cache.db'))
+GEOCODE_CACHE_SIZE = int(os.getenv('GEOCODE_CACHE_SIZE', 5000))
+GEOCODE_EMPTY_TTL = float(os.getenv('GEOCODE_EMPTY_TTL', 3600))
+SEARCH_LIMIT = 5
+
+
+def normalize_query(text):
+    """
+    Applies NFKC normalization, case-folds and collapses whitespace.
+    """
+    text = unicodedata.normalize('NFKC', str(text)).casefold()
+    return ' '.join(text.split())
+
+
+class GeocodeCache:
+    def __init__(self, db_path, maxsize, empty_ttl=GEOCODE_EMPTY_TTL):
+        self.maxsize = int(maxsize)
+        self.empty_ttl = float(empty_ttl)
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()  # normalized query -> results
+        self._names = []           # sorted normalized place names
+        self._places = {}          # normalized place name -> result dict
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.prefix_hits = 0
+        self.misses = 0
+
+        try:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+        except sqlite3.Error as e:
+            print(f"Geocode cache DB unavailable ({e}), using memory only")
+            self._db = sqlite3.connect(':memory:', check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            "query TEXT PRIMARY KEY, results TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+        # Rebuild the prefix index from everything resolved in earlier runs
+        for (results_json,) in self._db.execute("SELECT results FROM geocode"):
+            self._index_places(json.loads(results_json))
+
+    def _index_places(self, results):
+        for place in results:
+            name = normalize_query(place.get('name') or '')
+            if name and name not in self._places:
+                bisect.insort(self._names, name)
+                self._places[name] = place
+
+    def _remember(self, key, results):
+        self._lru[key] = results
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def _prefix_matches(self, prefix, limit):
+        start = bisect.bisect_left(self._names, prefix)
+        matches = []
+        for name in self._names[start:start + limit]:
+            if not name.startswith(prefix):
+                break
+            matches.append(self._places[name])
+        return matches
+
+    def lookup(self, query, limit=SEARCH_LIMIT):
+        """
+        Returns cached results for query, or None on a true miss.
+        """
+        key = normalize_query(query)
+        with self._lock:
+            results = self._lru.get(key)
+            if results is not None:
+                self._lru.move_to_end(key)
+                self.memory_hits += 1
+                return results
+
+            row = self._db.execute("SELECT results, created_at FROM geocode WHERE query = ?", (key,)).fetchone()
+            if row is not None:
+                results = json.loads(row[0])
+                if results:
+                    self._remember(key, results)
+                    self.disk_hits += 1
+                    return results
+                # Empty answers are not kept in memory and expire
+                if time.time() - row[1] < self.empty_ttl:
+                    self.disk_hits += 1
+                    return results
+
+            # Fewer known places than a full page may mean Nominatim knows more ("pu" -> Puducherry)
+            results = self._prefix_matches(key, limit)
+            if len(results) >= limit:
+                self.prefix_hits += 1
+                return results
+
+            self.misses += 1
+            return None
+
+    def store(self, query, results):
+        key = normalize_query(query)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO geocode (query, results, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(results), time.time())
+            )
+            self._db.commit()
+            if results:
+                self._remember(key, results)
+                self._index_places(results)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_entries": len(self._lru),
+                "indexed_places": len(self._names),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "prefix_hits": self.prefix_hits,
+                "misses": self.misses
+            }
+
+
+geocode_cache = None
+_geocode_cache_lock = threading.Lock()
+
+
+def get_geocode_cache():
+    global geocode_cache
+    with _geocode_cache_lock:
+        if geocode_cache is None:
+            geocode_cache = GeocodeCache(GEOCODE_CACHE_DB, GEOCODE_CACHE_SIZE)
+        return geocode_cache
+
+
+def fetch_places(query):
+    """
+    Queries Nominatim and returns [{name, latitude, longitude}, ...].
+    """
+    params = {
+        'q': query,
+        'format': 'json',
+        'limit': SEARCH_LIMIT,
+        'addressdetails': 1
+    }
+    headers = {
+        'User-Agent': 'SmartCropAdvisorySystem/1.0'
+    }
+
+    res = get_upstream_client('nominatim').get(NOMINATIM_URL, params=params, headers=headers)
+    data = res.json()
+
+    results = []
+    for item in data:
+        results.append({
+            "name": item.get('display_name'),
+            "latitude": float(item.get('lat')),
+            "longitude": float(item.get('lon'))
+        })
+    return results
+
+
+def search_places(query):
+    """
+    Resolves a place query, using the local cache tiers before Nominatim.
+    """
+    cache = get_geocode_cache()
+    results = cache.lookup(query)
+    if results is None:
+        results = fetch_places(query)
+        cache.store(query, results)
+    return results
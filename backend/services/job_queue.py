@@ -0,0 +1,304 @@
+"""
+Background job queue for long-running research work (simulations).
+
+Jobs run in a bounded ProcessPoolExecutor, so model fitting happens outside the
+web worker (and outside its GIL) and a request only pays for enqueueing. The
+pool processes run at a lower CPU priority with BLAS/OpenMP limited to one
+thread, and the number of unfinished jobs is capped, so research users cannot
+starve prediction traffic.
+
+A task is a picklable top-level function `fn(params, report)`. It calls
+`report(stage, step, total)` between stages: that publishes progress to the
+web process and is also the point where a cancellation request takes effect
+(JobCancelled is raised inside the worker). Tasks producing results piece by
+piece (sweeps) call `report.emit(item)`; emitted items are visible as the
+job's "partial" list while it runs.
+
+Pool processes are spawned, so they re-run the main script (app.py under
+`python app.py`) as __mp_main__; services.model_service does not load the
+models in them.
+
+Job state lives in the process that accepted the job, so with several
+gunicorn workers the status URL must reach the same worker (or run one worker
+for the research API).
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+class QueueFullError(Exception):
+    """Raised when the number of unfinished jobs has reached the queue limit."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job has been cancelled."""
+
+
+class JobReporter:
+    def __init__(self, job_id, progress, partials, cancelled):
+        self.job_id = job_id
+        self._progress = progress
+        self._partials = partials
+        self._cancelled = cancelled
+        self._items = []
+
+    def check_cancelled(self):
+        if self._cancelled.get(self.job_id):
+            raise JobCancelled(f"Job {self.job_id} was cancelled")
+
+    def __call__(self, stage, step=None, total=None):
+        self.check_cancelled()
+        self._progress[self.job_id] = {"stage": stage, "step": step, "total": total}
+
+    def emit(self, item):
+        self.check_cancelled()
+        self._items.append(item)
+        # Manager dict values are copies, so the whole list is republished
+        self._partials[self.job_id] = self._items
+
+
+def _init_worker(nice):
+    if nice and hasattr(os, 'nice'):
+        try:
+            os.nice(nice)
+        except OSError:
+            pass
+    try:
+        # One BLAS/OpenMP thread per job process, the pool size bounds CPU use
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+
+
+def _run_job(fn, job_id, params, progress, partials, cancelled):
+    report = JobReporter(job_id, progress, partials, cancelled)
+    report("started")
+    return fn(params, report)
+
+
+class JobQueue:
+    def __init__(self, name, max_workers=1, max_pending=4, result_ttl=900, nice=10, mp_context='spawn'):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self.max_pending = max(1, int(max_pending))
+        self.result_ttl = float(result_ttl)
+        self.nice = int(nice)
+        self._mp = multiprocessing.get_context(mp_context)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._manager = None
+        self._progress = None
+        self._partials = None
+        self._cancelled = None
+        self._jobs = OrderedDict()
+        self.submitted = 0
+        self.rejected = 0
+
+    def _ensure_pool(self):
+        # Created lazily so importing the module (or forking gunicorn workers
+        # from a preloaded app) does not start any processes
+        if self._manager is None:
+            self._manager = self._mp.Manager()
+            self._progress = self._manager.dict()
+            self._partials = self._manager.dict()
+            self._cancelled = self._manager.dict()
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=self._mp,
+                initializer=_init_worker,
+                initargs=(self.nice,)
+            )
+        return self._executor
+
+    def _unfinished(self):
+        return sum(1 for job in self._jobs.values() if not job["future"].done())
+
+    def _prune(self):
+        now = time.time()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job["finished_at"] and now - job["finished_at"] > self.result_ttl]:
+            del self._jobs[job_id]
+
+    def submit(self, fn, params):
+        """
+        Enqueues fn(params, report) and returns the job description.
+        Raises QueueFullError when max_pending jobs are already unfinished.
+        """
+        with self._lock:
+            self._prune()
+            if self._unfinished() >= self.max_pending:
+                self.rejected += 1
+                raise QueueFullError(f"{self.name} queue is full ({self.max_pending} jobs)")
+
+            job_id = uuid.uuid4().hex
+            executor = self._ensure_pool()
+            try:
+                future = executor.submit(_run_job, fn, job_id, params, self._progress, self._partials, self._cancelled)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM kill): start a fresh pool and retry once
+                self._executor = None
+                future = self._ensure_pool().submit(_run_job, fn, job_id, params, self._progress, self._partials, self._cancelled)
+
+            job = {
+                "id": job_id,
+                "future": future,
+                "created_at": time.time(),
+                "finished_at": None,
+                "cancel_requested": False,
+                "last_progress": None,
+                "partial": []
+            }
+            self._jobs[job_id] = job
+            self.submitted += 1
+        future.add_done_callback(lambda _: self._finish(job))
+        return self.describe(job_id)
+
+    def _finish(self, job):
+        try:
+            job["last_progress"] = self._progress.pop(job["id"], job["last_progress"])
+            job["partial"] = self._partials.pop(job["id"], job["partial"])
+            self._cancelled.pop(job["id"], None)
+        except Exception:
+            # Manager already gone during interpreter shutdown
+            pass
+        job["finished_at"] = time.time()
+
+    def describe(self, job_id, include_result=True):
+        """
+        Returns {id, status, progress, created_at, finished_at, partial, result, error},
+        or None. Status is one of queued, running, cancelling, succeeded, failed,
+        cancelled. "partial" lists the items emitted so far, when there are any.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        future = job["future"]
+        result = None
+        error = None
+        if future.done():
+            if job["finished_at"] is None:
+                # Done callback has not moved the shared state over yet
+                progress = self._progress.get(job_id, job["last_progress"])
+                partial = self._partials.get(job_id, job["partial"])
+            else:
+                progress = job["last_progress"]
+                partial = job["partial"]
+            if future.cancelled():
+                status = "cancelled"
+            else:
+                exc = future.exception()
+                if isinstance(exc, JobCancelled):
+                    status = "cancelled"
+                elif exc is not None:
+                    status = "failed"
+                    error = str(exc) or exc.__class__.__name__
+                else:
+                    status = "succeeded"
+                    result = future.result() if include_result else None
+        else:
+            progress = self._progress.get(job_id)
+            partial = self._partials.get(job_id, [])
+            if progress is None:
+                status = "queued"
+            else:
+                status = "cancelling" if job["cancel_requested"] else "running"
+
+        description = {
+            "id": job_id,
+            "status": status,
+            "progress": progress,
+            "created_at": job["created_at"],
+            "finished_at": job["finished_at"]
+        }
+        if partial:
+            description["partial"] = partial
+        if status == "succeeded" and include_result:
+            description["result"] = result
+        if error is not None:
+            description["error"] = error
+        return description
+
+    def cancel(self, job_id):
+        """
+        Cancels a job. Queued jobs are dropped immediately; running jobs stop
+        at their next report() call. Returns the job description, or None.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if not job["future"].done() and not job["future"].cancel():
+            job["cancel_requested"] = True
+            self._cancelled[job_id] = True
+        return self.describe(job_id, include_result=False)
+
+    def stats(self):
+        with self._lock:
+            self._prune()
+            jobs = list(self._jobs)
+        statuses = {}
+        for job_id in jobs:
+            description = self.describe(job_id, include_result=False)
+            if description:
+                statuses[description["status"]] = statuses.get(description["status"], 0) + 1
+        return {
+            "name": self.name,
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "jobs": statuses
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            if self._manager is not None:
+                self._manager.shutdown()
+                self._manager = None
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_job_queue(name, **settings):
+    """
+    Returns the process-wide queue with this name, creating it on first use.
+    """
+    with _queues_lock:
+        queue = _queues.get(name)
+        if queue is None:
+            queue = JobQueue(name, **settings)
+            _queues[name] = queue
+        return queue
+
+
+def get_job_queue_stats():
+    """stats() of every queue created in this process."""
+    with _queues_lock:
+        queues = list(_queues.values())
+    return [queue.stats() for queue in queues]
+
+
+@atexit.register
+def _shutdown_queues():
+    for queue in list(_queues.values()):
+        try:
+            queue.shutdown()
+        except Exception:
+            pass
@@ -0,0 +1,86 @@
+"""
+Faster JSON encoding for API responses.
+
+FastJSONProvider replaces Flask's default provider, so jsonify() and
+returning a dict both go through it. It encodes with orjson (listed in
+requirements.txt) and falls back to the standard library when orjson is
+missing, which is logged once at import. Both paths understand NumPy scalars and arrays, write UTF-8 instead
+of \\u escapes (Hindi/Marathi text is about a third the size) and keep
+Flask's sorted keys and compact separators.
+
+gzip_json_response() additionally gzip-compresses bodies above
+GZIP_MIN_BYTES when the client sends Accept-Encoding: gzip.
+"""
+
+import gzip
+import json
+
+import numpy as np
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    print("orjson is not installed, encoding JSON with the standard library (pip install -r requirements.txt)")
+    orjson = None
+
+# Smaller bodies go out uncompressed (gzip would save less than its framing costs on slow links)
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+
+
+def default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    # dates, decimals, UUIDs, dataclasses
+    return DefaultJSONProvider.default(obj)
+
+
+def dumps_bytes(obj):
+    """obj as compact, key-sorted UTF-8 JSON bytes."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=default, option=ORJSON_OPTIONS)
+        except TypeError:
+            # e.g. dict keys orjson does not accept (NumPy integers); the stdlib path coerces them
+            pass
+    return json.dumps(obj, default=default, ensure_ascii=False, sort_keys=True,
+                      separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            kwargs.setdefault('default', default)
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            # Indented output in debug mode, as Flask does
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+def gzip_json_response(obj):
+    """
+    JSON response for obj, gzip-encoded when the client accepts it and the body
+    is large enough to be worth it.
+    """
+    response = current_app.json.response(obj)
+    response.vary.add('Accept-Encoding')
+    if 'gzip' in request.accept_encodings:
+        body = response.get_data()
+        if len(body) >= GZIP_MIN_BYTES:
+            response.set_data(gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0))
+            response.headers['Content-Encoding'] = 'gzip'
+    return response
@@ -0,0 +1,169 @@
+"""
+Localization catalog for the prediction responses.
+
+data/localization.json holds the supported languages, the advisory texts,
+the crop calendar, the pest/disease alerts, month names and the
+translations. It is loaded and validated once, when the module is imported,
+and every localized fragment a response can contain is built up front:
+
+    advisory(keys, lang)              the advisory block for one combination of tips
+    crop_fragment(crop, month, lang)  crop_calendar, current_month and pest_disease_alert
+    translate(text, lang)             any other catalog text (e.g. crop names)
+
+so localizing a response costs a dict lookup per fragment, whatever the
+number of languages. The returned dicts and lists are shared between
+responses and must not be modified.
+
+Texts without a translation fall back to English.
+"""
+
+import calendar
+import itertools
+import json
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOCALIZATION_CATALOG = os.getenv('LOCALIZATION_CATALOG', os.path.join(BASE_DIR, '../data/localization.json'))
+
+MONTH_NAMES = frozenset(calendar.month_name[1:])
+
+# Order of the blocks in an advisory and of the keys passed to advisory()
+ADVISORY_SLOTS = ('fertilizer_tip', 'irrigation_tip', 'best_season', 'soil_note')
+
+
+class CatalogError(ValueError):
+    pass
+
+
+def validate_catalog(data):
+    """
+    Checks the structure of a parsed catalog. Raises CatalogError listing every problem.
+    """
+    problems = []
+    languages = data.get('languages')
+    if not isinstance(languages, dict) or 'en' not in languages:
+        problems.append("languages must be an object that includes 'en'")
+        languages = {}
+
+    advisory = data.get('advisory', {})
+    for slot in ADVISORY_SLOTS:
+        texts = advisory.get(slot)
+        if not isinstance(texts, dict) or not texts:
+            problems.append(f"advisory.{slot} must map keys to texts")
+        elif not all(isinstance(text, str) for text in texts.values()):
+            problems.append(f"advisory.{slot} texts must be strings")
+    for slot in set(advisory) - set(ADVISORY_SLOTS):
+        problems.append(f"advisory.{slot} is not an advisory block")
+
+    for crop, seasons in data.get('crop_calendar', {}).items():
+        for season in ('planting', 'harvest'):
+            unknown = set(seasons.get(season, [])) - MONTH_NAMES
+            if unknown:
+                problems.append(f"crop_calendar.{crop}.{season}: unknown months {sorted(unknown)}")
+
+    for crop, alerts in data.get('pest_alerts', {}).items():
+        unknown = set(alerts) - MONTH_NAMES
+        if unknown:
+            problems.append(f"pest_alerts.{crop}: unknown months {sorted(unknown)}")
+    if not isinstance(data.get('no_alert'), str):
+        problems.append("no_alert must be a string")
+
+    for section in ('months', 'translations'):
+        for lang, table in data.get(section, {}).items():
+            if lang not in languages:
+                problems.append(f"{section}.{lang}: language not in languages")
+            if not all(isinstance(key, str) and isinstance(value, str) for key, value in table.items()):
+                problems.append(f"{section}.{lang}: keys and values must be strings")
+    for lang, table in data.get('months', {}).items():
+        unknown = set(table) - MONTH_NAMES
+        if unknown:
+            problems.append(f"months.{lang}: unknown months {sorted(unknown)}")
+
+    if problems:
+        raise CatalogError("Invalid localization catalog: " + "; ".join(problems))
+
+
+class LocalizationCatalog:
+    def __init__(self, data):
+        validate_catalog(data)
+        self.languages = dict(data['languages'])
+        self.advisory_texts = {slot: dict(data['advisory'][slot]) for slot in ADVISORY_SLOTS}
+        self.crop_calendar = data.get('crop_calendar', {})
+        self.pest_alerts = data.get('pest_alerts', {})
+        self.no_alert = data['no_alert']
+        self._translations = {lang: dict(data.get('translations', {}).get(lang, {})) for lang in self.languages}
+        self._translations['en'] = {}
+        self._months = {lang: dict(data.get('months', {}).get(lang, {})) for lang in self.languages}
+
+        self._advisories = self._build_advisories()
+        self._crop_fragments, self._default_fragments = self._build_crop_fragments()
+
+    @classmethod
+    def load(cls, path=LOCALIZATION_CATALOG):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def translate(self, text, lang):
+        return self._translations.get(lang, self._translations['en']).get(text, text)
+
+    def localize_months(self, months, lang):
+        if lang == 'en' or not months:
+            return months
+        month_map = self._months.get(lang, {})
+        return [month_map.get(m, m) for m in months]
+
+    def _build_advisories(self):
+        # Every combination of tips, e.g. 4 x 3 x 3 x 1 = 36 advisories per language
+        advisories = {}
+        slot_keys = [list(self.advisory_texts[slot]) for slot in ADVISORY_SLOTS]
+        for lang in self.languages:
+            for keys in itertools.product(*slot_keys):
+                advisories[(keys, lang)] = {
+                    slot: self.translate(self.advisory_texts[slot][key], lang)
+                    for slot, key in zip(ADVISORY_SLOTS, keys)
+                }
+        return advisories
+
+    def _crop_fragment(self, crop, month, lang):
+        crop_calendar = self.crop_calendar.get(crop, {})
+        alert = self.pest_alerts.get(crop, {}).get(month, self.no_alert)
+        return {
+            "crop_calendar": {
+                "planting": self.localize_months(crop_calendar.get("planting", []), lang),
+                "harvest": self.localize_months(crop_calendar.get("harvest", []), lang)
+            } if crop_calendar else {},
+            "current_month": self.translate(month, lang),
+            "pest_disease_alert": self.translate(alert, lang)
+        }
+
+    def _build_crop_fragments(self):
+        crops = set(self.crop_calendar) | set(self.pest_alerts)
+        fragments = {}
+        defaults = {}
+        for month in calendar.month_name[1:]:
+            for lang in self.languages:
+                for crop in crops:
+                    fragments[(crop, month, lang)] = self._crop_fragment(crop, month, lang)
+                # Crops without calendar or alerts all share one fragment
+                defaults[(month, lang)] = self._crop_fragment(None, month, lang)
+        return fragments, defaults
+
+    def advisory(self, keys, lang):
+        """
+        Localized advisory for keys, a tuple with one advisory text key per
+        ADVISORY_SLOTS entry. lang must be one of self.languages.
+        """
+        return self._advisories[(keys, lang)]
+
+    def crop_fragment(self, crop, month, lang):
+        """
+        {"crop_calendar", "current_month", "pest_disease_alert"} for the crop in
+        the given (English) month. lang must be one of self.languages.
+        """
+        fragment = self._crop_fragments.get((crop, month, lang))
+        if fragment is None:
+            fragment = self._default_fragments[(month, lang)]
+        return fragment
+
+
+catalog = LocalizationCatalog.load()
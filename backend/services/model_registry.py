@@ -0,0 +1,161 @@
+"""
+Hot-reloadable holder for the loaded model version.
+
+The registry keeps one immutable model object (a model_service.ModelSet) and
+replaces it as a whole. A request takes the current object once and uses it to
+the end, so a swap never mixes versions inside a request and in-flight
+requests finish on the version they started with; the old version is freed
+once the last of them drops its reference.
+
+A reload loads the new artifacts in a background thread, runs a warm-up
+prediction through them and only then swaps the reference. If loading or
+warm-up fails, the current version keeps serving and the error is reported by
+status().
+
+Reloads are triggered by reload() (the admin endpoint) or by a watcher thread
+polling the artifact signature every `watch_interval` seconds. The watcher
+waits until the signature is the same on two consecutive polls, so artifacts
+still being written are not picked up halfway. It is started lazily in the
+process that serves requests, so it also runs in forked gunicorn workers.
+"""
+
+import os
+import threading
+import time
+
+
+class ModelRegistry:
+    def __init__(self, loader, signature, warm_up=None, watch_interval=0, history_size=10):
+        """
+        Args:
+            loader: callable() returning a new model object with a .version attribute.
+            signature: cheap callable() that changes when the artifacts change.
+            warm_up: callable(models) run before a loaded version goes live; raises on failure.
+            watch_interval: seconds between signature polls, 0 disables the watcher.
+        """
+        self._loader = loader
+        self._signature = signature
+        self._warm_up = warm_up
+        self.watch_interval = float(watch_interval)
+        self.history_size = history_size
+        self._current = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._reload_thread = None
+        self._watcher_pid = None
+        self._loaded_signature = None
+        self._failed_signature = None
+        self._pending_signature = None
+        self.last_error = None
+        self.last_checked = None
+        self.reloads = 0
+        self.history = []
+
+    def current(self, watch=True):
+        """
+        The live model object, or None when nothing could be loaded.
+        watch=False does not start the watcher (e.g. in a gunicorn master before fork).
+        """
+        if watch and self.watch_interval > 0 and self._watcher_pid != os.getpid():
+            self._start_watcher()
+        return self._current
+
+    def load(self, force=False):
+        """
+        Loads, warms up and swaps in the artifacts synchronously.
+        Returns True when a new version went live.
+        """
+        with self._load_lock:
+            return self._load(force)
+
+    def _load(self, force):
+        try:
+            signature = self._signature()
+        except Exception:
+            signature = None
+        try:
+            models = self._loader()
+            current = self._current
+            if not force and current is not None and models.version == current.version:
+                self._loaded_signature = signature
+                return False
+            if self._warm_up is not None:
+                self._warm_up(models)
+        except Exception as e:
+            print(f"Error loading models: {e}")
+            self.last_error = f"{e.__class__.__name__}: {e}"
+            self._failed_signature = signature
+            return False
+
+        with self._lock:
+            self._current = models
+            self._loaded_signature = signature
+            self._failed_signature = None
+            self.last_error = None
+            self.reloads += 1
+            self.history.append({"version": models.version, "loaded_at": time.time()})
+            del self.history[:-self.history_size]
+        print(f"Model version {models.version} is live.")
+        return True
+
+    def reload(self, wait=False, force=False):
+        """
+        Starts a background reload unless one is already running.
+        With wait=True, blocks until it has finished. Returns status().
+        """
+        with self._lock:
+            thread = self._reload_thread
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(target=self.load, kwargs={"force": force},
+                                          name="model-reload", daemon=True)
+                self._reload_thread = thread
+                thread.start()
+        if wait:
+            thread.join()
+        return self.status()
+
+    def check(self):
+        """One watcher poll: reloads once a changed signature has settled."""
+        self.last_checked = time.time()
+        try:
+            signature = self._signature()
+        except Exception as e:
+            print(f"Error checking model artifacts: {e}")
+            return
+        if signature in (self._loaded_signature, self._failed_signature):
+            self._pending_signature = None
+            return
+        if self._pending_signature != signature:
+            # Changed since the last poll; wait for it to stop changing
+            self._pending_signature = signature
+            return
+        self._pending_signature = None
+        self.load()
+
+    def _start_watcher(self):
+        with self._lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+
+        def watch():
+            while True:
+                time.sleep(self.watch_interval)
+                self.check()
+
+        threading.Thread(target=watch, name="model-watcher", daemon=True).start()
+
+    def status(self):
+        current = self._current
+        thread = self._reload_thread
+        return {
+            "version": current.version if current is not None else None,
+            "source": getattr(current, "source", None),
+            "loaded_at": getattr(current, "loaded_at", None),
+            "reloading": bool(thread is not None and thread.is_alive()),
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+            "watch_interval": self.watch_interval,
+            "last_checked": self.last_checked,
+            "history": list(self.history)
+        }
@@ -1,33 +1,305 @@
-
+import hashlib
 import os
+import sys
+import time
 import joblib
 import numpy as np
+import shap
+from services.cluster_membership import compute_fuzzy_membership_batch, combine_with_rf_probabilities_batch
+from services.forest_engine import CompiledForest
+from services.model_registry import ModelRegistry
 
 # Load artifacts
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_DIR = os.path.join(BASE_DIR, '../../model')
 
-try:
+if os.path.abspath(MODEL_DIR) not in sys.path:
+    sys.path.append(os.path.abspath(MODEL_DIR))
+from model_bundle import build_cluster_matrix, current_version, load_bundle
+from neighbor_index import NEIGHBORS_FILE, NeighborIndex
+
+# Random Forest inference engine: 'sklearn' (rf.predict_proba) or 'compiled'
+# (flattened node arrays evaluated with NumPy, see services/forest_engine.py)
+RF_ENGINE = os.getenv('RF_ENGINE', 'sklearn').lower()
+
+# Artifact format: 'pickle' (the four .pkl files), 'bundle' (memory-mapped model bundle,
+# see model/model_bundle.py) or 'auto' (the bundle when one exists). A bundle always
+# scores with the compiled forest, so it is opt-in: the default path keeps RF_ENGINE.
+MODEL_FORMAT = os.getenv('MODEL_FORMAT', 'pickle').lower()
+MODEL_BUNDLE_DIR = os.getenv('MODEL_BUNDLE_DIR', os.path.join(MODEL_DIR, 'bundles'))
+
+# Seconds between checks of the artifacts for a new version (0 = only reload via the admin endpoint)
+MODEL_WATCH_INTERVAL = float(os.getenv('MODEL_WATCH_INTERVAL', 0))
+
+PICKLE_FILES = ('rf_model.pkl', 'kmeans.pkl', 'scaler.pkl', 'cluster_map.pkl')
+
+# Similar-farms index (see model/neighbor_index.py) used when the bundle has none.
+# It is built by train_model.py / neighbor_index.py, never at startup: when it is
+# missing or was built with another scaler, similar samples are disabled.
+NEIGHBORS_INDEX_PATH = os.getenv('NEIGHBORS_INDEX_PATH', os.path.join(MODEL_DIR, NEIGHBORS_FILE))
+
+
+class ModelSet:
+    """
+    One loaded model version: everything a prediction needs. It is never
+    modified after loading (apart from the lazily built per-class explainers),
+    the registry replaces it as a whole.
+    """
+
+    def __init__(self, version, source, rf_model, compiled_forest, kmeans_model, scaler,
+                 cluster_map, cluster_matrix, shap_explainer, neighbor_index=None):
+        self.version = version
+        self.source = source
+        self.rf_model = rf_model
+        self.compiled_forest = compiled_forest
+        self.kmeans_model = kmeans_model
+        self.scaler = scaler
+        self.cluster_map = cluster_map
+        self.cluster_matrix = cluster_matrix
+        self.shap_explainer = shap_explainer
+        # KD-tree over the scaled training rows, None when unavailable
+        self.neighbor_index = neighbor_index
+        # Single-class explainers derived from shap_explainer, built on first use
+        self.class_explainers = {}
+        self.loaded_at = time.time()
+
+    @property
+    def rf(self):
+        """
+        The forest as an object with classes_ and predict_proba: the sklearn model
+        when loaded from pickles, the compiled forest when loaded from a bundle.
+        """
+        return self.rf_model if self.rf_model is not None else self.compiled_forest
+
+    @property
+    def rf_engine(self):
+        """
+        Object whose predict_proba scores the forest: the compiled engine when
+        RF_ENGINE=compiled or loaded from a bundle, otherwise the sklearn model.
+        """
+        return self.compiled_forest if self.compiled_forest is not None else self.rf_model
+
+    def get_class_explainer(self, class_idx):
+        """
+        Returns a TreeExplainer restricted to one output class of the forest, so that
+        explaining the top crop does not pay for all the other classes.
+        """
+        explainer = self.class_explainers.get(class_idx)
+        if explainer is None and self.shap_explainer is not None:
+            ensemble = self.shap_explainer.model
+            trees = [{
+                "children_left": tree.children_left,
+                "children_right": tree.children_right,
+                "children_default": tree.children_default,
+                "features": tree.features,
+                "thresholds": tree.thresholds,
+                "values": tree.values[:, class_idx:class_idx + 1],
+                "node_sample_weight": tree.node_sample_weight
+            } for tree in ensemble.trees]
+            base_offset = ensemble.base_offset
+            if np.ndim(base_offset):
+                base_offset = base_offset[class_idx]
+            explainer = shap.TreeExplainer({
+                "trees": trees,
+                "base_offset": base_offset,
+                "tree_output": ensemble.tree_output,
+                "objective": ensemble.objective,
+                "input_dtype": ensemble.input_dtype,
+                "internal_dtype": ensemble.internal_dtype
+            })
+            self.class_explainers[class_idx] = explainer
+        return explainer
+
+
+def pickle_signature():
+    signature = []
+    for name in PICKLE_FILES:
+        st = os.stat(os.path.join(MODEL_DIR, name))
+        signature.append((name, st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def artifact_signature():
+    """
+    Cheap fingerprint of the artifacts that load_models() would pick: the
+    bundle version named by CURRENT, or the pickles' mtimes and sizes.
+    """
+    if MODEL_FORMAT != 'pickle':
+        version = current_version(MODEL_BUNDLE_DIR)
+        if version is not None or MODEL_FORMAT == 'bundle':
+            return ('bundle', version)
+    return ('pickle', pickle_signature())
+
+
+def load_neighbor_index(scaler, index=None):
+    """
+    index when it was built with this scaler, else the persisted index when it
+    was. None (similar samples disabled) otherwise; nothing is rebuilt here.
+    """
+    if index is not None and index.matches(scaler):
+        return index
+    try:
+        index = NeighborIndex.load(NEIGHBORS_INDEX_PATH)
+    except FileNotFoundError:
+        print(f"Similar-farms index disabled: no index at {NEIGHBORS_INDEX_PATH}, "
+              "build it with model/train_model.py or model/neighbor_index.py")
+        return None
+    except Exception as e:
+        print(f"Similar-farms index disabled: error loading {NEIGHBORS_INDEX_PATH}: {e}")
+        return None
+    if not index.matches(scaler):
+        print(f"Similar-farms index disabled: {NEIGHBORS_INDEX_PATH} was built with another scaler, "
+              "rebuild it with model/neighbor_index.py")
+        return None
+    return index
+
+
+def load_bundle_models():
+    # Arrays stay memory-mapped, so all workers share one copy in the page cache.
+    # A bundle always scores with the compiled forest (same probabilities as sklearn).
+    bundle = load_bundle(MODEL_BUNDLE_DIR)
+    if RF_ENGINE != 'compiled':
+        print(f"RF_ENGINE={RF_ENGINE} does not apply to model bundles, scoring with the compiled forest")
+    scaler = bundle.scaler()
+    return ModelSet(
+        version=bundle.version,
+        source='bundle',
+        rf_model=None,
+        compiled_forest=CompiledForest(classes=bundle.classes, **bundle.forest()),
+        kmeans_model=bundle.kmeans(),
+        scaler=scaler,
+        cluster_map=bundle.cluster_map(),
+        cluster_matrix=bundle.cluster_matrix(),
+        # SHAP explainer for the forest is built once here instead of on every request
+        shap_explainer=shap.TreeExplainer(bundle.shap_model()),
+        neighbor_index=load_neighbor_index(scaler, bundle.neighbors())
+    )
+
+
+def load_pickle_models():
+    signature = pickle_signature()
     rf_model = joblib.load(os.path.join(MODEL_DIR, 'rf_model.pkl'))
     kmeans_model = joblib.load(os.path.join(MODEL_DIR, 'kmeans.pkl'))
     scaler = joblib.load(os.path.join(MODEL_DIR, 'scaler.pkl'))
     cluster_map = joblib.load(os.path.join(MODEL_DIR, 'cluster_map.pkl'))
-    print("Models loaded successfully.")
-except Exception as e:
-    print(f"Error loading models: {e}")
-    rf_model = None
-    kmeans_model = None
-    scaler = None
-    cluster_map = None
+
+    # Compiled forest is only built when selected, the default path is unchanged
+    try:
+        compiled_forest = CompiledForest.from_sklearn(rf_model) if RF_ENGINE == 'compiled' else None
+    except Exception as e:
+        print(f"Error compiling Random Forest, falling back to sklearn: {e}")
+        compiled_forest = None
+
+    try:
+        shap_explainer = shap.TreeExplainer(rf_model)
+    except Exception as e:
+        print(f"Error building SHAP explainer: {e}")
+        shap_explainer = None
+
+    return ModelSet(
+        version='pickle-' + hashlib.sha1(repr(signature).encode('utf-8')).hexdigest()[:12],
+        source='pickle',
+        rf_model=rf_model,
+        compiled_forest=compiled_forest,
+        kmeans_model=kmeans_model,
+        scaler=scaler,
+        cluster_map=cluster_map,
+        # Dense (n_clusters x n_classes) view of cluster_map, columns aligned to rf.classes_
+        cluster_matrix=build_cluster_matrix(cluster_map, rf_model.classes_, kmeans_model.n_clusters),
+        shap_explainer=shap_explainer,
+        neighbor_index=load_neighbor_index(scaler)
+    )
+
+
+def load_models():
+    """
+    Loads the artifacts selected by MODEL_FORMAT into a new ModelSet.
+    Raises when nothing can be loaded.
+    """
+    if MODEL_FORMAT == 'bundle':
+        return load_bundle_models()
+    if MODEL_FORMAT != 'pickle':
+        try:
+            return load_bundle_models()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading model bundle, falling back to pickles: {e}")
+    return load_pickle_models()
+
+
+def warm_up(models):
+    """
+    Runs one synthetic prediction (the training mean) through scaling, the
+    forest, centroid distances, fusion, the top-crop explainer and the
+    similar-farms index, so a new
+    version is exercised before it serves traffic. Raises if it looks broken.
+    """
+    mean = getattr(models.scaler, 'mean_', None)
+    row = np.zeros((1, models.scaler.n_features_in_)) if mean is None else np.asarray(mean, dtype=np.float64)[np.newaxis, :]
+    features_scaled = models.scaler.transform(row)
+
+    rf_probs = models.rf_engine.predict_proba(features_scaled)
+    if rf_probs.shape != (1, len(models.rf.classes_)) or not np.all(np.isfinite(rf_probs)):
+        raise ValueError("Warm-up prediction returned invalid probabilities")
+    distances = models.kmeans_model.transform(features_scaled)
+    membership, _ = compute_fuzzy_membership_batch(distances, models.cluster_matrix)
+    _, top_indices = combine_with_rf_probabilities_batch(rf_probs, membership)
+
+    explainer = models.get_class_explainer(int(top_indices[0, 0]))
+    if explainer is not None:
+        explainer.shap_values(features_scaled)
+    if models.neighbor_index is not None:
+        models.neighbor_index.query(features_scaled, 1)
+
+
+registry = ModelRegistry(load_models, artifact_signature, warm_up, watch_interval=MODEL_WATCH_INTERVAL)
+# Spawned job-queue processes (services/job_queue.py) re-run the main script as
+# __mp_main__ (in the serving process that name is only an alias of __main__),
+# importing this module again; only the serving process loads the models
+if getattr(sys.modules.get('__mp_main__'), '__name__', None) != '__mp_main__':
+    registry.load()
+
+
+def get_model_registry():
+    return registry
+
+def get_models():
+    """
+    The live ModelSet, or None when no models are loaded. A request should call
+    this once and use the returned object throughout, so a reload in the middle
+    of the request cannot mix two versions.
+    """
+    return registry.current()
 
 def get_rf_model():
-    return rf_model
+    models = get_models()
+    return models.rf if models is not None else None
+
+def get_rf_engine():
+    models = get_models()
+    return models.rf_engine if models is not None else None
 
 def get_kmeans_model():
-    return kmeans_model
+    models = get_models()
+    return models.kmeans_model if models is not None else None
 
 def get_scaler():
-    return scaler
+    models = get_models()
+    return models.scaler if models is not None else None
 
 def get_cluster_map():
-    return cluster_map
+    models = get_models()
+    return models.cluster_map if models is not None else None
+
+def get_cluster_matrix():
+    models = get_models()
+    return models.cluster_matrix if models is not None else None
+
+def get_shap_explainer():
+    models = get_models()
+    return models.shap_explainer if models is not None else None
+
+def get_class_explainer(class_idx):
+    models = get_models()
+    return models.get_class_explainer(class_idx) if models is not None else None
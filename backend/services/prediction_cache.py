@@ -0,0 +1,97 @@
+"""
+Cache of model outputs for repeat /predict inputs.
+
+Nearby farms often resolve to the same soil cell and the same cached weather,
+so their 7-feature input vectors repeat. The cache stores what the models
+computed for a vector (scaled row, centroid distances, fused crop scores,
+memberships and SHAP explanation), keyed by the model version, the explain
+mode and the feature vector. A hit skips scaling, the forest, the K-Means
+distances and SHAP; the response (language, calendar, soil analysis) is
+still assembled per request, so one entry serves every language.
+
+PREDICTION_CACHE_QUANTIZATION snaps features to a grid when building the
+key, e.g. "temperature=0.1,humidity=1,rainfall=1": vectors in the same grid
+cell share one entry (the outputs of the first one scored), trading precision
+for hit rate. The models always score the exact inputs of a miss. Features
+without a step are used as they are. Entries are
+evicted least-recently-used beyond PREDICTION_CACHE_SIZE;
+PREDICTION_CACHE_SIZE=0 disables the cache.
+"""
+
+import os
+from services.ttl_cache import TTLCache
+
+# Model input order (as FEATURE_NAMES in routes/prediction_routes.py)
+FEATURE_NAMES = ('N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall')
+
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', 4096))
+PREDICTION_CACHE_QUANTIZATION = os.getenv('PREDICTION_CACHE_QUANTIZATION', '')
+
+
+def parse_quantization(spec, feature_names):
+    """
+    "temperature=0.1,rainfall=1" -> one step per feature (0 = not quantized).
+    """
+    steps = dict.fromkeys(feature_names, 0.0)
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        name, _, step = item.partition('=')
+        name = name.strip()
+        if name not in steps:
+            raise ValueError(f"PREDICTION_CACHE_QUANTIZATION: unknown feature '{name}'")
+        steps[name] = float(step)
+        if steps[name] < 0:
+            raise ValueError(f"PREDICTION_CACHE_QUANTIZATION: negative step for '{name}'")
+    return tuple(steps[name] for name in feature_names)
+
+
+class PredictionCache:
+    def __init__(self, feature_names=FEATURE_NAMES, maxsize=PREDICTION_CACHE_SIZE,
+                 quantization=PREDICTION_CACHE_QUANTIZATION):
+        self.feature_names = tuple(feature_names)
+        self.steps = parse_quantization(quantization, feature_names)
+        # Entries are tied to a model version, so they never expire
+        self._cache = TTLCache(maxsize=maxsize, ttl=float('inf'), name="prediction_cache")
+
+    @property
+    def enabled(self):
+        return self._cache.maxsize > 0
+
+    def quantize(self, features):
+        """
+        The feature vector snapped to the configured steps, for the cache key.
+        """
+        return [
+            round(round(value / step) * step, 10) if step else value
+            for value, step in zip(features, self.steps)
+        ]
+
+    @staticmethod
+    def key(model_version, explain, features):
+        return (model_version, explain, tuple(float(value) for value in features))
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, outputs):
+        self._cache.set(key, outputs)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        stats = self._cache.stats()
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            "name": stats["name"],
+            "size": stats["size"],
+            "maxsize": stats["maxsize"],
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+            "hit_ratio": stats["hits"] / lookups if lookups else None,
+            "quantization": {name: step for name, step in zip(self.feature_names, self.steps) if step}
+        }
+
+
+prediction_cache = PredictionCache()
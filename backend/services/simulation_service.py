@@ -0,0 +1,303 @@
+"""
+What-if model simulation used by the research dashboard.
+
+run_simulation trains a model on the crop dataset with user-chosen
+hyperparameters and returns its metrics without saving any artifacts.
+run_sweep traces the same metrics over a parameter grid. Both run inside a
+job_queue worker process and report each stage (or sweep point) as it goes.
+"""
+
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from sklearn.ensemble import AdaBoostClassifier, GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.cluster import KMeans
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import StratifiedKFold, cross_val_score
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(BASE_DIR, "../../dataset/Crop_recommendation.csv")
+MODEL_DIR = os.path.abspath(os.path.join(BASE_DIR, "../../model"))
+
+# The preparation stages live next to the training scripts that share them
+if MODEL_DIR not in sys.path:
+    sys.path.append(MODEL_DIR)
+from dataset_prep import FEATURE_COLUMNS, prepare_dataset
+
+SIMULATION_MODELS = ("Random Forest", "AdaBoost", "Gradient Boosting", "Decision Tree", "Logistic Regression")
+
+SIMULATION_STAGES = ("prepare", "fit", "evaluate", "cross_validation", "kmeans")
+
+SWEEP_PARAMS = ("n_estimators", "max_depth", "learning_rate")
+WARM_START_MODELS = ("Random Forest", "Gradient Boosting")
+SWEEP_MAX_POINTS = int(os.getenv('SWEEP_MAX_POINTS', 200))
+# Job-queue processes running simulations (see routes/simulate_routes.py)
+SIMULATION_WORKERS = max(1, int(os.getenv('SIMULATION_WORKERS', 1)))
+# Threads fitting the hold-out model and CV folds of a sweep point; 0 = this worker's
+# share of the CPUs (cpu_count // SIMULATION_WORKERS), so all workers together stay within the cores
+SWEEP_CV_JOBS = int(os.getenv('SWEEP_CV_JOBS', 0))
+
+
+def sweep_cv_jobs(n_tasks):
+    jobs = SWEEP_CV_JOBS or max(1, (os.cpu_count() or 1) // SIMULATION_WORKERS)
+    return max(1, min(n_tasks, jobs))
+
+
+def parse_simulation_params(data):
+    """
+    Validates a simulation request body. Raises ValueError on bad input.
+    """
+    data = data or {}
+    model_type = data.get('model_type', 'Random Forest')
+    if model_type not in SIMULATION_MODELS:
+        raise ValueError("Unsupported model type")
+    max_depth = data.get('max_depth', None)
+    if max_depth: max_depth = int(max_depth)
+    return {
+        "model_type": model_type,
+        "n_estimators": int(data.get('n_estimators', 100)),
+        "max_depth": max_depth,
+        "learning_rate": float(data.get('learning_rate', 0.1)),
+        "n_clusters": int(data.get('n_clusters', 22)),
+        "use_smote": bool(data.get('use_smote', False)),
+        "scaling_method": data.get('scaling_method', 'Standard')
+    }
+
+
+def build_model(params):
+    model_type = params["model_type"]
+    n_estimators = params["n_estimators"]
+    max_depth = params["max_depth"]
+    learning_rate = params["learning_rate"]
+
+    if model_type == 'Random Forest':
+        return RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=42)
+    if model_type == 'AdaBoost':
+        stump = DecisionTreeClassifier(max_depth=max_depth or 1, random_state=42)
+        try:
+            return AdaBoostClassifier(estimator=stump, n_estimators=n_estimators, learning_rate=learning_rate, random_state=42)
+        except TypeError:
+            return AdaBoostClassifier(base_estimator=stump, n_estimators=n_estimators, learning_rate=learning_rate, random_state=42)
+    if model_type == 'Gradient Boosting':
+        return GradientBoostingClassifier(n_estimators=n_estimators, max_depth=max_depth or 3, learning_rate=learning_rate, random_state=42)
+    if model_type == 'Decision Tree':
+        return DecisionTreeClassifier(max_depth=max_depth, random_state=42)
+    if model_type == 'Logistic Regression':
+        return LogisticRegression(max_iter=1000, random_state=42)
+    raise ValueError("Unsupported model type")
+
+
+def run_simulation(params, report=None):
+    """
+    Simulate training a model without saving any artifacts.
+    This demonstrates the effect of hyperparameters on the model's performance.
+
+    Args:
+        params: output of parse_simulation_params.
+        report: optional callable(stage, step, total) called before each stage.
+
+    Returns:
+        dict with accuracy, f1_score, cv_mean, cv_std, feature_importances,
+        features and kmeans_inertia.
+    """
+    total = len(SIMULATION_STAGES)
+
+    def stage(name):
+        if report is not None:
+            report(name, SIMULATION_STAGES.index(name) + 1, total)
+
+    # 1-3. Outlier capping, split, optional SMOTE and scaling, memoized per
+    # (dataset content, use_smote, scaling_method) so repeat runs skip them
+    stage("prepare")
+    if not os.path.exists(DATA_PATH):
+        raise FileNotFoundError(f"Dataset not found at {DATA_PATH}")
+    prepared = prepare_dataset(path=DATA_PATH, use_smote=params["use_smote"], scaling_method=params["scaling_method"])
+    X_train_scaled, y_train = prepared["X_train_scaled"], prepared["y_train"]
+    X_test_scaled, y_test = prepared["X_test_scaled"], prepared["y_test"]
+
+    # 4. Model Selection / 5. Training
+    stage("fit")
+    model = build_model(params)
+    model.fit(X_train_scaled, y_train)
+
+    # 6. Evaluation
+    stage("evaluate")
+    preds = model.predict(X_test_scaled)
+    acc = accuracy_score(y_test, preds)
+    f1 = f1_score(y_test, preds, average='weighted', zero_division=0)
+
+    # Cross validation
+    stage("cross_validation")
+    skf = StratifiedKFold(n_splits=3, shuffle=True, random_state=42) # 3 for speed
+    cv_scores = cross_val_score(model, X_train_scaled, y_train, cv=skf, scoring='accuracy')
+
+    feature_importances = []
+    if hasattr(model, "feature_importances_"):
+        feature_importances = model.feature_importances_.tolist()
+
+    # 7. KMeans simulation
+    stage("kmeans")
+    X_full_scaled = prepared["X_full_scaled"]
+    kmeans = KMeans(n_clusters=params["n_clusters"], random_state=42, n_init=5)
+    kmeans.fit(X_full_scaled)
+    inertia = kmeans.inertia_
+
+    return {
+        "accuracy": float(acc),
+        "f1_score": float(f1),
+        "cv_mean": float(cv_scores.mean()),
+        "cv_std": float(cv_scores.std()),
+        "feature_importances": feature_importances,
+        "features": FEATURE_COLUMNS,
+        "kmeans_inertia": float(inertia)
+    }
+
+
+def parse_sweep_value(name, value):
+    if name == "max_depth":
+        if value in (None, "", 0):
+            return None
+        value = int(value)
+    elif name == "n_estimators":
+        value = int(value)
+    else:
+        value = float(value)
+    if value <= 0:
+        raise ValueError(f"{name} values must be positive")
+    return value
+
+
+def parse_sweep_params(data):
+    """
+    Validates a sweep request: the simulation parameters plus
+    {"grid": {"n_estimators": [...], "max_depth": [...], "learning_rate": [...]},
+     "cv_folds": 3}. Raises ValueError on bad input.
+    """
+    data = data or {}
+    params = parse_simulation_params(data)
+
+    grid = data.get('grid')
+    if not isinstance(grid, dict) or not grid:
+        raise ValueError("grid must map parameter names to lists of values")
+    unknown = [name for name in grid if name not in SWEEP_PARAMS]
+    if unknown:
+        raise ValueError(f"Cannot sweep {', '.join(unknown)}; supported: {', '.join(SWEEP_PARAMS)}")
+
+    parsed_grid = {}
+    for name in SWEEP_PARAMS:
+        if name not in grid:
+            continue
+        values = grid[name]
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"grid.{name} must be a non-empty list")
+        parsed_grid[name] = list(dict.fromkeys(parse_sweep_value(name, v) for v in values))
+
+    n_points = int(np.prod([len(values) for values in parsed_grid.values()]))
+    if n_points > SWEEP_MAX_POINTS:
+        raise ValueError(f"Sweep has {n_points} points, limit is {SWEEP_MAX_POINTS}")
+
+    cv_folds = int(data.get('cv_folds', 3))
+    if not 2 <= cv_folds <= 10:
+        raise ValueError("cv_folds must be between 2 and 10")
+
+    params["grid"] = parsed_grid
+    params["cv_folds"] = cv_folds
+    return params
+
+
+def fit_and_score(model, task):
+    X_fit, y_fit, X_eval, y_eval = task
+    start = time.perf_counter()
+    model.fit(X_fit, y_fit)
+    fit_time = time.perf_counter() - start
+    preds = model.predict(X_eval)
+    return {
+        "accuracy": accuracy_score(y_eval, preds),
+        "f1_score": f1_score(y_eval, preds, average='weighted', zero_division=0),
+        "fit_time": fit_time
+    }
+
+
+def run_sweep(params, report=None):
+    """
+    Evaluates every point of params["grid"] and returns the metric curves.
+
+    Each point is scored on the hold-out split (accuracy, F1) and by stratified
+    K-fold CV on the training split (mean, std); the hold-out model and the
+    fold models are fitted concurrently in threads (tree building releases the
+    GIL). For Random Forest and Gradient Boosting the n_estimators axis is
+    grown with warm_start, so every size only fits the trees it adds; the
+    curves are the same as fitting each size from scratch.
+
+    Args:
+        params: output of parse_sweep_params.
+        report: optional job reporter; every finished point is emitted.
+
+    Returns:
+        dict with model_type, grid, warm_start and the list of points.
+    """
+    if report is not None:
+        report("prepare")
+    if not os.path.exists(DATA_PATH):
+        raise FileNotFoundError(f"Dataset not found at {DATA_PATH}")
+    prepared = prepare_dataset(path=DATA_PATH, use_smote=params["use_smote"], scaling_method=params["scaling_method"])
+    X_train, y_train = prepared["X_train_scaled"], prepared["y_train"]
+
+    # Task 0 is the hold-out evaluation, the rest are the CV folds (same folds as run_simulation)
+    skf = StratifiedKFold(n_splits=params["cv_folds"], shuffle=True, random_state=42)
+    tasks = [(X_train, y_train, prepared["X_test_scaled"], prepared["y_test"])]
+    for train_idx, test_idx in skf.split(X_train, y_train):
+        tasks.append((X_train[train_idx], y_train.iloc[train_idx], X_train[test_idx], y_train.iloc[test_idx]))
+
+    grid = params["grid"]
+    warm_start = params["model_type"] in WARM_START_MODELS and "n_estimators" in grid
+    series_names = [name for name in SWEEP_PARAMS if name in grid and not (warm_start and name == "n_estimators")]
+    sizes = sorted(grid["n_estimators"]) if warm_start else [None]
+    total = int(np.prod([len(values) for values in grid.values()]))
+
+    n_jobs = sweep_cv_jobs(len(tasks))
+    points = []
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        for combo in itertools.product(*[grid[name] for name in series_names]):
+            series_params = {**params, **dict(zip(series_names, combo))}
+            models = None
+            cumulative_fit_time = 0.0
+            for size in sizes:
+                point_params = dict(series_params)
+                if warm_start:
+                    point_params["n_estimators"] = size
+                    if models is None:
+                        models = [build_model(point_params).set_params(warm_start=True) for _ in tasks]
+                    for model in models:
+                        model.set_params(n_estimators=size)
+                else:
+                    models = [build_model(point_params) for _ in tasks]
+
+                scores = list(pool.map(fit_and_score, models, tasks))
+                cv_scores = np.array([score["accuracy"] for score in scores[1:]])
+                cumulative_fit_time += scores[0]["fit_time"]
+                point = {
+                    "params": {name: point_params[name] for name in SWEEP_PARAMS},
+                    "accuracy": float(scores[0]["accuracy"]),
+                    "f1_score": float(scores[0]["f1_score"]),
+                    "cv_mean": float(cv_scores.mean()),
+                    "cv_std": float(cv_scores.std()),
+                    "fit_time": scores[0]["fit_time"],
+                    "cumulative_fit_time": cumulative_fit_time
+                }
+                points.append(point)
+                if report is not None:
+                    report.emit(point)
+                    report("sweep", len(points), total)
+
+    return {
+        "model_type": params["model_type"],
+        "grid": grid,
+        "warm_start": warm_start,
+        "points": points
+    }
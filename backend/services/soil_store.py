@@ -0,0 +1,110 @@
+"""
+Gridded soil store for get_soil_data.
+
+The grid is a NumPy array of shape (n_lat, n_lon, 4) holding N, P, K and pH
+per cell over a lat/lon bounding box, written by model/build_soil_grid.py as
+soil_grid.npy with a soil_grid.json sidecar describing the box:
+
+    {"lat_min": .., "lat_max": .., "lon_min": .., "lon_max": .., "fields": ["N", "P", "K", "ph"]}
+
+The .npy file is opened with mmap_mode='r', so it is never copied into the
+process: every gunicorn worker maps the same file and shares its pages through
+the OS page cache. Lookups are pure arithmetic on a read-only array (O(1) cell
+index, optional bilinear interpolation between cell centres) and take no locks.
+"""
+
+import json
+import os
+
+import numpy as np
+
+SOIL_FIELDS = ["N", "P", "K", "ph"]
+
+
+class SoilGrid:
+    def __init__(self, grid, lat_min, lat_max, lon_min, lon_max):
+        self.grid = grid
+        self.lat_min = float(lat_min)
+        self.lat_max = float(lat_max)
+        self.lon_min = float(lon_min)
+        self.lon_max = float(lon_max)
+        self.n_lat, self.n_lon = grid.shape[:2]
+        self.lat_step = (self.lat_max - self.lat_min) / self.n_lat
+        self.lon_step = (self.lon_max - self.lon_min) / self.n_lon
+
+    @classmethod
+    def load(cls, grid_path):
+        """
+        Memory-maps soil_grid.npy and reads the bounding box from its .json sidecar.
+        """
+        meta_path = os.path.splitext(grid_path)[0] + '.json'
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('fields', SOIL_FIELDS) != SOIL_FIELDS:
+            raise ValueError(f"Soil grid fields must be {SOIL_FIELDS}, got {meta.get('fields')}")
+        grid = np.load(grid_path, mmap_mode='r')
+        return cls(grid, meta['lat_min'], meta['lat_max'], meta['lon_min'], meta['lon_max'])
+
+    def contains(self, lat, lon):
+        return self.lat_min <= lat <= self.lat_max and self.lon_min <= lon <= self.lon_max
+
+    def _cell_position(self, lat, lon):
+        # Fractional position in cell units, 0.5 being the centre of cell 0
+        return (lat - self.lat_min) / self.lat_step, (lon - self.lon_min) / self.lon_step
+
+    def nearest(self, lat, lon):
+        y, x = self._cell_position(lat, lon)
+        i = min(max(int(y), 0), self.n_lat - 1)
+        j = min(max(int(x), 0), self.n_lon - 1)
+        return self.grid[i, j]
+
+    def bilinear(self, lat, lon):
+        y, x = self._cell_position(lat, lon)
+        # Interpolate between the four surrounding cell centres
+        y = min(max(y - 0.5, 0.0), self.n_lat - 1.0)
+        x = min(max(x - 0.5, 0.0), self.n_lon - 1.0)
+        i0 = min(int(y), max(self.n_lat - 2, 0))
+        j0 = min(int(x), max(self.n_lon - 2, 0))
+        i1 = min(i0 + 1, self.n_lat - 1)
+        j1 = min(j0 + 1, self.n_lon - 1)
+        ty = y - i0
+        tx = x - j0
+
+        corners = self.grid[[i0, i0, i1, i1], [j0, j1, j0, j1]].astype(np.float64)
+        if np.isnan(corners).any():
+            return self.nearest(lat, lon)
+        top = corners[0] * (1 - tx) + corners[1] * tx
+        bottom = corners[2] * (1 - tx) + corners[3] * tx
+        return top * (1 - ty) + bottom * ty
+
+    def lookup(self, lat, lon, interpolate=False):
+        """
+        Returns {N, P, K, ph} for a point, or None outside the grid / on empty cells.
+        """
+        lat, lon = float(lat), float(lon)
+        if not self.contains(lat, lon):
+            return None
+        values = self.bilinear(lat, lon) if interpolate else self.nearest(lat, lon)
+        if np.isnan(values).any():
+            return None
+        return {
+            "N": int(round(float(values[0]))),
+            "P": int(round(float(values[1]))),
+            "K": int(round(float(values[2]))),
+            "ph": round(float(values[3]), 1)
+        }
+
+
+def load_soil_grid(grid_path):
+    """
+    Loads the soil grid if it has been built, otherwise returns None.
+    """
+    if not os.path.exists(grid_path):
+        return None
+    try:
+        soil_grid = SoilGrid.load(grid_path)
+        print(f"Soil grid loaded: {soil_grid.n_lat}x{soil_grid.n_lon} cells.")
+        return soil_grid
+    except Exception as e:
+        print(f"Error loading soil grid: {e}")
+        return None
@@ -0,0 +1,113 @@
+"""
+Small in-process cache with TTL expiry, LRU eviction and stale-while-revalidate.
+
+Entries younger than `ttl` are served as hits. Entries older than `ttl` but
+younger than `ttl + stale_ttl` are still served immediately, while a single
+background thread reloads them (stale-while-revalidate). Anything older is
+treated as a miss and loaded in the calling thread.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    def __init__(self, maxsize, ttl, stale_ttl=0.0, name="cache", clock=time.monotonic):
+        self.maxsize = int(maxsize)
+        self.ttl = float(ttl)
+        self.stale_ttl = float(stale_ttl)
+        self.name = name
+        self._clock = clock
+        self._data = OrderedDict()  # key -> (value, stored_at)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def get_or_load(self, key, loader):
+        """
+        Returns the cached value for key, calling loader() on a miss.
+        Exceptions raised by loader() propagate and nothing is cached.
+        """
+        if self.maxsize <= 0:
+            return loader()
+
+        now = self._clock()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                age = now - stored_at
+                if age < self.ttl:
+                    self.hits += 1
+                    self._data.move_to_end(key)
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self.stale += 1
+                    self._data.move_to_end(key)
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+                    return value
+                del self._data[key]
+            self.misses += 1
+
+        value = loader()
+        self.set(key, value)
+        return value
+
+    def get(self, key, default=None):
+        """
+        Returns the fresh cached value for key (counted as a hit) or default
+        (counted as a miss). Stale entries are not served.
+        """
+        if self.maxsize <= 0:
+            return default
+        now = self._clock()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return entry[0]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, self._clock())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def _refresh(self, key, loader):
+        try:
+            self.set(key, loader())
+        except Exception as e:
+            # Keep serving the stale value until it ages out
+            print(f"{self.name} refresh failed for {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.stale = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "stale_ttl": self.stale_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale
+            }
@@ -0,0 +1,254 @@
+"""
+Shared HTTP client for upstream APIs (OpenWeather, Nominatim).
+
+Each upstream gets one UpstreamClient holding:
+  - a requests.Session with a keep-alive connection pool, so repeated calls
+    reuse TCP/TLS connections instead of opening a new one every time,
+  - connect and read timeouts, so a hung upstream cannot block a worker,
+  - retries with jittered exponential backoff for connection errors,
+    timeouts and 5xx/429 responses; a Retry-After header replaces the
+    backoff, and when it asks for more than backoff_max the call gives up
+    instead of retrying early. Nominatim's usage policy forbids retrying
+    after a 429, so retry_429 is off for it,
+  - a circuit breaker: after `failure_threshold` consecutive failed calls the
+    circuit opens and calls fail immediately with CircuitOpenError (callers
+    then use their fallback values) until `reset_timeout` seconds have passed
+    and a single trial call is let through.
+
+Settings come from UPSTREAM_DEFAULTS and can be overridden per upstream with
+environment variables, e.g. UPSTREAM_OPENWEATHER_READ_TIMEOUT=2.
+"""
+
+import datetime
+import email.utils
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+UPSTREAM_DEFAULTS = {
+    "connect_timeout": 2.0,
+    "read_timeout": 4.0,
+    "retries": 1,
+    "backoff_base": 0.2,
+    "backoff_max": 1.0,
+    "failure_threshold": 5,
+    "reset_timeout": 30.0,
+    "pool_size": 10,
+    "retry_429": 1,
+}
+
+UPSTREAM_OVERRIDES = {
+    "openweather": {},
+    "nominatim": {"read_timeout": 5.0, "retry_429": 0},
+}
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delay or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is short-circuited because the upstream is failing."""
+
+
+class UpstreamStatusError(Exception):
+    """Raised when the upstream keeps answering with a retryable status code."""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold, reset_timeout, clock=time.monotonic):
+        self.failure_threshold = int(failure_threshold)
+        self.reset_timeout = float(reset_timeout)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                # Let exactly one trial call probe the upstream
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._trial_in_flight = False
+
+
+class UpstreamClient:
+    def __init__(self, name, connect_timeout, read_timeout, retries, backoff_base,
+                 backoff_max, failure_threshold, reset_timeout, pool_size, retry_429=True):
+        self.name = name
+        self.timeout = (float(connect_timeout), float(read_timeout))
+        self.retries = int(retries)
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        self.retry_429 = bool(retry_429)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=int(pool_size))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Private RNG for backoff jitter, independent of the global random module
+        self._rng = random.Random()
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.retried = 0
+        self.short_circuited = 0
+
+    def _count(self, field):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def backoff(self, attempt):
+        # "Full jitter": uniform in [0, min(max, base * 2^attempt)]
+        return self._rng.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def retry_delay(self, res, attempt):
+        """
+        Seconds to wait before retrying after the retryable response res, or
+        None when it must not be retried (429 with retry_429 off, or a
+        Retry-After longer than backoff_max).
+        """
+        if res.status_code == 429 and not self.retry_429:
+            return None
+        retry_after = parse_retry_after(res.headers.get("Retry-After"))
+        if retry_after is None:
+            return self.backoff(attempt)
+        return retry_after if retry_after <= self.backoff_max else None
+
+    def get(self, url, **kwargs):
+        """
+        GET through the pooled session with timeouts, retries and the breaker.
+        Returns the response for any non-retryable status (callers check it).
+        Raises CircuitOpenError, UpstreamStatusError or the last requests error.
+        """
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+        self._count("calls")
+        kwargs.setdefault("timeout", self.timeout)
+        last_error = None
+        delay = 0.0
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._count("retried")
+                time.sleep(delay)
+            try:
+                res = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+                delay = self.backoff(attempt)
+                continue
+            except Exception:
+                # Not worth retrying (bad URL, redirect loop, broken body), but the
+                # breaker still has to see the failure, or a half-open trial never ends
+                self._count("errors")
+                self.breaker.record_failure()
+                raise
+            if res.status_code in RETRYABLE_STATUS:
+                last_error = UpstreamStatusError(f"{self.name} returned HTTP {res.status_code}")
+                delay = self.retry_delay(res, attempt)
+                # The body is never read, so hand the connection back to the pool
+                res.close()
+                if delay is None:
+                    break
+                continue
+            self.breaker.record_success()
+            return res
+
+        self._count("errors")
+        self.breaker.record_failure()
+        raise last_error
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "name": self.name,
+                "state": self.breaker.state,
+                "calls": self.calls,
+                "errors": self.errors,
+                "retried": self.retried,
+                "short_circuited": self.short_circuited
+            }
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def client_settings(name):
+    settings = {**UPSTREAM_DEFAULTS, **UPSTREAM_OVERRIDES.get(name, {})}
+    for key in settings:
+        env_value = os.getenv(f"UPSTREAM_{name.upper()}_{key.upper()}")
+        if env_value is not None:
+            settings[key] = float(env_value)
+    return settings
+
+
+def get_upstream_client(name):
+    """
+    Returns the process-wide client for an upstream, creating it on first use.
+    """
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = UpstreamClient(name, **client_settings(name))
+            _clients[name] = client
+        return client
+
+
+def get_upstream_stats():
+    with _clients_lock:
+        clients = list(_clients.values())
+    return [client.stats() for client in clients]
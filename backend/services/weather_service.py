@@ -1,14 +1,46 @@
 
-import requests
 import os
 import random
+from services.ttl_cache import TTLCache
+from services.upstream_client import get_upstream_client
+from services.soil_store import load_soil_grid
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY')
-BASE_URL = "https://api.openweathermap.org/data/2.5/"
+# Overridable so tests can point the service at a local stub server
+BASE_URL = os.getenv('OPENWEATHER_BASE_URL', "https://api.openweathermap.org/data/2.5/")
+
+# Weather cache: nearby farms share an entry by rounding lat/lon to a grid
+# (0.01 degrees is roughly 1 km). Entries are fresh for WEATHER_CACHE_TTL
+# seconds, then served stale for up to WEATHER_CACHE_STALE more seconds while
+# one background refresh runs. WEATHER_CACHE_SIZE=0 disables the cache.
+WEATHER_CACHE_GRID = float(os.getenv('WEATHER_CACHE_GRID', 0.01))
+WEATHER_CACHE_TTL = float(os.getenv('WEATHER_CACHE_TTL', 600))
+WEATHER_CACHE_STALE = float(os.getenv('WEATHER_CACHE_STALE', 1800))
+WEATHER_CACHE_SIZE = int(os.getenv('WEATHER_CACHE_SIZE', 10000))
+
+weather_cache = TTLCache(
+    maxsize=WEATHER_CACHE_SIZE,
+    ttl=WEATHER_CACHE_TTL,
+    stale_ttl=WEATHER_CACHE_STALE,
+    name="weather_cache"
+)
+
+def quantize_location(lat, lon, grid=None):
+    """
+    Maps a coordinate to the integer index of its grid cell, used as cache key.
+    """
+    grid = grid or WEATHER_CACHE_GRID
+    return (round(float(lat) / grid), round(float(lon) / grid))
+
+def get_weather_cache_stats():
+    return weather_cache.stats()
 
 def get_weather(lat, lon):
     """
     Fetches current weather and simplistic 7-day rainfall forecast.
+    Upstream responses are cached per grid cell (see weather_cache).
     """
     if not OPENWEATHER_API_KEY:
         # Mock data if no key
@@ -19,37 +51,7 @@ def get_weather(lat, lon):
         }
 
     try:
-        # Current weather
-        weather_url = f"{BASE_URL}weather?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
-        res = requests.get(weather_url)
-        data = res.json()
-        
-        if res.status_code != 200:
-            raise Exception("Weather API Error")
-
-        temp = data['main']['temp']
-        humidity = data['main']['humidity']
-
-        # For rainfall, we need forecast or accumulation. 
-        # Standard free API might not give 7-day accumulated rain easily.
-        # We will mock the "7-day average" based on current clouds/rain status or use forecast endpoint if available.
-        # Simplification: if it's raining now, high rainfall, else moderate/low dependent on clouds.
-        if 'rain' in data:
-            # extrapolating 1h rain to seasonal approximation (very rough)
-            rain_1h = data['rain'].get('1h', 0)
-            rainfall = rain_1h * 24 * 30 # Rough monthly projection?? 
-            # The model expects "rainfall in mm" (usually annual or growing season). 
-            # The dataset is 'rainfall', typical values 20-300.
-            # Let's return a value between 50 and 200 adjusted by current weather.
-            rainfall = 100.0 + (rain_1h * 10)
-        else:
-            rainfall = 80.0 # Default moderate
-
-        return {
-            "temperature": temp,
-            "humidity": humidity,
-            "rainfall": rainfall
-        }
+        return weather_cache.get_or_load(quantize_location(lat, lon), lambda: fetch_weather(lat, lon))
     except Exception as e:
         print(f"Weather fetch failed: {e}")
         return {
@@ -58,21 +60,74 @@ def get_weather(lat, lon):
             "rainfall": 100.0
         }
 
+def fetch_weather(lat, lon):
+    """
+    Calls OpenWeather for the current weather at lat/lon.
+    Raises on any upstream failure so that errors are never cached. The pooled
+    client fails fast (CircuitOpenError) while OpenWeather is known to be down.
+    """
+    # Current weather
+    weather_url = f"{BASE_URL}weather?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
+    res = get_upstream_client('openweather').get(weather_url)
+    data = res.json()
+    
+    if res.status_code != 200:
+        raise Exception("Weather API Error")
+
+    temp = data['main']['temp']
+    humidity = data['main']['humidity']
+
+    # For rainfall, we need forecast or accumulation. 
+    # Standard free API might not give 7-day accumulated rain easily.
+    # We will mock the "7-day average" based on current clouds/rain status or use forecast endpoint if available.
+    # Simplification: if it's raining now, high rainfall, else moderate/low dependent on clouds.
+    if 'rain' in data:
+        # extrapolating 1h rain to seasonal approximation (very rough)
+        rain_1h = data['rain'].get('1h', 0)
+        rainfall = rain_1h * 24 * 30 # Rough monthly projection?? 
+        # The model expects "rainfall in mm" (usually annual or growing season). 
+        # The dataset is 'rainfall', typical values 20-300.
+        # Let's return a value between 50 and 200 adjusted by current weather.
+        rainfall = 100.0 + (rain_1h * 10)
+    else:
+        rainfall = 80.0 # Default moderate
+
+    return {
+        "temperature": temp,
+        "humidity": humidity,
+        "rainfall": rainfall
+    }
+
+# Soil grid built by model/build_soil_grid.py, memory-mapped and shared by all workers
+SOIL_GRID_PATH = os.getenv('SOIL_GRID_PATH', os.path.join(BASE_DIR, '../../model/soil_grid.npy'))
+SOIL_INTERPOLATION = os.getenv('SOIL_INTERPOLATION', 'nearest').lower() == 'bilinear'
+
+soil_grid = load_soil_grid(SOIL_GRID_PATH)
+
 def get_soil_data(lat, lon):
     """
     Estimates soil parameters (N, P, K, pH) based on region (Lat/Lon)
-    This is a MOCK fallback since real SoilGrids API is complex to set up without auth/layers.
+    Reads the gridded soil store when available. Points outside the grid (or when
+    no grid has been built) use a MOCK fallback, since real SoilGrids API is
+    complex to set up without auth/layers.
     """
+    if soil_grid is not None:
+        soil = soil_grid.lookup(lat, lon, interpolate=SOIL_INTERPOLATION)
+        if soil is not None:
+            return soil
+
     # Random variation to simulate different soil types
     # In production, this would query a GIS database
     
-    # Simple hash of lat/lon to make it deterministic for a location
+    # Simple hash of lat/lon to make it deterministic for a location. A private
+    # RNG with the same seed gives the same values as reseeding the global one
+    # did, without disturbing the global random module (used by the weather mock)
     seed = int(abs(lat + lon) * 100)
-    random.seed(seed)
+    rng = random.Random(seed)
     
     return {
-        "N": random.randint(20, 120),
-        "P": random.randint(10, 100),
-        "K": random.randint(10, 100),
-        "ph": round(random.uniform(5.5, 7.5), 1)
+        "N": rng.randint(20, 120),
+        "P": rng.randint(10, 100),
+        "K": rng.randint(10, 100),
+        "ph": round(rng.uniform(5.5, 7.5), 1)
     }
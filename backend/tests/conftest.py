@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Tests import the backend the way app.py does (from services.x import ...)
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+# ...and the training code the way services.model_service does
+MODEL_DIR = os.path.abspath(os.path.join(BACKEND_DIR, '../model'))
+if MODEL_DIR not in sys.path:
+    sys.path.append(MODEL_DIR)
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from model_bundle import build_cluster_matrix
+
+from services.cluster_membership import (
+    combine_with_rf_probabilities, combine_with_rf_probabilities_batch,
+    compute_fuzzy_membership_batch, compute_fuzzy_membership_scores
+)
+
+LABELS = np.array(['apple', 'banana', 'coffee', 'jute', 'maize', 'mango', 'rice', 'grapes'])
+N_CLUSTERS = 12
+
+
+def make_cluster_map(rng):
+    cluster_map = {}
+    for cluster in range(N_CLUSTERS):
+        if cluster == 7:
+            continue  # a centroid with no mapped crops
+        present = rng.choice(len(LABELS), size=rng.integers(1, len(LABELS)), replace=False)
+        counts = rng.integers(1, 50, size=len(present))
+        # 'banana' and 'mango' always share proportions, so their scores can tie
+        proportions = {str(LABELS[i]): c / counts.sum() for i, c in zip(present, counts)}
+        if 'banana' in proportions:
+            proportions['mango'] = proportions['banana']
+        else:
+            proportions.pop('mango', None)
+        # Both int and string cluster ids occur in saved maps
+        cluster_map[str(cluster) if cluster % 2 else cluster] = proportions
+    return cluster_map
+
+
+def forest_probabilities(rng, n_samples, n_trees=20):
+    # Votes of a 20-tree forest: multiples of 1/20, with ties between classes
+    votes = rng.multinomial(n_trees, np.full(len(LABELS), 1 / len(LABELS)), size=n_samples)
+    votes[:, 5] = votes[:, 1]
+    return votes / n_trees
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_batch_scoring_matches_dict_implementation_exactly(seed):
+    rng = np.random.default_rng(seed)
+    cluster_map = make_cluster_map(rng)
+    cluster_matrix = build_cluster_matrix(cluster_map, LABELS, N_CLUSTERS)
+    distances = rng.uniform(0.05, 12.0, size=(40, N_CLUSTERS))
+    distances[0, 3] = 0.0  # a point on a centroid
+    rf_probs = forest_probabilities(rng, len(distances))
+
+    membership, inv_distances = compute_fuzzy_membership_batch(distances, cluster_matrix)
+    fusion, top_indices = combine_with_rf_probabilities_batch(rf_probs, membership)
+
+    for i in range(len(distances)):
+        membership_scores, cluster_weights = compute_fuzzy_membership_scores(distances[i], cluster_map, LABELS)
+        sorted_crops, fusion_scores = combine_with_rf_probabilities(rf_probs[i], LABELS, membership_scores)
+
+        assert list(membership[i]) == [membership_scores[label] for label in LABELS]
+        assert list(inv_distances[i]) == [cluster_weights[c] for c in range(N_CLUSTERS)]
+        assert list(fusion[i]) == [fusion_scores[label] for label in LABELS]
+        assert [(LABELS[j], fusion[i, j]) for j in top_indices[i]] == sorted_crops
+
+
+def test_tied_scores_keep_class_order():
+    rf_probs = np.array([[0.25, 0.25, 0.0, 0.25, 0.25, 0.0, 0.0, 0.0]])
+    membership = np.zeros_like(rf_probs)
+
+    _, top_indices = combine_with_rf_probabilities_batch(rf_probs, membership)
+    sorted_crops, _ = combine_with_rf_probabilities(rf_probs[0], LABELS, dict.fromkeys(LABELS, 0.0))
+
+    assert list(top_indices[0]) == [0, 1, 3]
+    assert [crop for crop, _ in sorted_crops] == ['apple', 'banana', 'jute']
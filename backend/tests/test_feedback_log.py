@@ -0,0 +1,108 @@
+import gzip
+import json
+import threading
+import time
+
+import pytest
+
+from services.feedback_log import FeedbackLog, FeedbackQueueFull
+
+
+def make_log(tmp_path, **kwargs):
+    settings = {"flush_interval": 60, "fsync": False, "rotate_bytes": 0, "backups": 0}
+    settings.update(kwargs)
+    return FeedbackLog(path=str(tmp_path / "feedback.jsonl"), **settings)
+
+
+def read_entries(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def entry(i):
+    # About 50 bytes per JSON line
+    return {"id": i, "comment": "x" * 30}
+
+
+def test_close_flushes_queued_entries_in_batches(tmp_path):
+    log = make_log(tmp_path, batch_max=4)
+    for i in range(10):
+        log.submit(entry(i))
+    # The interval is long: only the full batches are written before close()
+    wait_until(lambda: log.stats()["written"] == 8)
+    log.close()
+
+    assert read_entries(log.path) == [entry(i) for i in range(10)]
+    stats = log.stats()
+    assert (stats["written"], stats["batches"], stats["queued"]) == (10, 3, 0)
+
+
+def test_batch_is_written_after_the_flush_interval(tmp_path):
+    log = make_log(tmp_path, flush_interval=0.05)
+    log.submit(entry(1))
+    log.submit(entry(2))
+
+    wait_until(lambda: log.stats()["written"] == 2)
+    assert read_entries(log.path) == [entry(1), entry(2)]
+    log.close()
+
+
+def test_log_is_rotated_and_compressed_at_rotate_bytes(tmp_path):
+    log = make_log(tmp_path, batch_max=1, rotate_bytes=100)
+    for i in range(10):
+        log.submit(entry(i))
+    log.close()
+
+    archives = log.archives()
+    # Two entries pass 100 bytes, so every second write rotates
+    assert len(archives) == 5
+    assert log.stats()["rotations"] == 5
+    assert [read_entries(path) for path in archives] == [[entry(i), entry(i + 1)] for i in range(0, 10, 2)]
+    # The last write rotated too; no uncompressed copies are left behind
+    assert sorted(str(path) for path in tmp_path.iterdir()) == archives
+
+
+def test_archives_are_pruned_to_backups(tmp_path):
+    log = make_log(tmp_path, batch_max=1, rotate_bytes=100, backups=2)
+    for i in range(10):
+        log.submit(entry(i))
+    log.close()
+
+    archives = log.archives()
+    assert len(archives) == 2
+    assert [read_entries(path) for path in archives] == [[entry(6), entry(7)], [entry(8), entry(9)]]
+
+
+def test_submit_raises_when_the_queue_is_full(tmp_path):
+    log = make_log(tmp_path, batch_max=1, queue_max=2)
+    writing = threading.Event()
+    release = threading.Event()
+    write = log._write
+
+    def slow_write(batch):
+        writing.set()
+        release.wait(5)
+        write(batch)
+    log._write = slow_write
+
+    log.submit(entry(0))
+    # The writer holds entry 0 while the disk is "slow"; two more fill the queue
+    assert writing.wait(5)
+    log.submit(entry(1))
+    log.submit(entry(2))
+    with pytest.raises(FeedbackQueueFull):
+        log.submit(entry(3))
+
+    release.set()
+    log.close()
+    assert read_entries(log.path) == [entry(0), entry(1), entry(2)]
+    stats = log.stats()
+    assert (stats["submitted"], stats["rejected"]) == (3, 1)
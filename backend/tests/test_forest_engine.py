@@ -0,0 +1,28 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from services.forest_engine import CompiledForest
+
+
+def fit_forest(seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(300, 7))
+    y = np.array(['rice', 'maize', 'coffee'])[(X[:, 0] + X[:, 3] > 0).astype(int) + (X[:, 5] > 1)]
+    return RandomForestClassifier(n_estimators=25, max_depth=8, random_state=seed).fit(X, y), rng
+
+
+def test_probabilities_match_sklearn_exactly():
+    rf, rng = fit_forest()
+    forest = CompiledForest.from_sklearn(rf)
+    X = rng.normal(size=(50, 7))
+
+    assert list(forest.classes_) == list(rf.classes_)
+    np.testing.assert_array_equal(forest.predict_proba(X), rf.predict_proba(X))
+
+
+def test_single_row_matches_sklearn():
+    rf, rng = fit_forest(seed=1)
+    forest = CompiledForest.from_sklearn(rf)
+    row = rng.normal(size=(1, 7))
+
+    np.testing.assert_array_equal(forest.predict_proba(row), rf.predict_proba(row))
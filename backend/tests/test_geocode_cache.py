@@ -0,0 +1,32 @@
+from services.geocode_service import GeocodeCache
+
+PUNE = {"name": "Pune", "latitude": 18.52, "longitude": 73.85}
+
+
+def make_cache(tmp_path, **kwargs):
+    return GeocodeCache(str(tmp_path / "geocode.db"), maxsize=100, **kwargs)
+
+
+def test_partial_prefix_match_falls_through_to_upstream(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.store("pune", [PUNE])
+    assert cache.lookup("pune") == [PUNE]
+    # One known place is less than a full page: "pu" must still reach Nominatim
+    assert cache.lookup("pu", limit=5) is None
+    assert cache.lookup("pu", limit=1) == [PUNE]
+
+
+def test_empty_results_expire(tmp_path):
+    cache = make_cache(tmp_path, empty_ttl=60)
+    cache.store("nowhere", [])
+    assert cache.lookup("nowhere") == []
+
+    cache.empty_ttl = 0
+    assert cache.lookup("nowhere") is None
+
+
+def test_results_persist_across_instances(tmp_path):
+    make_cache(tmp_path).store("Pune", [PUNE])
+    cache = make_cache(tmp_path)
+    assert cache.lookup("pune") == [PUNE]
+    assert cache.stats()["disk_hits"] == 1
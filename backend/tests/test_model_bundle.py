@@ -0,0 +1,69 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.cluster import KMeans
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from model_bundle import write_bundle
+
+from routes import prediction_routes
+from services import model_service
+
+FEATURE_NAMES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+
+@pytest.fixture
+def artifacts(tmp_path, monkeypatch):
+    """A small trained model saved both as the four pickles and as a bundle."""
+    rng = np.random.default_rng(0)
+    X = rng.uniform([0, 5, 5, 10, 15, 3.5, 20], [140, 145, 205, 45, 100, 9.5, 300], size=(500, 7))
+    y = np.array(['rice', 'maize', 'coffee', 'mango', 'jute'])[
+        (X[:, 0] > 70).astype(int) + 2 * (X[:, 6] > 150) + (X[:, 5] > 8.5)]
+    scaler = StandardScaler().fit(X)
+    X_scaled = scaler.transform(X)
+    rf = RandomForestClassifier(n_estimators=30, max_depth=8, random_state=0).fit(X_scaled, y)
+    kmeans = KMeans(n_clusters=6, n_init=3, random_state=0).fit(X_scaled)
+    cluster_map = {}
+    for cluster in range(kmeans.n_clusters):
+        labels, counts = np.unique(y[kmeans.labels_ == cluster], return_counts=True)
+        cluster_map[cluster] = {str(label): count / counts.sum() for label, count in zip(labels, counts)}
+
+    for name, obj in (('rf_model.pkl', rf), ('kmeans.pkl', kmeans), ('scaler.pkl', scaler),
+                      ('cluster_map.pkl', cluster_map)):
+        joblib.dump(obj, tmp_path / name)
+    write_bundle(rf, kmeans, scaler, cluster_map, bundles_dir=str(tmp_path / 'bundles'),
+                 feature_names=FEATURE_NAMES)
+
+    monkeypatch.setattr(model_service, 'MODEL_DIR', str(tmp_path))
+    monkeypatch.setattr(model_service, 'MODEL_BUNDLE_DIR', str(tmp_path / 'bundles'))
+    monkeypatch.setattr(model_service, 'NEIGHBORS_INDEX_PATH', str(tmp_path / 'neighbors_index.pkl'))
+    monkeypatch.setattr(model_service, 'RF_ENGINE', 'sklearn')
+    return rng.uniform([0, 5, 5, 10, 15, 3.5, 20], [140, 145, 205, 45, 100, 9.5, 300], size=(60, 7))
+
+
+def test_bundle_scores_like_the_pickles(artifacts):
+    pickles = model_service.load_pickle_models()
+    bundle = model_service.load_bundle_models()
+    assert bundle.source == 'bundle'
+    assert list(bundle.rf.classes_) == list(pickles.rf.classes_)
+    np.testing.assert_array_equal(bundle.cluster_matrix, pickles.cluster_matrix)
+
+    scaled = pickles.scaler.transform(artifacts)
+    np.testing.assert_array_equal(bundle.scaler.transform(artifacts), scaled)
+    np.testing.assert_array_equal(bundle.rf_engine.predict_proba(scaled), pickles.rf_engine.predict_proba(scaled))
+    np.testing.assert_array_equal(bundle.kmeans_model.transform(scaled), pickles.kmeans_model.transform(scaled))
+
+    for bundle_row, pickle_row in zip(prediction_routes.score_rows(bundle, artifacts, 'none'),
+                                      prediction_routes.score_rows(pickles, artifacts, 'none')):
+        np.testing.assert_array_equal(bundle_row[1], pickle_row[1])
+        # Top crops with their fused scores, memberships and cluster weights
+        assert bundle_row[2:5] == pickle_row[2:5]
+
+
+def test_bundle_explains_like_the_pickles(artifacts):
+    pickles = model_service.load_pickle_models()
+    bundle = model_service.load_bundle_models()
+
+    for bundle_row, pickle_row in zip(prediction_routes.score_rows(bundle, artifacts[:5], 'top'),
+                                      prediction_routes.score_rows(pickles, artifacts[:5], 'top')):
+        assert bundle_row[5] == pickle_row[5]
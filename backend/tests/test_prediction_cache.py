@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+from sklearn.cluster import KMeans
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from model_bundle import build_cluster_matrix
+
+from routes import prediction_routes
+from services.model_service import ModelSet
+from services.prediction_cache import PredictionCache
+
+
+@pytest.fixture(scope="module")
+def models():
+    rng = np.random.default_rng(0)
+    X = rng.uniform([0, 5, 5, 10, 15, 3.5, 20], [140, 145, 205, 45, 100, 9.5, 300], size=(400, 7))
+    y = np.array(['rice', 'maize', 'coffee', 'mango'])[(X[:, 0] > 70).astype(int) + 2 * (X[:, 6] > 150)]
+    scaler = StandardScaler().fit(X)
+    X_scaled = scaler.transform(X)
+    rf = RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0).fit(X_scaled, y)
+    kmeans = KMeans(n_clusters=4, n_init=3, random_state=0).fit(X_scaled)
+    cluster_map = {}
+    for cluster in range(4):
+        labels, counts = np.unique(y[kmeans.labels_ == cluster], return_counts=True)
+        cluster_map[cluster] = {str(label): count / counts.sum() for label, count in zip(labels, counts)}
+    return ModelSet(
+        version='test', source='pickle', rf_model=rf, compiled_forest=None, kmeans_model=kmeans,
+        scaler=scaler, cluster_map=cluster_map,
+        cluster_matrix=build_cluster_matrix(cluster_map, rf.classes_, kmeans.n_clusters),
+        shap_explainer=None
+    )
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = PredictionCache(maxsize=16, quantization='')
+    monkeypatch.setattr(prediction_routes, 'prediction_cache', cache)
+    return cache
+
+
+FEATURES = [
+    [90.0, 42.0, 43.0, 20.9, 82.0, 6.5, 202.9],
+    [20.0, 67.0, 20.0, 25.3, 60.1, 5.8, 110.4],
+    [104.0, 18.0, 30.0, 23.6, 60.4, 6.8, 140.9],
+]
+
+
+def assert_rows_equal(cached, uncached):
+    assert len(cached) == len(uncached)
+    for cached_row, uncached_row in zip(cached, uncached):
+        features_scaled, distances, sorted_crops, membership, weights, explanation = cached_row
+        np.testing.assert_array_equal(features_scaled, uncached_row[0])
+        np.testing.assert_array_equal(distances, uncached_row[1])
+        assert sorted_crops == uncached_row[2]
+        assert membership == uncached_row[3]
+        assert weights == uncached_row[4]
+        assert explanation == uncached_row[5]
+
+
+def test_cache_hits_return_the_uncached_scores(models, cache):
+    uncached = prediction_routes.score_rows(models, np.array(FEATURES), 'none')
+
+    first = prediction_routes.score_rows_cached(models, FEATURES, 'none')
+    assert cache.stats()['misses'] == len(FEATURES)
+    second = prediction_routes.score_rows_cached(models, FEATURES, 'none')
+    assert cache.stats()['hits'] == len(FEATURES)
+
+    assert_rows_equal(first, uncached)
+    assert_rows_equal(second, uncached)
+
+
+def test_mixed_hits_and_misses_keep_row_order(models, cache):
+    prediction_routes.score_rows_cached(models, FEATURES[1:2], 'none')
+
+    rows = prediction_routes.score_rows_cached(models, FEATURES, 'none')
+    assert cache.stats()['hits'] == 1
+    assert_rows_equal(rows, prediction_routes.score_rows(models, np.array(FEATURES), 'none'))
+
+
+def test_quantization_only_shapes_the_key(models, monkeypatch):
+    cache = PredictionCache(maxsize=16, quantization='temperature=1,rainfall=10')
+    monkeypatch.setattr(prediction_routes, 'prediction_cache', cache)
+    features = [90.0, 42.0, 43.0, 20.9, 82.0, 6.5, 202.9]
+    nearby = [90.0, 42.0, 43.0, 21.2, 82.0, 6.5, 199.0]
+
+    scored = prediction_routes.score_rows_cached(models, [features], 'none')
+    # The models saw the exact inputs, not the grid point
+    assert_rows_equal(scored, prediction_routes.score_rows(models, np.array([features]), 'none'))
+    # A vector in the same grid cell is answered by that entry
+    assert_rows_equal(prediction_routes.score_rows_cached(models, [nearby], 'none'), scored)
+    assert cache.stats()['hits'] == 1
+
+
+def test_cached_rows_do_not_reference_the_batch_matrices(models):
+    rows = prediction_routes.score_rows(models, np.array(FEATURES), 'none')
+    for features_scaled, distances, *_ in rows:
+        assert features_scaled.base is None
+        assert distances.base is None
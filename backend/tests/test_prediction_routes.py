@@ -0,0 +1,24 @@
+import pytest
+from flask import Flask
+
+from routes.prediction_routes import prediction_bp
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(prediction_bp, url_prefix='/api')
+    return app.test_client()
+
+
+@pytest.mark.parametrize("url", ['/api/predict', '/api/predict/batch'])
+@pytest.mark.parametrize("body", [
+    {},
+    {"data": "latitude=18.5", "content_type": "text/plain"},
+    {"data": "{not json", "content_type": "application/json"},
+    {"json": [18.5, 73.8]},
+])
+def test_missing_or_invalid_body_is_rejected(client, url, body):
+    response = client.post(url, **body)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
@@ -0,0 +1,93 @@
+import threading
+import time
+
+from services.ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def wait_for_refresh(cache, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while cache._refreshing:
+        assert time.monotonic() < deadline, "background refresh did not finish"
+        time.sleep(0.01)
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=60, clock=clock)
+    cache.set("pune", 1)
+
+    clock.now = 59
+    assert cache.get("pune") == 1
+    clock.now = 60
+    assert cache.get("pune") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_get_or_load_reloads_expired_entries():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=60, clock=clock)
+    values = iter([1, 2])
+
+    assert cache.get_or_load("pune", lambda: next(values)) == 1
+    assert cache.get_or_load("pune", lambda: next(values)) == 1
+    clock.now = 61
+    assert cache.get_or_load("pune", lambda: next(values)) == 2
+
+
+def test_stale_entry_is_served_while_one_refresh_runs():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=60, stale_ttl=30, clock=clock)
+    cache.set("pune", "old")
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return "new"
+
+    clock.now = 70
+    # Both reads answer at once with the stale value; only one refresh starts
+    assert cache.get_or_load("pune", loader) == "old"
+    assert cache.get_or_load("pune", loader) == "old"
+    release.set()
+    wait_for_refresh(cache)
+
+    assert len(calls) == 1
+    assert cache.stats()["stale"] == 2
+    assert cache.get_or_load("pune", loader) == "new"
+
+
+def test_entry_past_the_stale_window_loads_in_the_caller():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=60, stale_ttl=30, clock=clock)
+    cache.set("pune", "old")
+
+    clock.now = 90
+    assert cache.get_or_load("pune", lambda: "new") == "new"
+    assert cache.stats()["stale"] == 0
+    assert cache.stats()["misses"] == 1
+
+
+def test_failed_refresh_keeps_the_stale_value():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=60, stale_ttl=30, clock=clock)
+    cache.set("pune", "old")
+
+    def loader():
+        raise RuntimeError("upstream down")
+
+    clock.now = 70
+    assert cache.get_or_load("pune", loader) == "old"
+    wait_for_refresh(cache)
+    assert cache.get_or_load("pune", loader) == "old"
+    wait_for_refresh(cache)
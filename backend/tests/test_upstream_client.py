@@ -0,0 +1,139 @@
+import pytest
+import requests
+
+from services import upstream_client
+from services.upstream_client import CircuitBreaker, CircuitOpenError, UpstreamClient, UpstreamStatusError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_client(clock, failure_threshold=2, reset_timeout=10, retries=0, backoff_max=0, retry_429=True):
+    client = UpstreamClient("test", connect_timeout=1, read_timeout=1, retries=retries, backoff_base=0,
+                            backoff_max=backoff_max, failure_threshold=failure_threshold,
+                            reset_timeout=reset_timeout, pool_size=1, retry_429=retry_429)
+    client.breaker = CircuitBreaker(failure_threshold, reset_timeout, clock=clock)
+    return client
+
+
+class FakeResponse(requests.Response):
+    def __init__(self, status_code, headers=None):
+        super().__init__()
+        self.status_code = status_code
+        self.headers.update(headers or {})
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def respond_with(*responses):
+    calls = []
+
+    def get(url, **kwargs):
+        calls.append(url)
+        return responses[len(calls) - 1]
+    return get, calls
+
+
+def fail_with(exc):
+    def get(url, **kwargs):
+        raise exc
+    return get
+
+
+def test_breaker_opens_after_threshold_and_short_circuits():
+    clock = FakeClock()
+    client = make_client(clock)
+    client.session.get = fail_with(requests.ConnectionError("down"))
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            client.get("http://upstream.invalid/")
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.get("http://upstream.invalid/")
+    assert client.stats()["short_circuited"] == 1
+
+
+@pytest.mark.parametrize("exc", [
+    requests.exceptions.ChunkedEncodingError("broken body"),
+    requests.exceptions.TooManyRedirects("loop"),
+    requests.exceptions.InvalidURL("bad url"),
+])
+def test_half_open_trial_with_non_connection_error_reopens_breaker(exc):
+    clock = FakeClock()
+    client = make_client(clock)
+    client.session.get = fail_with(requests.ConnectionError("down"))
+    for _ in range(2):
+        with pytest.raises(requests.ConnectionError):
+            client.get("http://upstream.invalid/")
+
+    # Half-open: the trial call fails with an error that is not retried
+    clock.now += 10
+    assert client.breaker.state == "half_open"
+    client.session.get = fail_with(exc)
+    with pytest.raises(type(exc)):
+        client.get("http://upstream.invalid/")
+    assert client.breaker.state == "open"
+
+    # The failed trial was recorded, so the next half-open window admits a new trial
+    clock.now += 10
+    response = requests.Response()
+    response.status_code = 200
+    client.session.get = lambda url, **kwargs: response
+    assert client.get("http://upstream.invalid/") is response
+    assert client.breaker.state == "closed"
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(upstream_client.time, "sleep", sleeps.append)
+    return sleeps
+
+
+def test_429_is_not_retried_when_retry_429_is_off(sleeps):
+    client = make_client(FakeClock(), retries=2, backoff_max=1, retry_429=False)
+    throttled = FakeResponse(429)
+    client.session.get, calls = respond_with(throttled)
+
+    with pytest.raises(UpstreamStatusError):
+        client.get("http://upstream.invalid/")
+    assert len(calls) == 1
+    assert sleeps == []
+    assert throttled.closed
+    assert client.stats()["errors"] == 1
+
+
+def test_retry_after_replaces_the_backoff(sleeps):
+    client = make_client(FakeClock(), retries=1, backoff_max=5)
+    busy = FakeResponse(503, {"Retry-After": "2"})
+    ok = FakeResponse(200)
+    client.session.get, calls = respond_with(busy, ok)
+
+    assert client.get("http://upstream.invalid/") is ok
+    assert sleeps == [2.0]
+    assert busy.closed
+    assert not ok.closed
+
+
+def test_long_retry_after_gives_up_instead_of_retrying(sleeps):
+    client = make_client(FakeClock(), retries=3, backoff_max=5)
+    throttled = FakeResponse(429, {"Retry-After": "120"})
+    client.session.get, calls = respond_with(throttled)
+
+    with pytest.raises(UpstreamStatusError):
+        client.get("http://upstream.invalid/")
+    assert len(calls) == 1
+    assert sleeps == []
+    assert throttled.closed
+
+
+def test_retry_after_http_date():
+    assert upstream_client.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert upstream_client.parse_retry_after("soon") is None
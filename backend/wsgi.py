@@ -0,0 +1,14 @@
+"""
+WSGI entry point for production servers: gunicorn -c gunicorn.conf.py
+
+Importing this module loads the models (services/model_service.py) and warms
+up the prediction pipeline. With preload_app (see gunicorn.conf.py) that
+happens once in the gunicorn master, before the workers are forked, so they
+share the loaded models copy-on-write.
+"""
+
+from app import app, warm_up
+
+warm_up()
+
+application = app
@@ -36,8 +36,17 @@ export default function SimulationPanel({ onSimulate, onReset, isSimulating }) {
                 use_smote: params.use_smote,
                 scaling_method: params.scaling_method
             };
-            const response = await api.post('/simulate/', data);
-            onSimulate(response.data);
+            // Simulations run as background jobs: queue one, then poll until it finishes
+            const { data: queued } = await api.post('/simulate/', data);
+            let job = queued;
+            while (job.status === 'queued' || job.status === 'running' || job.status === 'cancelling') {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                job = (await api.get(`/simulate/jobs/${queued.id}`)).data;
+            }
+            if (job.status !== 'succeeded') {
+                throw new Error(job.error || `Simulation ${job.status}`);
+            }
+            onSimulate(job.result);
         } catch (error) {
             console.error("Simulation failed:", error);
             alert("Simulation failed. Check console for details.");
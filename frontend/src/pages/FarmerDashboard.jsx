@@ -25,7 +25,8 @@ function FarmerDashboard() {
             const res = await api.post('/predict', {
                 latitude: selectedLocation.latitude,
                 longitude: selectedLocation.longitude,
-                lang: language
+                lang: language,
+                profile: 'compact'
             });
             setResult(res.data);
         } catch (err) {
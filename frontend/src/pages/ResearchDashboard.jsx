@@ -53,18 +53,17 @@ export default function ResearchDashboard() {
                     'cluster-map': 'cluster_map',
                     'feature-importance-adaboost': 'feature_importance_adaboost',
                     'feature-importance-gb': 'feature_importance_gb',
-                    'shap-local': 'shap_local',
-                    'scaler-params': 'scaler_params'
+                    'shap-local': 'shap_local'
                 };
 
-                const promises = Object.entries(endpointMap).map(([ep, key]) =>
-                    api.get(`/dev/${ep}`).then(res => ({ key, value: res.data }))
-                );
-
-                const results = await Promise.all(promises);
-                const aggregated = {};
-                results.forEach(res => {
-                    aggregated[res.key] = res.value;
+                // One round trip for all dashboard sections, scaler params come from the model
+                const [bundle, scaler] = await Promise.all([
+                    api.get('/dev/bundle', { params: { sections: Object.keys(endpointMap).join(',') } }),
+                    api.get('/dev/scaler-params')
+                ]);
+                const aggregated = { scaler_params: scaler.data };
+                Object.entries(endpointMap).forEach(([ep, key]) => {
+                    aggregated[key] = bundle.data[ep];
                 });
 
                 setData(aggregated);
@@ -0,0 +1,108 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, "soil_grid.npy")
+
+SOIL_FIELDS = ["N", "P", "K", "ph"]
+COLUMN_ALIASES = {"latitude": "lat", "longitude": "lon", "pH": "ph"}
+
+
+def load_samples(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path).rename(columns=COLUMN_ALIASES)
+    required = ["lat", "lon"] + SOIL_FIELDS
+    missing = [col for col in required if col not in df.columns]
+    if missing:
+        raise ValueError(f"Soil sample CSV is missing columns: {missing}")
+    return df[required].dropna()
+
+
+def build_grid(df: pd.DataFrame, resolution: float, bbox=None, fill: bool = True):
+    """
+    Averages the samples falling in each lat/lon cell into a (n_lat, n_lon, 4) grid.
+    Empty cells take the value of the nearest non-empty cell when fill is set,
+    otherwise they stay NaN (and the backend falls back for them).
+    """
+    if bbox is None:
+        # Pad by half a cell so samples on the edge land inside the grid
+        pad = resolution / 2
+        bbox = (df["lat"].min() - pad, df["lat"].max() + pad, df["lon"].min() - pad, df["lon"].max() + pad)
+    lat_min, lat_max, lon_min, lon_max = bbox
+
+    n_lat = max(1, int(np.ceil((lat_max - lat_min) / resolution)))
+    n_lon = max(1, int(np.ceil((lon_max - lon_min) / resolution)))
+    lat_max = lat_min + n_lat * resolution
+    lon_max = lon_min + n_lon * resolution
+
+    inside = df["lat"].between(lat_min, lat_max) & df["lon"].between(lon_min, lon_max)
+    df = df[inside]
+    rows = np.clip(((df["lat"].to_numpy() - lat_min) / resolution).astype(int), 0, n_lat - 1)
+    cols = np.clip(((df["lon"].to_numpy() - lon_min) / resolution).astype(int), 0, n_lon - 1)
+    cells = rows * n_lon + cols
+
+    counts = np.bincount(cells, minlength=n_lat * n_lon)
+    grid = np.full((n_lat * n_lon, len(SOIL_FIELDS)), np.nan, dtype=np.float64)
+    filled = counts > 0
+    for k, field in enumerate(SOIL_FIELDS):
+        sums = np.bincount(cells, weights=df[field].to_numpy(dtype=np.float64), minlength=n_lat * n_lon)
+        grid[filled, k] = sums[filled] / counts[filled]
+    grid = grid.reshape(n_lat, n_lon, len(SOIL_FIELDS))
+
+    if fill and filled.any() and not filled.all():
+        from scipy.ndimage import distance_transform_edt
+        empty = ~filled.reshape(n_lat, n_lon)
+        _, (near_i, near_j) = distance_transform_edt(empty, return_indices=True)
+        grid = grid[near_i, near_j]
+
+    meta = {
+        "lat_min": float(lat_min),
+        "lat_max": float(lat_max),
+        "lon_min": float(lon_min),
+        "lon_max": float(lon_max),
+        "resolution": float(resolution),
+        "fields": SOIL_FIELDS,
+        "samples": int(len(df))
+    }
+    return grid.astype(np.float32), meta
+
+
+def save_grid(grid: np.ndarray, meta: dict, output: str) -> None:
+    """
+    Writes soil_grid.npy and its .json sidecar. Files are written under a
+    temporary name and renamed, so running workers keep their mapping of the
+    previous file intact.
+    """
+    meta_path = os.path.splitext(output)[0] + ".json"
+    tmp_grid = output + ".tmp.npy"
+    tmp_meta = meta_path + ".tmp"
+
+    np.save(tmp_grid, np.ascontiguousarray(grid))
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    os.replace(tmp_grid, output)
+    os.replace(tmp_meta, meta_path)
+    print(f"Soil grid {grid.shape[0]}x{grid.shape[1]} saved to: {output}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the memory-mapped soil grid from a CSV of soil samples.")
+    parser.add_argument("csv", help="CSV with lat, lon, N, P, K, ph columns (latitude/longitude also accepted)")
+    parser.add_argument("--resolution", type=float, default=0.05, help="Cell size in degrees (default: 0.05)")
+    parser.add_argument("--bbox", type=float, nargs=4, metavar=("LAT_MIN", "LAT_MAX", "LON_MIN", "LON_MAX"),
+                        help="Bounding box (default: extent of the samples)")
+    parser.add_argument("--no-fill", action="store_true", help="Leave cells without samples empty")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Output .npy path")
+    args = parser.parse_args()
+
+    df = load_samples(args.csv)
+    grid, meta = build_grid(df, args.resolution, bbox=args.bbox, fill=not args.no_fill)
+    save_grid(grid, meta, args.output)
+
+
+if __name__ == "__main__":
+    main()
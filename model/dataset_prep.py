@@ -0,0 +1,253 @@
+"""
+Dataset preparation shared by training, dashboard generation and the backend
+simulation API.
+
+The pipeline is split into stages, each memoized under a key derived from the
+content hash of the raw data plus the parameters of that stage and the ones
+before it:
+
+    raw        CSV frame (key: SHA-1 of the file bytes)
+    capped     dropna + IQR outlier capping of numeric columns
+    split      stratified train/test split (test_size, random_state)
+    resampled  training split after optional SMOTE
+    scaled     fitted scaler plus scaled train/test/full feature arrays
+
+Changing only the scaling method therefore reuses the split and SMOTE output,
+and an unchanged CSV is never re-read. Results are cached in memory (LRU) and,
+when DATASET_CACHE_DIR is set, on disk so separate processes (train_model.py,
+generate_dashboard_data.py, simulation workers) share them too.
+
+Cached objects are shared between callers: treat them as read-only.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+FEATURE_COLUMNS = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+LABEL_COLUMN = "label"
+
+DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR") or None
+DATASET_CACHE_SIZE = int(os.getenv("DATASET_CACHE_SIZE", 32))
+
+# Training split is rebalanced when the largest class is this many times the smallest
+IMBALANCE_RATIO = 1.5
+
+
+class StageCache:
+    def __init__(self, maxsize: int = DATASET_CACHE_SIZE, cache_dir: str = DATASET_CACHE_DIR):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.joblib")
+
+    def get_or_compute(self, stage: str, parts: tuple, compute):
+        """
+        Returns (key, value) for a stage, computing it only on a miss.
+        The key is the stage name plus a hash of `parts`, and is what
+        downstream stages include in their own keys.
+        """
+        key = f"{stage}-" + hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return key, self._entries[key]
+
+        value = None
+        if self.cache_dir:
+            try:
+                value = joblib.load(self._disk_path(key))
+                self.disk_hits += 1
+            except Exception:
+                value = None
+        if value is None:
+            value = compute()
+            self.misses += 1
+            if self.cache_dir:
+                self._save(key, value)
+
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return key, value
+
+    def _save(self, key: str, value) -> None:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = self._disk_path(key) + f".{os.getpid()}.tmp"
+            joblib.dump(value, tmp_path)
+            os.replace(tmp_path, self._disk_path(key))
+        except Exception as exc:
+            print(f"Could not write dataset cache entry {key}: {exc}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses
+            }
+
+
+stage_cache = StageCache()
+
+_digest_lock = threading.Lock()
+_file_digests = {}
+
+
+def file_digest(path: str) -> str:
+    """SHA-1 of a file's bytes, rehashed only when its mtime or size changes."""
+    st = os.stat(path)
+    signature = (st.st_mtime_ns, st.st_size)
+    with _digest_lock:
+        cached = _file_digests.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+    sha = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    with _digest_lock:
+        _file_digests[path] = (signature, digest)
+    return digest
+
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """Content hash of an in-memory frame (columns, index and values)."""
+    sha = hashlib.sha1(repr(list(df.columns)).encode("utf-8"))
+    sha.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return sha.hexdigest()
+
+
+def load_raw(path: str):
+    """Returns (key, frame) for a CSV file, re-reading it only if its content changed."""
+    digest = file_digest(path)
+    return stage_cache.get_or_compute("raw", (digest,), lambda: pd.read_csv(path))
+
+
+def cap_outliers(df: pd.DataFrame) -> pd.DataFrame:
+    # Cap extreme numeric values to reduce outlier impact while preserving rows.
+    df = df.dropna().copy()
+    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    for col in numeric_cols:
+        q1 = df[col].quantile(0.25)
+        q3 = df[col].quantile(0.75)
+        iqr = q3 - q1
+        lower = q1 - 1.5 * iqr
+        upper = q3 + 1.5 * iqr
+        df[col] = np.clip(df[col], lower, upper)
+    return df
+
+
+def needs_resampling(y_train: pd.Series) -> bool:
+    counts = y_train.value_counts()
+    return (counts.max() / counts.min()) > IMBALANCE_RATIO
+
+
+def build_scaler(scaling_method: str):
+    if scaling_method == "MinMax":
+        return MinMaxScaler()
+    return StandardScaler()
+
+
+def _split(capped: pd.DataFrame, test_size: float, random_state: int):
+    X = capped[FEATURE_COLUMNS]
+    y = capped[LABEL_COLUMN]
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state, stratify=y
+    )
+    return {"X_train": X_train, "X_test": X_test, "y_train": y_train, "y_test": y_test}
+
+
+def _resample(split: dict, use_smote, random_state: int):
+    X_train, y_train = split["X_train"], split["y_train"]
+    apply_smote = needs_resampling(y_train) if use_smote == "auto" else bool(use_smote)
+    if apply_smote:
+        from imblearn.over_sampling import SMOTE
+        smote = SMOTE(random_state=random_state)
+        X_train, y_train = smote.fit_resample(X_train, y_train)
+    return {"X_train": X_train, "y_train": y_train, "smote_applied": apply_smote}
+
+
+def _scale(capped: pd.DataFrame, split: dict, resampled: dict, scaling_method: str):
+    scaler = build_scaler(scaling_method)
+    arrays = {
+        "scaler": scaler,
+        "X_train_scaled": scaler.fit_transform(resampled["X_train"]),
+        "X_test_scaled": scaler.transform(split["X_test"]),
+        "X_full_scaled": scaler.transform(capped[FEATURE_COLUMNS])
+    }
+    for name in ("X_train_scaled", "X_test_scaled", "X_full_scaled"):
+        arrays[name].flags.writeable = False
+    return arrays
+
+
+def prepare_dataset(path: str = None, df: pd.DataFrame = None, use_smote=False,
+                    scaling_method: str = "Standard", test_size: float = 0.2,
+                    random_state: int = 42) -> dict:
+    """
+    Runs (or reuses) every preparation stage for a CSV path or an in-memory frame.
+
+    Args:
+        path: CSV to load, used when df is not given.
+        df: raw frame, e.g. the synthetic fallback dataset of train_model.py.
+        use_smote: True, False, or "auto" to resample only imbalanced splits.
+        scaling_method: "Standard" or "MinMax".
+
+    Returns:
+        dict with capped, X, y, X_train, X_test, y_train, y_test (y_train and
+        X_train after resampling), smote_applied, scaler, X_train_scaled,
+        X_test_scaled and X_full_scaled.
+    """
+    if df is None:
+        raw_key, raw = load_raw(path)
+    else:
+        raw_key, raw = stage_cache.get_or_compute("raw", (frame_digest(df),), lambda: df)
+
+    capped_key, capped = stage_cache.get_or_compute("capped", (raw_key,), lambda: cap_outliers(raw))
+    split_key, split = stage_cache.get_or_compute(
+        "split", (capped_key, test_size, random_state),
+        lambda: _split(capped, test_size, random_state)
+    )
+    resampled_key, resampled = stage_cache.get_or_compute(
+        "resampled", (split_key, use_smote, random_state),
+        lambda: _resample(split, use_smote, random_state)
+    )
+    _, scaled = stage_cache.get_or_compute(
+        "scaled", (resampled_key, scaling_method),
+        lambda: _scale(capped, split, resampled, scaling_method)
+    )
+
+    return {
+        "capped": capped,
+        "X": capped[FEATURE_COLUMNS],
+        "y": capped[LABEL_COLUMN],
+        "X_train": resampled["X_train"],
+        "X_test": split["X_test"],
+        "y_train": resampled["y_train"],
+        "y_test": split["y_test"],
+        "smote_applied": resampled["smote_applied"],
+        **scaled
+    }
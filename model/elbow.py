@@ -0,0 +1,183 @@
+"""
+K-Means elbow scan used by train_model.py.
+
+The per-k fits are independent, so they run in a process pool, a batch of k
+values at a time. After every batch the scan checks whether the curve has
+flattened past its knee: once the last `patience` k values together lowered
+the inertia by less than `tolerance` of the k=1 inertia, larger k cannot move
+the elbow and the scan stops. (The knee of a truncated curve alone is not a
+safe stopping signal, it drifts as the curve is extended.) For large datasets
+MiniBatchKMeans can replace the full Lloyd fits.
+
+Inertias are cached per k in a JSON file keyed by a hash of the scaled data
+and the fit settings, so re-running training on unchanged data skips the
+scan entirely.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+ELBOW_MODES = ("auto", "full", "minibatch")
+# "auto" switches to MiniBatchKMeans above this many rows
+MINIBATCH_THRESHOLD = 50000
+MINIBATCH_SIZE = 1024
+
+
+def resolve_mode(mode: str, n_samples: int) -> str:
+    if mode == "auto":
+        return "minibatch" if n_samples > MINIBATCH_THRESHOLD else "full"
+    return mode
+
+
+def build_kmeans(k: int, mode: str, random_state: int = 42):
+    if mode == "minibatch":
+        return MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=3, batch_size=MINIBATCH_SIZE)
+    return KMeans(n_clusters=k, random_state=random_state, n_init=10)
+
+
+def data_digest(X: np.ndarray) -> str:
+    X = np.ascontiguousarray(X)
+    sha = hashlib.sha1(f"{X.shape}{X.dtype}".encode("utf-8"))
+    sha.update(X.tobytes())
+    return sha.hexdigest()
+
+
+def find_knee(ks, inertias):
+    """
+    Knee of a decreasing convex curve: kneed's KneeLocator when installed,
+    otherwise the point farthest from the chord between both ends.
+    """
+    if len(ks) < 3:
+        return None
+    try:
+        from kneed import KneeLocator
+        return KneeLocator(list(ks), list(inertias), curve="convex", direction="decreasing").knee
+    except ImportError:
+        pass
+    x = np.asarray(ks, dtype=float)
+    y = np.asarray(inertias, dtype=float)
+    x = (x - x[0]) / ((x[-1] - x[0]) or 1.0)
+    y = (y - y[-1]) / ((y[0] - y[-1]) or 1.0)
+    # Distance below the chord from (0, 1) to (1, 0)
+    gap = (1.0 - x) - y
+    idx = int(np.argmax(gap))
+    return int(ks[idx]) if gap[idx] > 0 else None
+
+
+def _init_worker():
+    try:
+        # Each process fits one k at a time; don't let OpenMP/BLAS oversubscribe
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+
+
+def _fit_k(X, k, mode, random_state, keep_model):
+    model = build_kmeans(k, mode, random_state).fit(X)
+    return k, float(model.inertia_), model if keep_model else None
+
+
+class InertiaCache:
+    def __init__(self, path):
+        self.path = path
+        self._data = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except Exception as exc:
+                print(f"Ignoring unreadable elbow cache {path}: {exc}")
+
+    def get(self, key: str) -> dict:
+        return {int(k): v for k, v in self._data.get(key, {}).items()}
+
+    def save(self, key: str, inertias: dict) -> None:
+        if not self.path:
+            return
+        self._data[key] = {str(k): v for k, v in sorted(inertias.items())}
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def has_flattened(ks, inertias, patience: int, tolerance: float) -> bool:
+    if len(ks) <= patience or find_knee(ks, inertias) is None:
+        return False
+    tail_gain = inertias[-patience - 1] - inertias[-1]
+    return tail_gain < tolerance * inertias[0]
+
+
+def elbow_scan(X, k_values, mode: str = "auto", n_jobs: int = None, early_exit: bool = True,
+               patience: int = 5, tolerance: float = 0.02, cache_path: str = None,
+               random_state: int = 42, keep_k: int = None) -> dict:
+    """
+    Fits K-Means for each k (in order) and returns the inertia curve.
+
+    Args:
+        X: scaled feature matrix.
+        k_values: candidate cluster counts, ascending.
+        mode: "full" (KMeans, n_init=10), "minibatch" or "auto".
+        n_jobs: worker processes (default: CPU count); also the batch size.
+        early_exit: stop once the last `patience` ks gained less than
+            `tolerance` (fraction of the k=1 inertia) past a knee.
+        cache_path: JSON file for per-k inertias, or None to disable caching.
+        keep_k: return the fitted model for this k when it is fitted here.
+
+    Returns:
+        dict with ks, inertias, optimal_k, mode, cached (ks served from the
+        cache) and model (the keep_k model or None).
+    """
+    k_values = list(k_values)
+    mode = resolve_mode(mode, len(X))
+    n_jobs = max(1, n_jobs or os.cpu_count() or 1)
+    key = f"{data_digest(X)}-{mode}-{random_state}"
+    cache = InertiaCache(cache_path)
+    known = cache.get(key)
+    cached_ks = [k for k in k_values if k in known]
+
+    ks, inertias = [], []
+    kept_model = None
+    executor = None
+    try:
+        for start in range(0, len(k_values), n_jobs):
+            batch = k_values[start:start + n_jobs]
+            missing = [k for k in batch if k not in known]
+            if missing:
+                if executor is None and n_jobs > 1:
+                    executor = ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker)
+                if executor is None:
+                    results = [_fit_k(X, k, mode, random_state, k == keep_k) for k in missing]
+                else:
+                    futures = [executor.submit(_fit_k, X, k, mode, random_state, k == keep_k) for k in missing]
+                    results = [future.result() for future in futures]
+                for k, inertia, model in results:
+                    known[k] = inertia
+                    if model is not None:
+                        kept_model = model
+                cache.save(key, known)
+
+            ks.extend(batch)
+            inertias.extend(known[k] for k in batch)
+
+            if early_exit and start + n_jobs < len(k_values) and has_flattened(ks, inertias, patience, tolerance):
+                print(f"Elbow scan stopped at k={ks[-1]}: inertia curve has flattened.")
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return {
+        "ks": ks,
+        "inertias": inertias,
+        "optimal_k": find_knee(ks, inertias),
+        "mode": mode,
+        "cached": [k for k in cached_ks if k in ks],
+        "model": kept_model
+    }
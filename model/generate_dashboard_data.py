@@ -6,17 +6,18 @@ import pandas as pd
 from sklearn.metrics import confusion_matrix
 import shap
 
+from dataset_prep import FEATURE_COLUMNS, load_raw
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(BASE_DIR, "../dataset/Crop_recommendation.csv")
 MODELS_DIR = BASE_DIR
 DASHBOARD_DATA_PATH = os.path.join(MODELS_DIR, "dashboard_data.json")
-FEATURE_COLUMNS = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
 
 def generate_dev_data():
     print("Generating Dashboard Data...")
     
-    # Load dataset
-    df = pd.read_csv(DATA_PATH)
+    # Load dataset (memoized by content hash, shared with train_model.py)
+    _, df = load_raw(DATA_PATH)
     y = df['label']
     X = df[FEATURE_COLUMNS]
 
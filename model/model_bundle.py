@@ -0,0 +1,441 @@
+"""
+Versioned, memory-mappable model bundle.
+
+Instead of four pickles (rf_model, kmeans, scaler, cluster_map) the backend can
+load one directory holding a JSON manifest and plain .npy arrays:
+
+    bundles/
+        CURRENT                      name of the active version
+        <version>/
+            manifest.json            format, version, classes, features, shapes
+            forest_*.npy             flattened Random Forest nodes (see forest_arrays)
+            shap_*.npy               the same trees in shap's TreeExplainer layout
+            centroids.npy            K-Means cluster centers
+            scaler_mean.npy          StandardScaler mean_ / scale_ / var_
+            scaler_scale.npy
+            scaler_var.npy
+            cluster_matrix.npy       dense (n_clusters x n_classes) cluster map
+            neighbors_*.npy          training rows and labels of the similar-farms index (optional)
+            neighbors_tree.joblib    its KDTree (see neighbor_index.py)
+
+Arrays are opened with mmap_mode="r", so every gunicorn worker maps the same
+page-cache pages instead of unpickling a private copy, and opening a bundle
+costs a few file opens rather than deserializing ~50 MB of estimator objects.
+
+The evaluators below repeat scikit-learn's arithmetic exactly, so a bundle
+scores bit-identically to the pickles it was built from.
+
+train_model.py writes a bundle after every run; to build one from existing
+pickles run:
+    python model_bundle.py
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import sklearn
+from sklearn.metrics.pairwise import euclidean_distances
+from sklearn.utils.fixes import parse_version
+
+BUNDLE_FORMAT = "smartcrop-model-bundle"
+BUNDLE_FORMAT_VERSION = 1
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+NEIGHBORS_TREE_FILE = "neighbors_tree.joblib"
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BUNDLES_DIR = os.path.join(BASE_DIR, "bundles")
+
+# Before scikit-learn 1.4, tree_.value held class counts and
+# DecisionTreeClassifier.predict_proba normalized them on every call.
+_NORMALIZE_LEAF_VALUES = parse_version(sklearn.__version__) < parse_version("1.4")
+
+SHAP_TREE_FIELDS = ("children_left", "children_right", "children_default", "features",
+                    "thresholds", "values", "node_sample_weight")
+
+
+def forest_arrays(rf) -> dict:
+    """
+    Flattens every tree of a fitted RandomForestClassifier into contiguous node arrays:
+
+        feature       (n_nodes,)            feature index tested at each node
+        threshold     (n_nodes,)            split threshold (go left when x <= threshold)
+        children      (n_nodes, 2)          global index of the left and right child
+        missing_left  (n_nodes,)            where NaN inputs go (sklearn >= 1.3 trees)
+        value         (n_nodes, n_classes)  class probabilities stored at each node
+        roots         (n_trees,)            index of each tree's root node
+
+    Leaves are stored as nodes whose children point back to themselves.
+    """
+    n_classes = len(rf.classes_)
+    features, thresholds, children, missing, values, roots = [], [], [], [], [], []
+    offset = 0
+
+    for estimator in rf.estimators_:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        node_ids = np.arange(n_nodes)
+        is_leaf = tree.children_left == -1
+
+        left = np.where(is_leaf, node_ids, tree.children_left) + offset
+        right = np.where(is_leaf, node_ids, tree.children_right) + offset
+
+        value = np.array(tree.value[:, 0, :n_classes], dtype=np.float64)
+        if _NORMALIZE_LEAF_VALUES:
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            value /= normalizer
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(tree.threshold)
+        children.append(np.stack([left, right], axis=1))
+        missing.append(getattr(tree, "missing_go_to_left", np.zeros(n_nodes, dtype=np.uint8)))
+        values.append(value)
+        roots.append(offset)
+
+        offset += n_nodes
+
+    return {
+        "feature": np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+        "threshold": np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+        "children": np.ascontiguousarray(np.concatenate(children), dtype=np.intp),
+        "missing_left": np.ascontiguousarray(np.concatenate(missing), dtype=bool),
+        "value": np.ascontiguousarray(np.concatenate(values)),
+        "roots": np.asarray(roots, dtype=np.intp)
+    }
+
+
+def shap_arrays(rf):
+    """
+    The forest as shap.TreeExplainer sees it (per-tree node arrays with
+    normalized, 1/n_trees-scaled values), concatenated with per-tree offsets.
+    Returns (arrays, settings) where settings are the remaining ensemble fields.
+    """
+    import shap
+
+    ensemble = shap.TreeExplainer(rf).model
+    arrays = {
+        field: np.ascontiguousarray(np.concatenate([getattr(tree, field) for tree in ensemble.trees]))
+        for field in SHAP_TREE_FIELDS
+    }
+    sizes = [len(tree.features) for tree in ensemble.trees]
+    arrays["tree_offsets"] = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    arrays["base_offset"] = np.atleast_1d(np.asarray(ensemble.base_offset, dtype=np.float64))
+    settings = {
+        "tree_output": ensemble.tree_output,
+        "objective": ensemble.objective,
+        "input_dtype": np.dtype(ensemble.input_dtype).name,
+        "internal_dtype": np.dtype(ensemble.internal_dtype).name,
+        "scalar_base_offset": not np.ndim(ensemble.base_offset)
+    }
+    return arrays, settings
+
+
+def build_cluster_matrix(cluster_map: dict, classes, n_clusters: int = None) -> np.ndarray:
+    """
+    Dense (n_clusters x n_classes) proportions of a cluster_map
+    ({cluster_id: {crop: proportion}}, int or str ids), columns aligned to
+    classes. Clusters absent from the map get an all-zero row. The backend
+    builds its scoring matrix from pickles with the same function.
+    """
+    cluster_ids = [int(cluster_id) for cluster_id in cluster_map]
+    if n_clusters is None:
+        n_clusters = max(cluster_ids) + 1 if cluster_ids else 0
+    matrix = np.zeros((n_clusters, len(classes)), dtype=np.float64)
+    for cluster_id, prob_map in cluster_map.items():
+        if int(cluster_id) < n_clusters:
+            matrix[int(cluster_id)] = [float(prob_map.get(label, 0.0)) for label in classes]
+    return matrix
+
+
+def write_bundle(rf, kmeans, scaler, cluster_map: dict, bundles_dir: str = BUNDLES_DIR,
+                 feature_names=None, keep: int = 3, neighbors=None) -> str:
+    """
+    Writes a new bundle version and makes it current. neighbors is an optional
+    neighbor_index.NeighborIndex built with the same scaler.
+
+    The version directory is written under a temporary name and renamed into
+    place, then CURRENT is replaced atomically, so a reader never sees a
+    partial bundle. Only the newest `keep` versions are kept.
+
+    Returns:
+        The version string.
+    """
+    if not hasattr(scaler, "mean_") or not hasattr(scaler, "scale_"):
+        raise ValueError("Model bundles only support StandardScaler")
+
+    classes = [str(label) for label in rf.classes_]
+    n_clusters = int(kmeans.cluster_centers_.shape[0])
+    shap_data, shap_settings = shap_arrays(rf)
+
+    arrays = {f"forest_{name}": array for name, array in forest_arrays(rf).items()}
+    arrays.update({f"shap_{name}": array for name, array in shap_data.items()})
+    arrays["centroids"] = np.ascontiguousarray(kmeans.cluster_centers_, dtype=np.float64)
+    arrays["scaler_mean"] = np.asarray(scaler.mean_, dtype=np.float64)
+    arrays["scaler_scale"] = np.asarray(scaler.scale_, dtype=np.float64)
+    arrays["scaler_var"] = np.asarray(scaler.var_, dtype=np.float64)
+    arrays["cluster_matrix"] = build_cluster_matrix(cluster_map, classes, n_clusters)
+    if neighbors is not None:
+        arrays["neighbors_features"] = np.ascontiguousarray(neighbors.features, dtype=np.float64)
+        arrays["neighbors_label_codes"] = np.ascontiguousarray(neighbors.label_codes)
+
+    sha = hashlib.sha1(json.dumps(classes).encode("utf-8"))
+    for name in sorted(arrays):
+        sha.update(name.encode("utf-8"))
+        sha.update(arrays[name].tobytes())
+    created_at = datetime.datetime.utcnow()
+    version = f"{created_at:%Y%m%d%H%M%S}-{sha.hexdigest()[:12]}"
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "version": version,
+        "created_at": created_at.isoformat(),
+        "sklearn_version": sklearn.__version__,
+        "feature_names": list(feature_names) if feature_names is not None else None,
+        "classes": classes,
+        "n_trees": int(len(arrays["forest_roots"])),
+        "n_clusters": n_clusters,
+        "shap": shap_settings,
+        "neighbors": {
+            "tree_file": NEIGHBORS_TREE_FILE,
+            "label_names": neighbors.label_names,
+            "scaler_key": neighbors.scaler_key,
+            "n_samples": len(neighbors)
+        } if neighbors is not None else None,
+        "arrays": {
+            name: {"file": f"{name}.npy", "dtype": array.dtype.str, "shape": list(array.shape)}
+            for name, array in sorted(arrays.items())
+        }
+    }
+
+    os.makedirs(bundles_dir, exist_ok=True)
+    tmp_dir = os.path.join(bundles_dir, f".{version}.{os.getpid()}.tmp")
+    os.makedirs(tmp_dir)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), array, allow_pickle=False)
+        if neighbors is not None:
+            import joblib
+            joblib.dump(neighbors.tree, os.path.join(tmp_dir, NEIGHBORS_TREE_FILE))
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        final_dir = os.path.join(bundles_dir, version)
+        if os.path.exists(final_dir):
+            shutil.rmtree(final_dir)
+        os.rename(tmp_dir, final_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    tmp_current = os.path.join(bundles_dir, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(tmp_current, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(tmp_current, os.path.join(bundles_dir, CURRENT_FILE))
+
+    prune_bundles(bundles_dir, keep)
+    return version
+
+
+def list_bundles(bundles_dir: str = BUNDLES_DIR) -> list:
+    """Complete bundle versions in the directory, oldest first."""
+    if not os.path.isdir(bundles_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(bundles_dir)
+        if not name.startswith(".") and os.path.isfile(os.path.join(bundles_dir, name, MANIFEST_FILE))
+    )
+
+
+def prune_bundles(bundles_dir: str = BUNDLES_DIR, keep: int = 3) -> None:
+    current = current_version(bundles_dir)
+    for version in list_bundles(bundles_dir)[:-keep] if keep > 0 else []:
+        if version != current:
+            shutil.rmtree(os.path.join(bundles_dir, version), ignore_errors=True)
+
+
+def current_version(bundles_dir: str = BUNDLES_DIR):
+    """The version named by CURRENT, or None when there is no bundle."""
+    try:
+        with open(os.path.join(bundles_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class BundleScaler:
+    """StandardScaler.transform over the bundle's mean and scale."""
+
+    def __init__(self, mean, scale, var=None):
+        self.mean_ = mean
+        self.scale_ = scale
+        self.var_ = var
+        self.n_features_in_ = len(mean)
+
+    def transform(self, X):
+        # Same operations as StandardScaler.transform (copy, subtract, divide)
+        X = np.array(X, dtype=np.float64, copy=True)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
+
+class BundleCentroids:
+    """The parts of a fitted KMeans used for scoring: centroids and transform()."""
+
+    def __init__(self, cluster_centers):
+        self.cluster_centers_ = cluster_centers
+        self.n_clusters = cluster_centers.shape[0]
+
+    def transform(self, X):
+        # KMeans.transform is euclidean_distances to the centers
+        return euclidean_distances(np.asarray(X, dtype=np.float64), self.cluster_centers_)
+
+    def predict(self, X):
+        return self.transform(X).argmin(axis=1)
+
+
+class ModelBundle:
+    """
+    One loaded bundle version. Arrays are read-only memory maps by default.
+    """
+
+    def __init__(self, path: str, mmap_mode: str = "r"):
+        self.path = path
+        self.mmap_mode = mmap_mode
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != BUNDLE_FORMAT:
+            raise ValueError(f"{path} is not a model bundle")
+        if self.manifest.get("format_version") != BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported bundle format version {self.manifest.get('format_version')}")
+
+        self.arrays = {}
+        for name, spec in self.manifest["arrays"].items():
+            array = np.load(os.path.join(path, spec["file"]), mmap_mode=mmap_mode, allow_pickle=False)
+            if list(array.shape) != spec["shape"] or array.dtype.str != spec["dtype"]:
+                raise ValueError(f"Bundle array {name} does not match the manifest")
+            self.arrays[name] = array
+
+        self.version = self.manifest["version"]
+        self.classes = np.array(self.manifest["classes"], dtype=object)
+
+    def forest(self) -> dict:
+        """Keyword arguments for forest_engine.CompiledForest."""
+        return {name: self.arrays[f"forest_{name}"]
+                for name in ("feature", "threshold", "children", "missing_left", "value", "roots")}
+
+    def scaler(self) -> BundleScaler:
+        return BundleScaler(self.arrays["scaler_mean"], self.arrays["scaler_scale"], self.arrays["scaler_var"])
+
+    def kmeans(self) -> BundleCentroids:
+        return BundleCentroids(self.arrays["centroids"])
+
+    def cluster_matrix(self) -> np.ndarray:
+        return self.arrays["cluster_matrix"]
+
+    def cluster_map(self) -> dict:
+        """The cluster_map dict ({cluster_id: {crop: proportion}}) rebuilt from the matrix."""
+        labels = self.manifest["classes"]
+        return {cluster_id: dict(zip(labels, row.tolist()))
+                for cluster_id, row in enumerate(self.cluster_matrix())}
+
+    def neighbors(self):
+        """
+        The similar-farms index (neighbor_index.NeighborIndex), or None when the
+        bundle was written without one. The tree's arrays are memory-mapped too.
+        """
+        spec = self.manifest.get("neighbors")
+        if not spec:
+            return None
+        import joblib
+        from neighbor_index import NeighborIndex
+
+        tree = joblib.load(os.path.join(self.path, spec["tree_file"]), mmap_mode=self.mmap_mode)
+        return NeighborIndex(tree, self.arrays["neighbors_features"], self.arrays["neighbors_label_codes"],
+                             spec["label_names"], spec["scaler_key"])
+
+    def shap_model(self, class_idx: int = None) -> dict:
+        """
+        shap.TreeExplainer custom-model dict for the forest, optionally
+        restricted to one output class.
+        """
+        settings = self.manifest["shap"]
+        offsets = self.arrays["shap_tree_offsets"]
+        columns = slice(None) if class_idx is None else slice(class_idx, class_idx + 1)
+        trees = []
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            tree = {field: np.asarray(self.arrays[f"shap_{field}"][start:end]) for field in SHAP_TREE_FIELDS}
+            tree["values"] = tree["values"][:, columns]
+            trees.append(tree)
+
+        base_offset = self.arrays["shap_base_offset"]
+        if settings["scalar_base_offset"]:
+            base_offset = base_offset[0]
+        elif class_idx is not None:
+            base_offset = base_offset[class_idx]
+        else:
+            base_offset = np.array(base_offset)
+        return {
+            "trees": trees,
+            "base_offset": base_offset,
+            "tree_output": settings["tree_output"],
+            "objective": settings["objective"],
+            "input_dtype": np.dtype(settings["input_dtype"]).type,
+            "internal_dtype": np.dtype(settings["internal_dtype"]).type
+        }
+
+
+def load_bundle(bundles_dir: str = BUNDLES_DIR, version: str = None, mmap_mode: str = "r") -> ModelBundle:
+    """
+    Opens a bundle version (default: the one named by CURRENT).
+    Raises FileNotFoundError when there is none.
+    """
+    version = version or current_version(bundles_dir)
+    if version is None:
+        raise FileNotFoundError(f"No model bundle in {bundles_dir}")
+    return ModelBundle(os.path.join(bundles_dir, version), mmap_mode=mmap_mode)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build a model bundle from the trained pickles.")
+    parser.add_argument("--artifacts-dir", default=BASE_DIR,
+                        help="Directory holding rf_model.pkl, kmeans.pkl, scaler.pkl and cluster_map.pkl")
+    parser.add_argument("--bundles-dir", default=BUNDLES_DIR, help="Where to write the bundle")
+    parser.add_argument("--data", default=None,
+                        help="Dataset CSV for the similar-farms index (default: dataset/Crop_recommendation.csv)")
+    parser.add_argument("--no-neighbors", action="store_true", help="Write the bundle without the similar-farms index")
+    args = parser.parse_args()
+
+    import joblib
+    from dataset_prep import FEATURE_COLUMNS
+    from neighbor_index import DATA_PATH, index_from_dataset
+
+    def load(name):
+        return joblib.load(os.path.join(args.artifacts_dir, name))
+
+    scaler = load("scaler.pkl")
+    neighbors = None
+    data_path = args.data or DATA_PATH
+    if not args.no_neighbors:
+        if os.path.exists(data_path):
+            neighbors = index_from_dataset(scaler, data_path)
+        else:
+            print(f"Dataset not found at {data_path}, writing the bundle without the similar-farms index")
+
+    version = write_bundle(
+        load("rf_model.pkl"), load("kmeans.pkl"), scaler, load("cluster_map.pkl"),
+        bundles_dir=args.bundles_dir, feature_names=FEATURE_COLUMNS, neighbors=neighbors
+    )
+    print(f"Wrote model bundle {version} to {args.bundles_dir}")
+
+
+if __name__ == "__main__":
+    main()
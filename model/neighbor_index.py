@@ -0,0 +1,150 @@
+"""
+"Similar farms" index: a KD-tree over the training rows in scaled feature space.
+
+The backend shows the closest real examples from Crop_recommendation.csv next to
+a recommendation. The rows are scaled with the same scaler the models use (so
+every feature counts in standard units, not in mm of rainfall vs pH points) and
+indexed with scikit-learn's KDTree, so a k-nearest query costs O(log n) instead
+of a scan over the whole dataset.
+
+The index is persisted next to the model artifacts and loaded with
+mmap_mode="r": the tree's node and data arrays are memory maps shared by every
+worker, and startup does not rebuild it. It records a fingerprint of the scaler
+it was built with; an index whose fingerprint does not match the live scaler is
+stale and is rebuilt.
+
+    NeighborIndex.save(path) / NeighborIndex.load(path)   the standalone artifact (pickle mode)
+    model_bundle.write_bundle(..., neighbors=index)        the same index inside a model bundle
+
+To (re)build the standalone artifact from the dataset:
+    python neighbor_index.py
+"""
+
+import argparse
+import hashlib
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from dataset_prep import FEATURE_COLUMNS, LABEL_COLUMN
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+NEIGHBORS_FILE = "neighbors_index.pkl"
+DATA_PATH = os.path.join(BASE_DIR, "../dataset/Crop_recommendation.csv")
+
+# KDTree leaf size: small leaves favour queries, large leaves a smaller tree
+DEFAULT_LEAF_SIZE = 40
+
+
+def scaler_fingerprint(scaler) -> str:
+    """SHA-1 of the scaler's parameters (StandardScaler mean_/scale_ or MinMaxScaler min_/scale_)."""
+    sha = hashlib.sha1()
+    for name in ("mean_", "min_", "scale_"):
+        value = getattr(scaler, name, None)
+        if value is not None:
+            sha.update(name.encode("utf-8"))
+            sha.update(np.ascontiguousarray(value, dtype=np.float64).tobytes())
+    return sha.hexdigest()
+
+
+class NeighborIndex:
+    """
+    KD-tree over scaled training rows plus the raw rows and their labels.
+
+        tree          KDTree over scaler.transform(features)
+        features      (n_samples, n_features) raw feature values, as in the dataset
+        label_codes   (n_samples,) index into label_names
+        label_names   crop label of each code
+        scaler_key    scaler_fingerprint() of the scaler the tree was built with
+    """
+
+    def __init__(self, tree: KDTree, features: np.ndarray, label_codes: np.ndarray,
+                 label_names: list, scaler_key: str):
+        self.tree = tree
+        self.features = features
+        self.label_codes = label_codes
+        self.label_names = list(label_names)
+        self.scaler_key = scaler_key
+
+    def __len__(self) -> int:
+        return len(self.label_codes)
+
+    def matches(self, scaler) -> bool:
+        return self.scaler_key == scaler_fingerprint(scaler)
+
+    def query(self, features_scaled, k: int):
+        """
+        The k nearest training rows of each scaled input row, nearest first.
+        Returns (distances, indices), both (n_rows, k'); k' = min(k, len(self)).
+        Distances are Euclidean in scaled space.
+        """
+        k = min(int(k), len(self))
+        return self.tree.query(np.atleast_2d(np.asarray(features_scaled, dtype=np.float64)),
+                               k=k, return_distance=True, sort_results=True)
+
+    def label(self, row: int) -> str:
+        return self.label_names[int(self.label_codes[row])]
+
+    def save(self, path: str) -> None:
+        # Written under a temporary name and renamed, so a reader never loads a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            joblib.dump({
+                "tree": self.tree,
+                "features": np.ascontiguousarray(self.features, dtype=np.float64),
+                "label_codes": np.ascontiguousarray(self.label_codes),
+                "label_names": self.label_names,
+                "scaler_key": self.scaler_key
+            }, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: str = "r") -> "NeighborIndex":
+        data = joblib.load(path, mmap_mode=mmap_mode)
+        return cls(data["tree"], data["features"], data["label_codes"], data["label_names"], data["scaler_key"])
+
+
+def build_neighbor_index(features, labels, scaler, leaf_size: int = DEFAULT_LEAF_SIZE) -> NeighborIndex:
+    """Indexes raw feature rows (n_samples, n_features) with their labels, scaled by `scaler`."""
+    features = np.ascontiguousarray(features, dtype=np.float64)
+    label_names, label_codes = np.unique(np.asarray(labels).astype(str), return_inverse=True)
+    tree = KDTree(scaler.transform(features), leaf_size=leaf_size)
+    return NeighborIndex(tree, features, label_codes.astype(np.int32),
+                         [str(label) for label in label_names], scaler_fingerprint(scaler))
+
+
+def load_training_rows(path: str = DATA_PATH):
+    """(features, labels) of every complete row of the CSV, unmodified (no outlier capping)."""
+    columns = FEATURE_COLUMNS + [LABEL_COLUMN]
+    df = pd.read_csv(path, usecols=columns).dropna(subset=columns)
+    return df[FEATURE_COLUMNS].to_numpy(dtype=np.float64), df[LABEL_COLUMN].astype(str).to_numpy()
+
+
+def index_from_dataset(scaler, path: str = DATA_PATH, leaf_size: int = DEFAULT_LEAF_SIZE) -> NeighborIndex:
+    features, labels = load_training_rows(path)
+    return build_neighbor_index(features, labels, scaler, leaf_size=leaf_size)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the similar-farms index from the dataset and scaler.pkl.")
+    parser.add_argument("--data", default=DATA_PATH, help="Dataset CSV (default: dataset/Crop_recommendation.csv)")
+    parser.add_argument("--artifacts-dir", default=BASE_DIR, help="Directory holding scaler.pkl; the index is written there")
+    parser.add_argument("--leaf-size", type=int, default=DEFAULT_LEAF_SIZE, help="KDTree leaf size")
+    args = parser.parse_args()
+
+    scaler = joblib.load(os.path.join(args.artifacts_dir, "scaler.pkl"))
+    index = index_from_dataset(scaler, args.data, args.leaf_size)
+    path = os.path.join(args.artifacts_dir, NEIGHBORS_FILE)
+    index.save(path)
+    print(f"Indexed {len(index)} rows ({len(index.label_names)} labels) into {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,32 @@
 import os
+import argparse
 import joblib
+from joblib import Parallel, delayed
 import numpy as np
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
-from imblearn.over_sampling import SMOTE
 from sklearn.cluster import KMeans
 from sklearn.ensemble import AdaBoostClassifier, GradientBoostingClassifier, RandomForestClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import accuracy_score, classification_report
-from sklearn.model_selection import train_test_split, StratifiedKFold, cross_val_score
-from sklearn.preprocessing import StandardScaler
+from sklearn.model_selection import StratifiedKFold, cross_val_score
 from sklearn.tree import DecisionTreeClassifier
 import shap
 
+from dataset_prep import FEATURE_COLUMNS, prepare_dataset
+from elbow import ELBOW_MODES, elbow_scan
+from model_bundle import BUNDLES_DIR, write_bundle
+from neighbor_index import NEIGHBORS_FILE, index_from_dataset
+
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(BASE_DIR, "../dataset/Crop_recommendation.csv")
 ARTIFACTS_DIR = BASE_DIR
 PLOTS_DIR = os.path.join(BASE_DIR, "plots")
+ELBOW_CACHE_PATH = os.path.join(BASE_DIR, "elbow_cache.json")
 os.makedirs(PLOTS_DIR, exist_ok=True)
 
-FEATURE_COLUMNS = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
-
 
 def generate_synthetic_data(path: str, n_rows: int = 1500) -> pd.DataFrame:
     """Create a fallback dataset when the source CSV is missing or invalid."""
@@ -111,72 +115,21 @@ def build_adaboost() -> AdaBoostClassifier:
         return AdaBoostClassifier(base_estimator=stump, n_estimators=100, learning_rate=0.5, random_state=42)
 
 
-def train() -> None:
-    df = load_dataset().dropna().copy()
-
-    # Cap extreme numeric values to reduce outlier impact while preserving rows.
-    numeric_cols = df.select_dtypes(include=[np.number]).columns
-    for col in numeric_cols:
-        q1 = df[col].quantile(0.25)
-        q3 = df[col].quantile(0.75)
-        iqr = q3 - q1
-        lower = q1 - 1.5 * iqr
-        upper = q3 + 1.5 * iqr
-        df[col] = np.clip(df[col], lower, upper)
+def fit_model(name: str, model, X, y):
+    return name, model.fit(X, y)
 
-    plot_eda(df)
 
-    X = df[FEATURE_COLUMNS]
-    y = df["label"]
-
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
+def fit_models(models: dict, X, y, n_jobs: int) -> dict:
+    """Fits independent models concurrently, one process per model."""
+    if n_jobs == 1 or len(models) == 1:
+        return {name: model.fit(X, y) for name, model in models.items()}
+    fitted = Parallel(n_jobs=min(n_jobs, len(models)))(
+        delayed(fit_model)(name, model, X, y) for name, model in models.items()
     )
+    return dict(fitted)
 
-    if (y_train.value_counts().max() / y_train.value_counts().min()) > 1.5:
-        print("Imbalance detected. Applying SMOTE on training split...")
-        smote = SMOTE(random_state=42)
-        X_train, y_train = smote.fit_resample(X_train, y_train)
-
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
-
-    joblib.dump(scaler, os.path.join(ARTIFACTS_DIR, "scaler.pkl"))
-
-    models = {
-        "Logistic Regression": LogisticRegression(max_iter=1000),
-        "Decision Tree": DecisionTreeClassifier(random_state=42),
-        "Random Forest": RandomForestClassifier(n_estimators=200, random_state=42),
-        "AdaBoost": build_adaboost(),
-        "Gradient Boosting": GradientBoostingClassifier(n_estimators=150, learning_rate=0.1, random_state=42),
-    }
-
-    results = {}
-    reports = {}
-    feature_importances = {}
-
-    best_name = None
-    best_model = None
-    best_acc = -1.0
-
-    print("Training supervised models...")
-    for name, model in models.items():
-        model.fit(X_train_scaled, y_train)
-        preds = model.predict(X_test_scaled)
-        acc = accuracy_score(y_test, preds)
-        results[name] = acc
-        reports[name] = classification_report(y_test, preds, zero_division=0)
-        print(f"{name} Accuracy: {acc:.4f}")
-
-        if hasattr(model, "feature_importances_"):
-            feature_importances[name] = model.feature_importances_
-
-        if acc > best_acc:
-            best_acc = acc
-            best_name = name
-            best_model = model
 
+def write_model_comparison(models: dict, results: dict, reports: dict) -> None:
     comparison_path = os.path.join(ARTIFACTS_DIR, "model_comparison.txt")
     with open(comparison_path, "w", encoding="utf-8") as f:
         f.write("MODEL COMPARISON RESULTS\n\n")
@@ -185,22 +138,10 @@ def train() -> None:
             f.write(reports[name])
             f.write("\n" + "-" * 50 + "\n")
 
-    # Preserve existing contract: save RF metrics/model artifacts expected by backend.
-    rf_model = models["Random Forest"]
-    rf_preds = rf_model.predict(X_test_scaled)
-    with open(os.path.join(ARTIFACTS_DIR, "rf_metrics.txt"), "w", encoding="utf-8") as f:
-        f.write(classification_report(y_test, rf_preds, zero_division=0))
 
-    joblib.dump(rf_model, os.path.join(ARTIFACTS_DIR, "rf_model.pkl"))
-
-    print("Performing Stratified K-Fold Cross Validation on Random Forest...")
-    skf = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
-    # Perform cross-validation to ensure model stability across different random splits.
-    # Stratification ensures preserving class distribution, particularly important for imbalanced agricultural datasets.
-    cv_scores = cross_val_score(rf_model, X_train_scaled, y_train, cv=skf, scoring='accuracy')
+def write_cv_report(cv_scores: np.ndarray) -> None:
     mean_acc = cv_scores.mean()
     std_acc = cv_scores.std()
-
     cv_output_path = os.path.join(ARTIFACTS_DIR, "cross_validation_results.txt")
     with open(cv_output_path, "w", encoding="utf-8") as f:
         f.write("Stratified K-Fold Cross Validation (k=5) Results\n")
@@ -210,8 +151,9 @@ def train() -> None:
         f.write(f"Fold Accuracies: {np.round(cv_scores, 4).tolist()}\n")
         f.write(f"Mean Accuracy: {mean_acc:.4f}\n")
         f.write(f"Standard Deviation: {std_acc:.4f}\n")
-    print(f"Stratified CV Mean Accuracy: {mean_acc:.4f} (+/- {std_acc:.4f})")
 
+
+def plot_shap(rf_model, X_test_scaled: np.ndarray) -> None:
     print("Generating SHAP plots for Explainability...")
     try:
         explainer = shap.TreeExplainer(rf_model)
@@ -270,9 +212,8 @@ def train() -> None:
         print("SHAP exception:")
         traceback.print_exc()
 
-    if best_model is not None:
-        print(f"Best model by accuracy: {best_name} ({best_acc:.4f})")
 
+def plot_model_results(results: dict, feature_importances: dict) -> None:
     try:
         plt.figure(figsize=(9, 5))
         sns.barplot(x=list(results.keys()), y=list(results.values()), color="seagreen")
@@ -304,26 +245,8 @@ def train() -> None:
         except Exception as exc:
             print(f"Could not generate feature importance plot for {name}: {exc}")
 
-    print("Evaluating K-Means with Elbow Method...")
-    X_full_scaled = scaler.transform(X)
-    
-    inertias = []
-    # Test k from 1 up to 30 (dataset has ~22 true classes)
-    K_range = range(1, 31)
-    
-    for k in K_range:
-        km = KMeans(n_clusters=k, random_state=42, n_init=10)
-        km.fit(X_full_scaled)
-        inertias.append(km.inertia_)
-        
-    try:
-        from kneed import KneeLocator
-        kn = KneeLocator(list(K_range), inertias, curve='convex', direction='decreasing')
-        optimal_k = kn.knee
-        print(f"Optimal K found via Elbow Method: {optimal_k}")
-    except ImportError:
-        optimal_k = None
-        
+
+def plot_elbow(K_range, inertias, optimal_k) -> None:
     try:
         plt.figure(figsize=(9, 5))
         plt.plot(K_range, inertias, 'bx-')
@@ -339,26 +262,10 @@ def train() -> None:
     except Exception as exc:
         print(f"Could not generate elbow method plot: {exc}")
 
-    print("Training Final K-Means...")
-    n_clusters = y.nunique() # Or use optimal_k if you want to switch! We'll stick to true number of classes for crop prediction consistency.
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-    clusters = kmeans.fit_predict(X_full_scaled)
-    joblib.dump(kmeans, os.path.join(ARTIFACTS_DIR, "kmeans.pkl"))
-
-    df_clustered = df.copy()
-    df_clustered["cluster"] = clusters
-    cluster_map = (
-        df_clustered.groupby("cluster")["label"]
-        .value_counts(normalize=True)
-        .unstack(fill_value=0)
-        .to_dict("index")
-    )
-
-    joblib.dump(cluster_map, os.path.join(ARTIFACTS_DIR, "cluster_map.pkl"))
 
+def plot_clusters(cluster_map: dict, X_full_scaled: np.ndarray, clusters: np.ndarray, n_clusters: int) -> None:
     # Visualize cluster_map as a heatmap for interpretability
     try:
-        import pandas as pd
         cluster_map_df = pd.DataFrame(cluster_map).T.fillna(0)
         plt.figure(figsize=(min(18, 2+0.5*len(cluster_map_df.columns)), 1+0.4*len(cluster_map_df)))
         sns.heatmap(cluster_map_df, annot=True, fmt=".2f", cmap="YlGnBu")
@@ -402,8 +309,196 @@ def train() -> None:
     except Exception as exc:
         print(f"Could not generate KMeans cluster count plot: {exc}")
 
+
+def train(fast: bool = False, plots: bool = True, reports: bool = True, n_jobs: int = None,
+          elbow_mode: str = "auto", elbow_jobs: int = None, elbow_early_exit: bool = True,
+          elbow_k_max: int = 30) -> None:
+    """
+    Runs the training pipeline.
+
+    fast only fits what the backend loads (rf_model.pkl, scaler.pkl, kmeans.pkl,
+    cluster_map.pkl, neighbors_index.pkl and the model bundle): no model
+    comparison, CV, SHAP, elbow scan, reports or plots; the forest is built
+    with n_jobs threads.
+    Otherwise plots and reports are optional stages, and the model fits, CV
+    folds and elbow scan use n_jobs processes (default: CPU count).
+    """
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if fast:
+        plots = reports = False
+
+    # load_dataset writes the synthetic fallback to DATA_PATH when needed, so the
+    # prepared stages are always keyed by the CSV content and shared with the
+    # backend simulation API and generate_dashboard_data.py
+    load_dataset()
+    prepared = prepare_dataset(path=DATA_PATH, use_smote="auto", scaling_method="Standard")
+    df = prepared["capped"]
+
+    if plots:
+        plot_eda(df)
+
+    y = prepared["y"]
+    y_train, y_test = prepared["y_train"], prepared["y_test"]
+
+    if prepared["smote_applied"]:
+        print("Imbalance detected. Applied SMOTE on training split.")
+
+    X_train_scaled = prepared["X_train_scaled"]
+    X_test_scaled = prepared["X_test_scaled"]
+
+    joblib.dump(prepared["scaler"], os.path.join(ARTIFACTS_DIR, "scaler.pkl"))
+
+    if fast:
+        # Only one model, so the forest itself is the unit of parallelism
+        models = {"Random Forest": RandomForestClassifier(n_estimators=200, random_state=42, n_jobs=n_jobs)}
+    else:
+        models = {
+            "Logistic Regression": LogisticRegression(max_iter=1000),
+            "Decision Tree": DecisionTreeClassifier(random_state=42),
+            "Random Forest": RandomForestClassifier(n_estimators=200, random_state=42),
+            "AdaBoost": build_adaboost(),
+            "Gradient Boosting": GradientBoostingClassifier(n_estimators=150, learning_rate=0.1, random_state=42),
+        }
+
+    results = {}
+    reports_by_model = {}
+    feature_importances = {}
+
+    best_name = None
+    best_model = None
+    best_acc = -1.0
+
+    print("Training supervised models...")
+    models = fit_models(models, X_train_scaled, y_train, n_jobs)
+    # The backend scores a row at a time; a pickled n_jobs would send every
+    # predict_proba through a thread pool
+    models["Random Forest"].set_params(n_jobs=None)
+    for name, model in models.items():
+        preds = model.predict(X_test_scaled)
+        acc = accuracy_score(y_test, preds)
+        results[name] = acc
+        reports_by_model[name] = classification_report(y_test, preds, zero_division=0)
+        print(f"{name} Accuracy: {acc:.4f}")
+
+        if hasattr(model, "feature_importances_"):
+            feature_importances[name] = model.feature_importances_
+
+        if acc > best_acc:
+            best_acc = acc
+            best_name = name
+            best_model = model
+
+    if reports:
+        write_model_comparison(models, results, reports_by_model)
+
+    # Preserve existing contract: save RF metrics/model artifacts expected by backend.
+    rf_model = models["Random Forest"]
+    if reports:
+        with open(os.path.join(ARTIFACTS_DIR, "rf_metrics.txt"), "w", encoding="utf-8") as f:
+            f.write(reports_by_model["Random Forest"])
+
+    joblib.dump(rf_model, os.path.join(ARTIFACTS_DIR, "rf_model.pkl"))
+
+    if not fast:
+        print("Performing Stratified K-Fold Cross Validation on Random Forest...")
+        skf = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
+        # Perform cross-validation to ensure model stability across different random splits.
+        # Stratification ensures preserving class distribution, particularly important for imbalanced agricultural datasets.
+        # Folds are fitted concurrently.
+        cv_scores = cross_val_score(rf_model, X_train_scaled, y_train, cv=skf, scoring='accuracy', n_jobs=n_jobs)
+        if reports:
+            write_cv_report(cv_scores)
+        print(f"Stratified CV Mean Accuracy: {cv_scores.mean():.4f} (+/- {cv_scores.std():.4f})")
+
+    if plots:
+        plot_shap(rf_model, X_test_scaled)
+
+    if best_model is not None and not fast:
+        print(f"Best model by accuracy: {best_name} ({best_acc:.4f})")
+
+    if plots:
+        plot_model_results(results, feature_importances)
+
+    X_full_scaled = prepared["X_full_scaled"]
+    n_clusters = y.nunique() # Or use optimal_k if you want to switch! We'll stick to true number of classes for crop prediction consistency.
+
+    scan = None
+    if not fast:
+        print("Evaluating K-Means with Elbow Method...")
+        # Test k from 1 up to elbow_k_max (dataset has ~22 true classes). The fits run
+        # in parallel, stop once the knee is clear and are cached per data hash.
+        scan = elbow_scan(
+            X_full_scaled, range(1, elbow_k_max + 1), mode=elbow_mode, n_jobs=elbow_jobs or n_jobs,
+            early_exit=elbow_early_exit, cache_path=ELBOW_CACHE_PATH, keep_k=n_clusters
+        )
+        if scan["cached"]:
+            print(f"Reused cached inertias for {len(scan['cached'])} of {len(scan['ks'])} k values.")
+        if scan["optimal_k"]:
+            print(f"Optimal K found via Elbow Method: {scan['optimal_k']}")
+        if plots:
+            plot_elbow(scan["ks"], scan["inertias"], scan["optimal_k"])
+
+    print("Training Final K-Means...")
+    kmeans = scan["model"] if scan and scan["mode"] == "full" else None
+    if kmeans is not None:
+        # Same settings as the final model, fitted during the scan
+        clusters = kmeans.labels_
+    else:
+        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+        clusters = kmeans.fit_predict(X_full_scaled)
+    joblib.dump(kmeans, os.path.join(ARTIFACTS_DIR, "kmeans.pkl"))
+
+    df_clustered = df.copy()
+    df_clustered["cluster"] = clusters
+    cluster_map = (
+        df_clustered.groupby("cluster")["label"]
+        .value_counts(normalize=True)
+        .unstack(fill_value=0)
+        .to_dict("index")
+    )
+
+    joblib.dump(cluster_map, os.path.join(ARTIFACTS_DIR, "cluster_map.pkl"))
+
+    if plots:
+        plot_clusters(cluster_map, X_full_scaled, clusters, n_clusters)
+
+    print("Building the similar-farms index...")
+    neighbors = index_from_dataset(prepared["scaler"], DATA_PATH)
+    neighbors.save(os.path.join(ARTIFACTS_DIR, NEIGHBORS_FILE))
+
+    # Memory-mappable copy of the artifacts above, loaded by the backend with MODEL_FORMAT=bundle or auto
+    version = write_bundle(rf_model, kmeans, prepared["scaler"], cluster_map,
+                           bundles_dir=BUNDLES_DIR, feature_names=FEATURE_COLUMNS, neighbors=neighbors)
+    print(f"Model bundle {version} written to {BUNDLES_DIR}.")
+
     print("Training pipeline completed successfully.")
 
 
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the crop recommendation models and artifacts.")
+    parser.add_argument("--fast", action="store_true",
+                        help="Only build the artifacts the backend loads (rf_model, scaler, kmeans, cluster_map, neighbors_index)")
+    parser.add_argument("--no-plots", action="store_true", help="Skip plot generation")
+    parser.add_argument("--no-reports", action="store_true", help="Skip the .txt reports (comparison, RF metrics, CV)")
+    parser.add_argument("--jobs", type=int, default=None, help="Processes for model fits and CV folds (default: CPU count)")
+    parser.add_argument("--elbow-mode", choices=ELBOW_MODES, default="auto",
+                        help="K-Means variant for the elbow scan (auto: MiniBatchKMeans on large data)")
+    parser.add_argument("--elbow-jobs", type=int, default=None, help="Processes for the elbow scan (default: --jobs)")
+    parser.add_argument("--elbow-k-max", type=int, default=30, help="Largest k in the elbow scan (default: 30)")
+    parser.add_argument("--no-elbow-early-exit", action="store_true", help="Scan every k even after the knee is found")
+    args = parser.parse_args()
+
+    train(
+        fast=args.fast,
+        plots=not args.no_plots,
+        reports=not args.no_reports,
+        n_jobs=args.jobs,
+        elbow_mode=args.elbow_mode,
+        elbow_jobs=args.elbow_jobs,
+        elbow_early_exit=not args.no_elbow_early_exit,
+        elbow_k_max=args.elbow_k_max
+    )
+
+
 if __name__ == "__main__":
-    train()
+    main()